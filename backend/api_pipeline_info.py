@@ -10,6 +10,8 @@ import pandas as pd
 
 from flask import Blueprint
 
+from benchmark_store import DATASET_PATH, LEGACY_CSV_PATH, BenchmarkStore
+
 api_pipeline_info = Blueprint('api_pipeline_info', __name__)
 
 BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -28,17 +30,26 @@ def pipeline_info():
     data_dir = os.path.join(BACKEND_ROOT, 'data')
     data_files = sorted(glob.glob(os.path.join(data_dir, '*.csv')))
     data = {}
+    store = BenchmarkStore(os.path.join(BACKEND_ROOT, DATASET_PATH), os.path.join(BACKEND_ROOT, LEGACY_CSV_PATH))
+    try:
+        if store.exists():
+            # The first rows of the benchmark dataset; the legacy CSV it was converted from is not served
+            data[os.path.basename(store.root)] = store.preview(100)
+            data_files = [f for f in data_files if f != store.legacy_csv]
+    except Exception as e:
+        data[os.path.basename(store.root)] = f"Error reading: {e}"
     for data_file in data_files:
         try:
-            df = pd.read_csv(data_file)
-            data[os.path.basename(data_file)] = df.head(100).to_dict(orient='records')
+            # Only the preview is served, so large benchmark files are not parsed in full
+            df = pd.read_csv(data_file, nrows=100)
+            data[os.path.basename(data_file)] = df.to_dict(orient='records')
         except Exception as e:
             data[os.path.basename(data_file)] = f"Error reading: {e}"
 
     # Results
     results_dir = os.path.join(BACKEND_ROOT, 'results')
     results = {}
-    for fname in ['evaluation_report.json', 'feature_importance.json']:
+    for fname in ['evaluation_report.json', 'feature_importance.json', 'training_report.json']:
         fpath = os.path.join(results_dir, fname)
         if os.path.exists(fpath):
             with open(fpath, 'r') as f:
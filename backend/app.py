@@ -1,15 +1,25 @@
 """
 app.py: Predict runtime and/or power consumption of an AI model on specific hardware.
 - Loads model and hardware features from user input or files
-- Uses trained estimator (if available) or heuristic
-- Prints prediction results
+- Uses trained estimator (if available) or the roofline estimate
+- Prints prediction results, including peak memory and model-load time, then the same request
+  quoted under every inference variant
+  (int8, bf16 autocast, torch.compile, inference_mode); variants the estimator was never
+  trained on are scaled from the eager prediction by the roofline
 """
 import json
 import os
 import sys
-import pandas as pd
+import time
 from extract_model_features import extract_model_features
 from extract_hardware_features import extract_hardware_features
+from benchmark_store import BenchmarkStore
+from generation_model import GenerationModel, DEFAULT_NEW_TOKENS
+from inference_variants import BYTES_PER_PARAM, DEFAULT_VARIANT, VARIANTS, variant_features
+from memory_usage import RssSampler, parameter_memory
+from resource_model import load_or_empty as load_resource_model
+import roofline
+from host_calibration import CALIBRATION_FEATURES
 from transformers import AutoTokenizer
 from flask import Flask
 from flask_cors import CORS
@@ -17,25 +27,26 @@ from flask_cors import CORS
 # Set the TOKENIZERS_PARALLELISM environment variable to prevent warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-# Try to load estimator
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+PICKLE_MODEL_PATH = os.path.join(BACKEND_ROOT, "runtime_predictor.pkl")
+
+# Try to load estimator: the live registry version (compiled, NumPy only), then the sklearn pickle
 try:
-    import joblib
-    estimator = joblib.load("runtime_predictor.pkl")
-    use_ml = True
+    from model_registry import registry
+    estimator_version, estimator = registry.live()
+    use_ml = use_compiled = estimator is not None
+    if not use_compiled:
+        raise FileNotFoundError("No compiled estimator")
 except Exception:
-    estimator = None
-    use_ml = False
-
-def heuristic_predict(features):
-    # Simple heuristic: runtime = flops / (cpu_frequency * num_cores)
+    estimator_version = "pickle"
+    use_compiled = False
     try:
-        flops = float(features.get("flops", 0))
-        cpu_freq = float(features.get("cpu_frequency", 1))
-        num_cores = float(features.get("num_cores", 1))
-        ineff = 2.0
-        return flops / (cpu_freq * num_cores) * ineff
+        import joblib
+        estimator = joblib.load(PICKLE_MODEL_PATH)
+        use_ml = True
     except Exception:
-        return None
+        estimator = None
+        use_ml = False
 
 app = Flask(__name__)
 
@@ -49,7 +60,15 @@ def main():
     try:
         from transformers import AutoModelForCausalLM, AutoTokenizer
         import torch
+        # Peak RSS is sampled from the load through the measured run, which is what a scheduled job uses
+        memory = RssSampler()
+        memory.start()
+        load_start = time.perf_counter()
         model = AutoModelForCausalLM.from_pretrained(model_name)
+        actual_load_time = time.perf_counter() - load_start
+        # The commit actually loaded; the server keys cached results on it
+        print(f"Model revision: {getattr(model.config, '_commit_hash', None)}")
+        param_memory = parameter_memory(model)
         tokenizer = AutoTokenizer.from_pretrained(model_name)
 
         # Ensure tokenizer has distinct pad token
@@ -58,6 +77,11 @@ def main():
             tokenizer.pad_token_id = tokenizer.eos_token_id
 
         input_text = input("Enter example input text (or leave blank for default): ").strip() or "Hello, this is a test."
+        # Optional third line: number of tokens to quote a full generation for
+        try:
+            max_new_tokens = int(input("Enter number of tokens to generate (or leave blank for default): ").strip() or DEFAULT_NEW_TOKENS)
+        except (EOFError, ValueError):
+            max_new_tokens = DEFAULT_NEW_TOKENS
 
         # Properly tokenize with attention mask
         inputs = tokenizer(
@@ -87,20 +111,42 @@ def main():
     input_size = sequence_length  # For text models, input_size can be sequence_length
     # Prepare input for estimator
     feature_cols = ["num_params", "flops", "num_layers", "cpu_frequency", "num_cores", "sequence_length", "batch_size", "input_size"]
-    X = pd.DataFrame([{col: features.get(col, 0) for col in feature_cols}])
-    X["batch_size"] = batch_size
-    X["sequence_length"] = sequence_length
-    X["input_size"] = input_size
+    feature_cols += CALIBRATION_FEATURES
+    row = {col: features.get(col, 0) for col in feature_cols}
+    row["batch_size"] = batch_size
+    row["sequence_length"] = sequence_length
+    row["input_size"] = input_size
+    # Lets the server shadow-score candidate estimators on the same inputs, whatever serves this one
+    print(f"Estimator features: {json.dumps(row)}")
     # Predict
     if use_ml:
-        y_pred = estimator.predict(X)[0]
+        print(f"Estimator version: {estimator_version}")
+    if use_compiled:
+        router = registry.router(estimator_version)
+        forest = estimator
+        if router is not None:
+            # Route to the nearest hardware class; unfamiliar hosts use the global forest
+            forest, hardware_class, confidence = router.select(row, estimator)
+            print(f"Hardware class: {'global' if hardware_class is None else hardware_class} (confidence {confidence:.3f})")
+        y_pred = forest.predict_one(row)
+        predict_row, known_features = forest.predict_one, set(forest.feature_names)
+        print(f"\n[ML Model] Predicted runtime (seconds): {y_pred:.4f}")
+        quantiles = forest.quantiles_one(row)
+        print("Predicted runtime quantiles (seconds): " + " ".join(f"{k}={v:.4f}" for k, v in quantiles.items()))
+    elif use_ml:
+        import pandas as pd
+        # Older pickles were fitted without the calibration columns
+        columns = list(getattr(estimator, "feature_names_in_", row.keys()))
+        def predict_row(features_row):
+            return estimator.predict(pd.DataFrame([features_row]).reindex(columns=columns, fill_value=0))[0]
+        y_pred = predict_row(row)
+        known_features = set(columns)
         print(f"\n[ML Model] Predicted runtime (seconds): {y_pred:.4f}")
     else:
-        y_pred = heuristic_predict(features)
-        if y_pred is None:
-            print("\n[Heuristic] Could not predict runtime - missing required features")
-            return
-        print(f"\n[Heuristic] Predicted runtime (seconds): {y_pred:.4f}")
+        # No trained model: bound the forward pass by host compute and memory bandwidth
+        y_pred, bound = roofline.predict_prefill({**features, **row})
+        predict_row, known_features = None, set()
+        print(f"\n[Roofline] Predicted runtime (seconds): {y_pred:.4f} ({bound}-bound)")
 
     # --- Cost Prediction Section ---
     # Estimate average power (W). Try to get from hardware features, then from CSV data, then default
@@ -111,7 +157,7 @@ def main():
         # If not available, try to get average from benchmark data
         if avg_power == 0:
             try:
-                df = pd.read_csv("data/benchmarks.csv")
+                df = BenchmarkStore().read(["avg_cpu_power", "avg_gpu_power"])
                 if not df.empty:
                     # Get average CPU power from existing benchmarks
                     avg_cpu_power = df["avg_cpu_power"].mean()
@@ -142,9 +188,9 @@ def main():
     try:
         with open("data.csv", "r") as f:
             reader = csv.DictReader(f)
-            for row in reader:
-                if row.get("is_future") == "1":
-                    auction_price_eur_per_mwh = float(row["price_eur_per_mwh"])
+            for price_row in reader:
+                if price_row.get("is_future") == "1":
+                    auction_price_eur_per_mwh = float(price_row["price_eur_per_mwh"])
                     break  # Take the first future price (soonest auction)
         if auction_price_eur_per_mwh is None:
             # Fallback: use last historical price
@@ -160,17 +206,107 @@ def main():
     print(f"\nEstimated energy used: {energy_used_kwh*1000:.2f} Wh")
     print(f"Auction price used: {auction_price_eur_per_mwh:.2f} EUR/MWh ({auction_price_eur_per_kwh:.4f} EUR/kWh)")
     print(f"Predicted cost of inference: {cost_eur*1000:.4f} cents ({cost_eur:.6f} EUR)")
+
+    # Full generation: prefill over the prompt plus decoding max_new_tokens
+    try:
+        generation_model = GenerationModel.load()
+        generation = generation_model.predict(model_name, hardware_features.get("device"), sequence_length, max_new_tokens)
+    except Exception as e:
+        print(f"[WARN] Could not load generation model: {e}")
+        generation_model = generation = None
+    if generation is None:
+        # No benchmarks for this model: fall back to the analytic estimate
+        generation = roofline.predict_generation({**features, **row}, sequence_length, max_new_tokens)
+    generation_energy_kwh = generation["totalSeconds"] * avg_power / 3600
+    generation_cost_eur = generation_energy_kwh * auction_price_eur_per_kwh
+    print(f"Predicted prefill time (seconds): {generation['prefillSeconds']:.4f}")
+    print(f"Predicted decode time (seconds): {generation['decodeSeconds']:.4f} for {max_new_tokens} tokens")
+    print(f"Predicted generation energy: {generation_energy_kwh*1000:.4f} Wh")
+    print(f"Predicted cost of generation: {generation_cost_eur*100:.4f} cents ({generation_cost_eur:.6f} EUR)")
+
+    # Peak memory and cold-load time of this run (load plus one forward pass over the prompt)
+    resource_model = load_resource_model()
+    resource_features = {**features, **param_memory}
+    resources = resource_model.predict(model_name, resource_features, sequence_length, batch_size=batch_size)
+    print(f"Parameter memory (bytes): {json.dumps(param_memory)}")
+    print(f"Predicted peak memory (MB): {resources['peakMemoryMb']:.1f} ({resources['memorySource']})")
+    print(f"Predicted load time (seconds): {resources['loadSeconds']:.4f} ({resources['loadSource']})")
+
+    # Per-variant quotes. Power is the benchmark average of that variant where it was measured.
+    variant_power = {}
+    try:
+        power_df = BenchmarkStore().read(["variant", "avg_cpu_power", "avg_gpu_power"])
+        if "variant" in power_df.columns:
+            total_power = (power_df["avg_cpu_power"] + power_df["avg_gpu_power"]).groupby(
+                power_df["variant"].fillna(DEFAULT_VARIANT)).mean()
+            variant_power = {v: float(p) for v, p in total_power.items() if p > 0}
+    except Exception as e:
+        print(f"[WARN] Could not load per-variant power: {e}")
+    eager_features = {**features, **row}
+    eager_prefill = roofline.predict_prefill(eager_features)[0]
+    eager_generation = roofline.predict_generation(eager_features, sequence_length, max_new_tokens)["totalSeconds"]
+    for variant in VARIANTS:
+        variant_generation = None
+        if variant == DEFAULT_VARIANT:
+            runtime, source = y_pred, "ml" if use_ml else "roofline"
+            variant_generation = generation["totalSeconds"]
+        elif f"variant_{variant}" in known_features:
+            runtime, source = float(predict_row({**row, **variant_features(variant)})), "ml"
+        else:
+            # Not in the training data: scale the eager prediction by the roofline's ratio
+            variant_inputs = {**eager_features, "bytes_per_param": BYTES_PER_PARAM.get(variant)}
+            runtime = y_pred * roofline.predict_prefill(variant_inputs)[0] / eager_prefill
+            variant_generation = generation["totalSeconds"] * roofline.predict_generation(
+                variant_inputs, sequence_length, max_new_tokens)["totalSeconds"] / eager_generation
+            source = "roofline"
+        if variant_generation is None:
+            fitted = generation_model and generation_model.predict(
+                model_name, hardware_features.get("device"), sequence_length, max_new_tokens, variant=variant)
+            # The prefill ratio is the best guess for a variant benchmarked without generation
+            variant_generation = fitted["totalSeconds"] if fitted else generation["totalSeconds"] * runtime / y_pred
+        power = variant_power.get(variant, avg_power)
+        # Without a fit for the variant, int8 weights shrink the parameter bytes the estimate starts from
+        bytes_scale = BYTES_PER_PARAM.get(variant, roofline.BYTES_PER_PARAM) / roofline.BYTES_PER_PARAM
+        variant_resources = resource_model.predict(
+            model_name, {**resource_features, "param_bytes": param_memory["param_bytes"] * bytes_scale},
+            sequence_length, batch_size=batch_size, variant=variant)
+        energy_kwh = runtime * power / 3600
+        generation_kwh = variant_generation * power / 3600
+        quote = {
+            "variant": variant,
+            "source": source,
+            "runtimeSeconds": runtime,
+            "avgPower": power,
+            "energyWh": energy_kwh * 1000,
+            "costEur": energy_kwh * auction_price_eur_per_kwh,
+            "generationSeconds": variant_generation,
+            "generationEnergyWh": generation_kwh * 1000,
+            "generationCostEur": generation_kwh * auction_price_eur_per_kwh,
+            "peakMemoryMb": variant_resources["peakMemoryMb"],
+            "loadSeconds": variant_resources["loadSeconds"],
+        }
+        print(f"Variant quote: {json.dumps(quote)}")
     # --- End Cost Prediction Section ---
 
     # Run actual inference and time it
-    import time
     with torch.no_grad():
         start = time.time()
         _ = model(example_input, attention_mask=inputs["attention_mask"])
         end = time.time()
     actual_runtime = end - start
+    actual_peak_mb = memory.stop()["peak_rss_bytes"] / 2**20
     print(f"Actual measured runtime (seconds): {actual_runtime:.4f}")
+    print(f"Actual load time (seconds): {actual_load_time:.4f}")
+    print(f"Actual peak memory (MB): {actual_peak_mb:.1f}")
     print(f"Prediction error: {abs(y_pred - actual_runtime) / actual_runtime * 100:.2f}%")
+    # Log the pair so the background trainer can refit on real traffic
+    try:
+        from feedback import feedback_store
+        from result_cache import fingerprint_features
+        feedback_store.append(row, fingerprint_features(hardware_features),
+                              estimator_version if use_ml else "roofline", y_pred, actual_runtime)
+    except Exception as e:
+        print(f"[WARN] Could not record feedback: {e}")
     # Optionally: print power estimate if available
     # (Extend here if you train a power estimator)
 
@@ -0,0 +1,213 @@
+"""
+Crash-safe, resumable benchmark runs.
+- Every run gets a run id and a directory data/runs/<run_id>/ holding manifest.json and row batches
+- Workers buffer rows and write them as whole batch files (temp file, fsync, rename, directory
+  fsync), so a crash loses at most the unflushed buffer and never leaves a half-written row
+- The batch files are the record of completed cells; the manifest mirrors them after every batch
+- Merging into the benchmark store (benchmark_store.py) first removes any files the run wrote
+  before, so a merge interrupted half-way is redone on --resume instead of appending duplicates
+- A batch can carry one variable-length array per row (token traces); they are stored next to the
+  batch and merged into a single ragged traces.npz per run that rows reference by trace_index
+"""
+import csv
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+RUNS_DIR = "data/runs"
+MANIFEST_FILE = "manifest.json"
+TRACE_FILE = "traces.npz"
+CHECKPOINT_ROWS = 5  # Rows buffered before a batch is written
+CHECKPOINT_SECONDS = 60.0  # ...or this long after the last batch, whichever comes first
+
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write, binary=False):
+    """Write through `write(f)` to a temp file, fsync it and rename it over `path`."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") if binary else open(tmp_path, "w", newline="") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path) or ".")
+
+
+def save_ragged(path, arrays, columns):
+    """Arrays of different lengths as one flat array plus row offsets; `columns` hold one value per array."""
+    offsets = np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype(np.int64)
+    values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int32)
+    atomic_write(path, lambda f: np.savez(f, offsets=offsets, values=values,
+                                          **{k: np.asarray(v) for k, v in columns.items()}), binary=True)
+
+
+def concat_ragged(paths):
+    """(values list, columns) of several save_ragged() files, in order."""
+    arrays, columns = [], {}
+    for path in paths:
+        with np.load(path) as data:
+            offsets, values = data["offsets"], data["values"]
+            arrays.extend(values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1))
+            for key in data.files:
+                if key not in ("offsets", "values"):
+                    columns.setdefault(key, []).extend(data[key].tolist())
+    return arrays, columns
+
+
+class RunCheckpoint:
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.run_id = os.path.basename(run_dir)
+        self.manifest_path = os.path.join(run_dir, MANIFEST_FILE)
+
+    @classmethod
+    def create(cls, spec, workers, root=RUNS_DIR):
+        run_id = f"run-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        run_dir = os.path.join(root, run_id)
+        os.makedirs(run_dir)
+        checkpoint = cls(run_dir)
+        checkpoint.save_manifest({"run_id": run_id, "created": datetime.now().isoformat(), "spec": spec,
+                                  "workers": workers, "status": "running", "completed": []})
+        return checkpoint
+
+    @classmethod
+    def latest(cls, root=RUNS_DIR):
+        """The most recent run that has not been merged, or None."""
+        for run_dir in sorted(glob.glob(os.path.join(root, "run-*")), key=os.path.getmtime, reverse=True):
+            checkpoint = cls(run_dir)
+            if checkpoint.manifest().get("status") != "merged":
+                return checkpoint
+        return None
+
+    @classmethod
+    def open(cls, run_id, root=RUNS_DIR):
+        run_dir = os.path.join(root, run_id)
+        if not os.path.exists(os.path.join(run_dir, MANIFEST_FILE)):
+            raise FileNotFoundError(f"No benchmark run {run_id} in {root}")
+        return cls(run_dir)
+
+    # Manifest
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        atomic_write(self.manifest_path, lambda f: json.dump(manifest, f, indent=2))
+
+    def update_manifest(self, **changes):
+        self.save_manifest({**self.manifest(), **changes, "updated": datetime.now().isoformat()})
+
+    # Batches
+    def batch_paths(self):
+        return sorted(glob.glob(os.path.join(self.run_dir, "batch-*.csv")))
+
+    def write_batch(self, worker_id, rows, fieldnames, traces=None, trace_columns=None):
+        """Write `rows` as one batch; `traces` (one array per row) go to a companion .npz written first,
+        so a batch CSV on disk always has its traces."""
+        path = os.path.join(self.run_dir, f"batch-{worker_id}-{time.time_ns()}.csv")
+        if traces is not None:
+            save_ragged(path[:-len(".csv")] + ".npz", traces, trace_columns or {})
+
+        def write(f):
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        atomic_write(path, write)
+        return path
+
+    def rows(self):
+        for path in self.batch_paths():
+            with open(path, newline="") as f:
+                yield from csv.DictReader(f)
+
+    def trace_path(self):
+        return os.path.join(self.run_dir, TRACE_FILE)
+
+    def completed_keys(self, key):
+        return {key(row) for row in self.rows()}
+
+    def sync_manifest(self, key):
+        """Record the completed cells the batch files hold."""
+        self.update_manifest(completed=sorted(list(k) for k in self.completed_keys(key)))
+
+    # Merge
+    def merge_into(self, store, fieldnames):
+        """Append the run's rows to `store` (a BenchmarkStore) exactly once, even across an interrupted merge."""
+        manifest = self.manifest()
+        if manifest.get("status") == "merged":
+            return 0
+        if manifest.get("status") == "merging":
+            # A previous merge died part-way: drop whatever files it wrote
+            store.remove_run(self.run_id)
+        self.update_manifest(status="merging")
+
+        # One ragged trace file for the whole run, written before any row points into it
+        trace_paths = [path[:-len(".csv")] + ".npz" for path in self.batch_paths()]
+        traced = [path for path in trace_paths if os.path.exists(path)]
+        if traced:
+            arrays, columns = concat_ragged(traced)
+            save_ragged(self.trace_path(), arrays, columns)
+
+        rows, traced_rows = [], 0
+        for batch_path, trace_path in zip(self.batch_paths(), trace_paths):
+            has_traces = os.path.exists(trace_path)
+            with open(batch_path, newline="") as f:
+                for row in csv.DictReader(f):
+                    if has_traces:
+                        row["trace_index"] = traced_rows
+                        traced_rows += 1
+                    rows.append(row)
+        merged = store.append(rows, fieldnames, self.run_id)
+        self.update_manifest(status="merged", merged_rows=merged)
+        return merged
+
+
+class BatchWriter:
+    """Row buffer of one worker that checkpoints every CHECKPOINT_ROWS rows or CHECKPOINT_SECONDS."""
+
+    def __init__(self, checkpoint, worker_id, fieldnames, every_rows=CHECKPOINT_ROWS,
+                 every_seconds=CHECKPOINT_SECONDS, on_flush=None):
+        self.checkpoint = checkpoint
+        self.worker_id = worker_id
+        self.fieldnames = fieldnames
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.on_flush = on_flush  # Called after each batch is on disk
+        self.rows = []
+        self.traces = []
+        self.trace_columns = {}
+        self.last_flush = time.monotonic()
+
+    def write(self, row, trace=None, **trace_columns):
+        """Buffer a row; every row of a worker carries a trace, or none does."""
+        self.rows.append(row)
+        if trace is not None:
+            self.traces.append(trace)
+            for key, value in trace_columns.items():
+                self.trace_columns.setdefault(key, []).append(value)
+        if len(self.rows) >= self.every_rows or time.monotonic() - self.last_flush >= self.every_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.checkpoint.write_batch(self.worker_id, self.rows, self.fieldnames,
+                                        self.traces if self.traces else None, self.trace_columns)
+            self.rows, self.traces, self.trace_columns = [], [], {}
+            if self.on_flush:
+                self.on_flush()
+        self.last_flush = time.monotonic()
@@ -0,0 +1,103 @@
+"""
+Declarative benchmark sweeps for run_benchmark.py.
+- A spec (JSON, or YAML when PyYAML is installed) lists models, batch sizes, target sequence
+  lengths, max_new_tokens, thread counts, dtypes and inference variants (inference_variants.py),
+  plus how many prompts to run per cell
+- expand_grid() takes the cartesian product, drops duplicates and orders cells so each worker
+  loads every (model, dtype, variant) once
+- Cells already present in the benchmark dataset (same configuration columns) are skipped, so a
+  sweep can be extended or rerun without duplicating rows
+- A missing value (null) means "as before": the prompt's own length, the worker's core count
+- "corpus" chooses the prompts (see prompt_corpus.py); rows record it as prompt_source, so a
+  synthetic corpus with other settings is a different set of cells from the dataset
+"""
+import hashlib
+import itertools
+import json
+import os
+
+DEFAULT_SPEC = {
+    "models": ["Qwen/Qwen3-0.6B"],
+    "batch_sizes": [1],
+    "sequence_lengths": [None],
+    "max_new_tokens": [512],
+    "threads": [None],
+    "dtypes": ["float32"],
+    "variants": ["eager"],
+    "prompts": 100,
+    "corpus": None,  # prompts_dataset.json; a .json/.jsonl path, or a synthetic corpus spec
+}
+DTYPES = ("float32", "bfloat16", "float16")
+# Columns that identify a cell in the benchmark dataset
+CONFIG_COLUMNS = ["model", "dtype", "batch_size", "target_sequence_length", "max_new_tokens", "threads", "prompt_index",
+                  "prompt_source", "variant"]
+# What an empty column means in rows written before it existed
+CONFIG_DEFAULTS = {"variant": "eager"}
+SPEC_AXES = {"models": "model", "dtypes": "dtype", "variants": "variant", "batch_sizes": "batch_size",
+             "sequence_lengths": "target_sequence_length", "max_new_tokens": "max_new_tokens", "threads": "threads"}
+
+
+def load_spec(path=None):
+    """Spec from `path` merged over DEFAULT_SPEC; scalars are accepted where lists are expected."""
+    spec = dict(DEFAULT_SPEC)
+    if path:
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml  # Optional dependency, only needed for YAML specs
+                spec.update(yaml.safe_load(f) or {})
+            else:
+                spec.update(json.load(f))
+    unknown = set(spec) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f"Unknown sweep keys: {sorted(unknown)}")
+    for key in SPEC_AXES:
+        if not isinstance(spec[key], list):
+            spec[key] = [spec[key]]
+    bad_dtypes = set(spec["dtypes"]) - set(DTYPES)
+    if bad_dtypes:
+        raise ValueError(f"Unsupported dtypes {sorted(bad_dtypes)}; expected one of {DTYPES}")
+    return spec
+
+
+def prompt_source(corpus):
+    """Short stable name of a "corpus" setting; empty for the default dataset."""
+    if corpus is None:
+        return None
+    if isinstance(corpus, str):
+        return os.path.basename(corpus)
+    digest = hashlib.sha256(json.dumps(corpus, sort_keys=True).encode()).hexdigest()[:8]
+    return f"synthetic-{digest}"
+
+
+def cell_key(cell):
+    """Comparable identity of a cell; CSV values arrive as strings, so everything is normalised."""
+    values = (CONFIG_DEFAULTS.get(col) if cell.get(col) in (None, "") else cell[col] for col in CONFIG_COLUMNS)
+    return tuple("" if value is None else str(value).removesuffix(".0") for value in values)
+
+
+def expand_grid(spec, default_threads=None):
+    """Deduplicated cells, grouped by (model, dtype, variant)."""
+    cells, seen = [], set()
+    # Specs saved by older runs lack the newer axes
+    axes = [spec.get(key, DEFAULT_SPEC[key]) for key in SPEC_AXES]
+    source = prompt_source(spec.get("corpus"))
+    for values in itertools.product(*axes):
+        config = dict(zip(SPEC_AXES.values(), values))
+        if config["threads"] is None:
+            config["threads"] = default_threads
+        for prompt_index in range(int(spec["prompts"])):
+            cell = {**config, "prompt_index": prompt_index, "prompt_source": source}
+            key = cell_key(cell)
+            if key not in seen:
+                seen.add(key)
+                cells.append(cell)
+    return cells
+
+
+def pending_cells(cells, measured):
+    """Cells whose key none of the `measured` rows (dicts of CONFIG_COLUMNS) has.
+
+    Rows from before the sweep columns have no prompt_index, so they match no cell; columns
+    added since (prompt_source, variant) read as empty, i.e. the default."""
+    done = {cell_key(row) for row in measured}
+    return [cell for cell in cells if cell_key(cell) not in done]
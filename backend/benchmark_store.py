@@ -0,0 +1,213 @@
+"""
+Benchmark rows as a partitioned Parquet dataset, replacing the append-only data/benchmarks.csv.
+- data/benchmarks/ is hive-partitioned by model and hardware (device), so reading one model's
+  slice opens only that model's files
+- Columns are typed (field_type()); token ids are a list<int32> column instead of a comma-joined string
+- Appends only add files, named after the run that wrote them, so an interrupted merge is undone
+  by remove_run() and redone; written files are fsynced like the checkpoint batches
+- Reads push column selection and model/device filters down to Parquet; files written before a
+  column existed read it as null, so adding a column needs no migration
+- An existing data/benchmarks.csv is converted once by migrate(), which run_benchmark.py, estimator.py
+  and evaluate.py call up front; reads never convert, so app.py's /api/predict path stays read-only
+"""
+import csv
+import glob
+import hashlib
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DATASET_PATH = "data/benchmarks"
+LEGACY_CSV_PATH = "data/benchmarks.csv"
+PARTITION_COLUMNS = ["model", "device"]
+PARTITIONING = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS]), flavor="hive")
+STRING_COLUMNS = {"model", "model_architecture", "device", "input_text", "run_id", "dtype", "variant",
+                  "prompt_source", "inference_time_stopped", "output_generation_time_stopped"}
+INT_COLUMNS = {"num_cores", "batch_size", "num_layers", "input_size", "sequence_length", "output_token_count",
+               "inference_time_reps", "output_generation_time_reps", "trace_index", "target_sequence_length",
+               "max_new_tokens", "threads", "prompt_index"}
+TOKEN_COLUMNS = {"tokens"}
+# Wide per-row payloads no model is trained on; training reads every column but these
+TEXT_COLUMNS = ("input_text", "tokens")
+MIGRATE_CHUNK_ROWS = 100_000
+
+
+def field_type(name):
+    if name in TOKEN_COLUMNS:
+        return pa.list_(pa.int32())
+    if name in STRING_COLUMNS:
+        return pa.string()
+    if name in INT_COLUMNS or name.endswith("_bytes"):
+        return pa.int64()
+    return pa.float64()
+
+
+def _missing(value):
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+
+def _convert(value, kind):
+    """One CSV (string) or Python value as the column's type; empty means null."""
+    if _missing(value):
+        return None
+    if pa.types.is_list(kind):
+        if isinstance(value, str):
+            return [int(token) for token in value.split(",") if token.strip()]
+        return [int(token) for token in value]
+    if pa.types.is_string(kind):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if pa.types.is_integer(kind):
+        return int(number) if number == number else None
+    return number
+
+
+def to_table(rows, fieldnames):
+    """Rows (dicts, as csv.DictReader yields them) as a typed Arrow table with `fieldnames` columns."""
+    schema = pa.schema([(name, field_type(name)) for name in fieldnames])
+    return pa.table({field.name: pa.array([_convert(row.get(field.name), field.type) for row in rows], field.type)
+                     for field in schema}, schema=schema)
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BenchmarkStore:
+    def __init__(self, root=DATASET_PATH, legacy_csv=LEGACY_CSV_PATH):
+        self.root = root
+        self.legacy_csv = legacy_csv
+
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    # Writing
+    def append(self, rows, fieldnames, run_id):
+        """Add `rows` as new files named after `run_id`; returns the number of rows written."""
+        return self._write(self.root, to_table(rows, fieldnames), f"{run_id}-{{i}}.parquet")
+
+    def remove_run(self, run_id):
+        """Delete the files `run_id` wrote, e.g. by a merge that died part-way."""
+        for path in glob.glob(os.path.join(glob.escape(self.root), "**", f"{glob.escape(run_id)}-*.parquet"),
+                              recursive=True):
+            os.remove(path)
+
+    def _write(self, root, table, basename_template):
+        if table.num_rows == 0:
+            return 0
+        written = []
+        ds.write_dataset(table, root, format="parquet", partitioning=PARTITIONING,
+                         basename_template=basename_template, existing_data_behavior="overwrite_or_ignore",
+                         file_visitor=lambda f: written.append(f.path))
+        for path in written:
+            _fsync(path)
+        for directory in {os.path.dirname(path) for path in written}:
+            _fsync(directory)
+        return table.num_rows
+
+    def migrate(self):
+        """Convert the legacy CSV into the dataset, unless the dataset already exists (or there is no CSV)."""
+        if (os.path.isdir(self.root) or not self.legacy_csv or not os.path.exists(self.legacy_csv)
+                or os.stat(self.legacy_csv).st_size == 0):
+            return
+        # Built next to the dataset and renamed into place, so readers never see half of it
+        tmp_root = f"{self.root}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        os.makedirs(tmp_root)
+        converted = 0
+        with open(self.legacy_csv, newline="") as f:
+            reader = csv.DictReader(f)
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= MIGRATE_CHUNK_ROWS:
+                    converted += self._write(tmp_root, to_table(chunk, reader.fieldnames),
+                                             f"legacy-{converted}-{{i}}.parquet")
+                    chunk = []
+            converted += self._write(tmp_root, to_table(chunk, reader.fieldnames or []),
+                                     f"legacy-{converted}-{{i}}.parquet")
+        try:
+            os.rename(tmp_root, self.root)
+        except OSError:
+            shutil.rmtree(tmp_root, ignore_errors=True)  # Another process converted it first
+            return
+        print(f"[INFO] Converted {self.legacy_csv} ({converted} rows) to the Parquet dataset {self.root}")
+
+    # Reading
+    def _filter(self, models=None, devices=None):
+        expression = None
+        for column, values in (("model", models), ("device", devices)):
+            if values is not None:
+                condition = ds.field(column).isin(list(values))
+                expression = condition if expression is None else expression & condition
+        return expression
+
+    def dataset(self, models=None, devices=None):
+        """The files of the selected partitions as one dataset, or None if there are none.
+
+        Files are pruned by partition before their footers are read; the schema is the union of
+        theirs, so columns added later read as null in older files.
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"No benchmark dataset at {self.root}")
+        fragments = list(ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+                         .get_fragments(filter=self._filter(models, devices)))
+        if not fragments:
+            return None
+        schema = pa.unify_schemas([PARTITIONING.schema] + [f.physical_schema for f in fragments])
+        return ds.dataset([f.path for f in fragments], schema=schema, format="parquet",
+                          partitioning=PARTITIONING, partition_base_dir=self.root)
+
+    def columns(self, models=None, devices=None):
+        dataset = self.dataset(models, devices)
+        return dataset.schema.names if dataset is not None else []
+
+    def read_table(self, columns=None, models=None, devices=None):
+        """Arrow table of the selected rows; requested columns no file has are left out, like usecols."""
+        dataset = self.dataset(models, devices)
+        if dataset is None:
+            names = columns if columns is not None else []
+            return pa.table({name: pa.array([], field_type(name)) for name in names})
+        if columns is not None:
+            columns = [col for col in columns if col in dataset.schema.names]
+        return dataset.to_table(columns=columns, filter=self._filter(models, devices))
+
+    def read(self, columns=None, models=None, devices=None):
+        """The selected rows as a DataFrame; token ids come back as one NumPy array per row."""
+        return self.read_table(columns, models, devices).to_pandas()
+
+    def preview(self, rows):
+        """The first `rows` rows as JSON-ready records."""
+        dataset = self.dataset()
+        if dataset is None:
+            return []
+        return dataset.head(rows).to_pylist()
+
+    def fingerprint(self, models=None, devices=None):
+        """Digest of the selected data files; files are never rewritten, so names, sizes and mtimes suffice."""
+        digest = hashlib.sha256()
+        dataset = self.dataset(models, devices)
+        for path in sorted(dataset.files) if dataset is not None else []:
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, self.root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    import sys
+
+    store = BenchmarkStore(sys.argv[1], legacy_csv=None) if len(sys.argv) > 1 else BenchmarkStore()
+    store.migrate()
+    df = store.read(columns=PARTITION_COLUMNS)
+    for (model, device), rows in df.groupby(PARTITION_COLUMNS, dropna=False).size().items():
+        print(f"{model} on {device}: {rows} rows")
+    print(f"{len(df)} rows in {store.root}")
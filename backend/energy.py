@@ -0,0 +1,181 @@
+"""
+Energy measurement backends for run_benchmark.py, sampled during the timed region.
+- RaplSampler reads the Linux powercap RAPL package counters (/sys/class/powercap/intel-rapl:N/energy_uj)
+  from a background thread; counter wraparound at max_energy_range_uj is handled per interval
+- PowermetricsSampler streams macOS `powermetrics` CPU/GPU power for the same window
+- NullSampler reports zeros where neither is available, so benchmarks still run
+- Every backend returns integrated joules, average and peak power in the same dict shape
+"""
+import glob
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+
+POWERCAP_ROOT = "/sys/class/powercap"
+SAMPLE_INTERVAL_SECONDS = 0.1
+POWERMETRICS_INTERVAL_MS = 100
+
+
+def empty_result(backend, seconds=0.0):
+    return {"backend": backend, "seconds": seconds, "samples": 0, "energy_joules": 0.0,
+            "avg_cpu_power": 0.0, "avg_gpu_power": 0.0, "peak_power": 0.0}
+
+
+class NullSampler:
+    name = "none"
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def stop(self):
+        return empty_result(self.name, time.perf_counter() - self._started)
+
+
+class RaplDomain:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "name")) as f:
+            self.name = f.read().strip()
+        with open(os.path.join(path, "max_energy_range_uj")) as f:
+            self.max_range_uj = int(f.read())
+        self._file = os.path.join(path, "energy_uj")
+
+    def read_uj(self):
+        with open(self._file) as f:
+            return int(f.read())
+
+    def delta_uj(self, before, after):
+        """Energy between two readings; the counter restarts from zero at max_energy_range_uj."""
+        return after - before if after >= before else after + self.max_range_uj - before
+
+
+def rapl_domains(root=POWERCAP_ROOT):
+    """Readable top-level package domains. Subdomains (core, uncore, dram) are part of a package
+    or measured separately; summing packages only avoids double counting."""
+    domains = []
+    for path in sorted(glob.glob(os.path.join(root, "intel-rapl:*"))):
+        if os.path.basename(path).count(":") != 1:
+            continue
+        try:
+            domain = RaplDomain(path)
+            domain.read_uj()
+        except (OSError, ValueError):
+            continue  # energy_uj is root-only on kernels patched for CVE-2020-8694
+        if domain.name.startswith("package"):
+            domains.append(domain)
+    return domains
+
+
+class RaplSampler:
+    name = "rapl"
+
+    def __init__(self, root=POWERCAP_ROOT, interval=SAMPLE_INTERVAL_SECONDS):
+        self.domains = rapl_domains(root)
+        if not self.domains:
+            raise OSError(f"No readable RAPL package domains under {root}")
+        self.interval = interval
+        self._thread = None
+
+    def _read(self):
+        return time.perf_counter(), [d.read_uj() for d in self.domains]
+
+    def _sample(self):
+        now, readings = self._read()
+        joules = sum(d.delta_uj(b, a) for d, b, a in zip(self.domains, self._last, readings)) / 1e6
+        if now > self._last_time:
+            self._peak = max(self._peak, joules / (now - self._last_time))
+        self._joules += joules
+        self._samples += 1
+        self._last_time, self._last = now, readings
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._joules, self._peak, self._samples = 0.0, 0.0, 0
+        self._started, self._last = self._read()
+        self._last_time = self._started
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()  # Close the window at the exact stop time
+        seconds = self._last_time - self._started
+        avg = self._joules / seconds if seconds > 0 else 0.0
+        return {**empty_result(self.name, seconds), "samples": self._samples, "energy_joules": self._joules,
+                "avg_cpu_power": avg, "peak_power": max(self._peak, avg)}
+
+
+class PowermetricsSampler:
+    name = "powermetrics"
+
+    def __init__(self, interval_ms=POWERMETRICS_INTERVAL_MS):
+        if shutil.which("powermetrics") is None:
+            raise OSError("powermetrics not found")
+        self.interval_ms = interval_ms
+
+    def start(self):
+        self._started = time.perf_counter()
+        # -n: fail instead of prompting for a password in the middle of a benchmark
+        self._proc = subprocess.Popen(
+            ["sudo", "-n", "powermetrics", "-i", str(self.interval_ms), "--samplers", "cpu_power,gpu_power"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    def stop(self):
+        seconds = time.perf_counter() - self._started
+        self._proc.terminate()
+        output, _ = self._proc.communicate()
+        cpu, gpu = [], []
+        for line in output.splitlines():
+            if "mW" not in line:
+                continue
+            try:
+                value = float(line.split(":")[1].strip().split()[0]) / 1000  # mW to W
+            except (IndexError, ValueError):
+                continue
+            if "CPU Power" in line:
+                cpu.append(value)
+            elif "GPU Power" in line:
+                gpu.append(value)
+        if not cpu and not gpu:
+            print("[WARN] powermetrics reported no samples")
+            return empty_result(self.name, seconds)
+        avg_cpu = sum(cpu) / len(cpu) if cpu else 0.0
+        avg_gpu = sum(gpu) / len(gpu) if gpu else 0.0
+        totals = [c + g for c, g in zip(cpu, gpu)] or cpu or gpu
+        return {**empty_result(self.name, seconds), "samples": max(len(cpu), len(gpu)),
+                "energy_joules": (avg_cpu + avg_gpu) * seconds, "avg_cpu_power": avg_cpu,
+                "avg_gpu_power": avg_gpu, "peak_power": max(totals)}
+
+
+SAMPLERS = {"rapl": RaplSampler, "powermetrics": PowermetricsSampler, "none": NullSampler}
+
+
+def get_sampler(name="auto"):
+    """The named backend, or with "auto" the first one that works on this host."""
+    if name != "auto":
+        return SAMPLERS[name]()
+    candidates = ["powermetrics", "rapl"] if platform.system() == "Darwin" else ["rapl"]
+    for candidate in candidates:
+        try:
+            return SAMPLERS[candidate]()
+        except OSError as e:
+            print(f"[WARN] Energy backend {candidate} unavailable: {e}")
+    print("[WARN] No energy backend available; power will be recorded as 0")
+    return NullSampler()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    sampler = get_sampler(sys.argv[1] if len(sys.argv) > 1 else "auto")
+    sampler.start()
+    time.sleep(1.0)
+    print(json.dumps(sampler.stop(), indent=2))
@@ -1,15 +1,29 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, cross_val_score, KFold
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
 import os
+import sys
 import math
 import json
+from flat_forest import FlatForest, QUANTILES, residual_offsets
+from model_registry import registry
+from feedback import FEEDBACK_PATH
+from generation_model import GenerationModel, fit_generation_model, GENERATION_MODEL_PATH
+from resource_model import ResourceModel, fit_resource_model, RESOURCE_MODEL_PATH
+from host_calibration import CALIBRATION_FEATURES
+from hardware_classes import fit_hardware_classes
+from inference_variants import VARIANT_FEATURES, add_variant_features
+from training_pipeline import (StageTimer, load_training_frame, search, subsample, fit_rows, N_JOBS, REPORT_PATH,
+                               TRAINING_TIME_BUDGET_SECONDS, SEARCH_BUDGET_FRACTION, FIT_BUDGET_FRACTION,
+                               SEARCH_MAX_ROWS)
+from benchmark_store import BenchmarkStore, TEXT_COLUMNS
 
-DATA_PATH = "data/benchmarks.csv"
 MODEL_PATH = "runtime_predictor.pkl"
+COMPILED_MODEL_PATH = "runtime_predictor.npz"
+store = BenchmarkStore()  # data/benchmarks, converted from data/benchmarks.csv on first use
 
 # Add token/input related features here
 FEATURE_COLS = [
@@ -18,16 +32,115 @@ FEATURE_COLS = [
 ]
 
 TARGET = "inference_time"
+TEST_SIZE = 0.2
+MIN_HOLDOUT_ROWS = 20  # Fewer held-out rows than this cannot place a p90, let alone a p99
+
+def export_forest(reg, feature_names, X_held=None, y_held=None):
+    """Flatten a fitted RandomForestRegressor or GradientBoostingRegressor into FlatForest arrays.
+
+    FlatForest averages its trees, so boosted leaf values are scaled by learning_rate * n_trees
+    and shifted by the initial prediction; the mean then equals the boosted sum. Boosted trees
+    carry no spread, so their quantiles come from the residuals on the held-out (X_held, y_held);
+    a forest's per-tree quantiles are checked against those rows and replaced the same way if
+    they under-cover them.
+    """
+    boosted = isinstance(reg, GradientBoostingRegressor)
+    if boosted:
+        estimators = list(reg.estimators_[:, 0])
+        scale = reg.learning_rate * len(estimators)
+        bias = float(np.ravel(reg.init_.predict(np.zeros((1, reg.n_features_in_))))[0])
+    else:
+        estimators = list(reg.estimators_)
+        scale, bias = 1.0, 0.0
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in (est.tree_ for est in estimators):
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        index = np.arange(n)
+        # Leaves loop back to themselves so a fixed number of steps always ends on a leaf
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, index, tree.children_left) + offset)
+        rights.append(np.where(leaf, index, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0] * scale + bias)
+        roots.append(offset)
+        offset += n
+    flat = FlatForest(
+        np.concatenate(features).astype(np.int32),
+        np.concatenate(thresholds).astype(np.float64),
+        np.concatenate(lefts).astype(np.int32),
+        np.concatenate(rights).astype(np.int32),
+        np.concatenate(values).astype(np.float64),
+        np.array(roots, dtype=np.int32),
+        max(est.tree_.max_depth for est in estimators),
+        list(feature_names),
+    )
+    if X_held is not None and len(X_held):
+        X_held, y_held = np.asarray(X_held), np.asarray(y_held, dtype=float)
+        if boosted:
+            flat.residual_quantiles = residual_offsets(y_held - flat.predict(X_held))
+        else:
+            flat.calibrate(X_held, y_held)
+    return flat
+
+def save_compiled(reg, feature_names, X_check, X_held=None, y_held=None, path=COMPILED_MODEL_PATH):
+    """Export the forest and refuse to return it unless it reproduces sklearn's predictions
+    on (at most SEARCH_MAX_ROWS rows of) X_check; it is also written to `path` unless that is None."""
+    flat = export_forest(reg, feature_names, X_held, y_held)
+    X_check, _ = subsample(X_check, max_rows=SEARCH_MAX_ROWS)
+    expected = reg.predict(X_check)
+    actual = flat.predict(np.asarray(X_check))
+    if not np.allclose(actual, expected, rtol=1e-9, atol=1e-12):
+        raise RuntimeError(f"Compiled forest diverges from sklearn (max abs diff {np.max(np.abs(actual - expected)):.3g})")
+    if path is not None:
+        flat.save(path)
+        print(f"Compiled model saved to {path} (parity checked on {len(expected)} rows)")
+    return flat
+
+def selected_models():
+    """Models named with --model (repeatable); None means all of them.
+
+    Only the generation and resources subcommands take it: they refit per-model groups and keep
+    the saved fits of other models, while the runtime estimator is one model over all rows."""
+    models = [sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1]) if arg == "--model"]
+    return models or None
+
+
+def read_benchmarks(models=None):
+    """Benchmark rows of `models` (or all), without the text columns no model is fitted on."""
+    return store.read([col for col in store.columns(models) if col not in TEXT_COLUMNS], models=models)
+
 
 def train_estimator():
-    # Load data, ignore comment lines
-    df = pd.read_csv(DATA_PATH, comment="#")
+    timer = StageTimer()
+    budget = TRAINING_TIME_BUDGET_SECONDS
+
+    # Load benchmarks plus the predicted-vs-actual pairs logged by app.py (unless --no-feedback);
+    # the frame is cached until the data changes
+    with timer.stage("load"):
+        feedback_path = None if "--no-feedback" in sys.argv else FEEDBACK_PATH
+        df, benchmark_rows, feedback_rows, cache_hit = load_training_frame(
+            store, feedback_path, FEATURE_COLS + CALIBRATION_FEATURES, TARGET)
+    print(f"Training on {benchmark_rows} benchmark rows + {feedback_rows} feedback rows"
+          f"{' (cached frame)' if cache_hit else ''}")
+
+    with timer.stage("generation_model"):
+        fit_generation(df)
+    with timer.stage("resource_model"):
+        fit_resources(df)
 
     # Drop rows with missing values in features or target
     df = df.dropna(subset=FEATURE_COLS + [TARGET])
 
+    # Measured host capability lets the model transfer across machines; older rows predate it
+    calibration_cols = [col for col in CALIBRATION_FEATURES if col in df.columns and df[col].notna().any()]
+    # One column per inference variant that was benchmarked; app.py only quotes variants the model has seen
+    df = add_variant_features(df)
+    variant_cols = [col for col in VARIANT_FEATURES if df[col].any()]
+
     # Fill NaNs in features with 0 (if any remain)
-    X = df[FEATURE_COLS].fillna(0)
+    X = df[FEATURE_COLS + variant_cols + calibration_cols].fillna(0)
     y = df[TARGET]
 
     # When preparing features for training or prediction, include input_token_length and output_token_length
@@ -44,18 +157,27 @@ def train_estimator():
 
     # Split train/test sets
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+        X, y, test_size=TEST_SIZE, random_state=42
     )
 
-    # Cross-validation
-    kf = KFold(n_splits=5, shuffle=True, random_state=42)
-    reg_cv = RandomForestRegressor(n_estimators=100, random_state=42)
-    cv_scores = cross_val_score(reg_cv, X, y, cv=kf, scoring="neg_mean_absolute_error")
-    print(f"Cross-validated MAE (5-fold): {abs(np.mean(cv_scores)):.4f} ± {np.std(cv_scores):.4f}")
+    # Model search: parallel cross-validation over forest and boosting candidates within the budget.
+    # Only training rows take part, so the test metrics below are not biased by model selection
+    print("Searching models (5-fold CV):")
+    with timer.stage("search"):
+        reg, search_results, search_rows = search(X_train, y_train, budget * SEARCH_BUDGET_FRACTION)
+    best = min(search_results, key=lambda r: r["cv_mae"])
+    cv_mae, cv_std = best["cv_mae"], best["cv_mae_std"]
+    print(f"Selected {best['family']} {best['params']}: cross-validated MAE {cv_mae:.4f} ± {cv_std:.4f}")
 
-    # Train model
-    reg = RandomForestRegressor(n_estimators=100, random_state=42)
-    reg.fit(X_train, y_train)
+    # Train model on as many rows as the selected candidate's measured cost fits in its share of what is left
+    if "n_jobs" in reg.get_params():
+        reg.set_params(n_jobs=N_JOBS)
+    fit_budget = (budget - timer.elapsed()) * FIT_BUDGET_FRACTION
+    X_fit, y_fit = subsample(X_train, y_train, fit_rows(best, search_rows, fit_budget))
+    if len(X_fit) < len(X_train):
+        print(f"[INFO] Fitting on {len(X_fit)} of {len(X_train)} training rows to stay within the budget")
+    with timer.stage("fit"):
+        reg.fit(X_fit, y_fit)
 
     # Predict on test set
     y_pred = reg.predict(X_test)
@@ -67,17 +189,157 @@ def train_estimator():
 
     print(f"MAE: {mae:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
 
+    # The test rows are split again: one half calibrates the runtime quantiles, the other measures
+    # their coverage, so the reported coverage is out of sample
+    if len(X_test) >= 2:
+        X_cal, X_eval, y_cal, y_eval = train_test_split(X_test, y_test, test_size=0.5, random_state=42)
+    else:
+        X_cal, X_eval, y_cal, y_eval = X_test, X_test.iloc[:0], y_test, y_test.iloc[:0]
+
     # Save model
-    joblib.dump(reg, MODEL_PATH)
-    print(f"Model saved to {MODEL_PATH}")
+    # The root pickle and .npz are what app.py serves without a live registry version, so an
+    # unpromoted candidate only goes into the registry
+    promote = "--no-promote" not in sys.argv
+    with timer.stage("export"):
+        if promote:
+            joblib.dump(reg, MODEL_PATH)
+            print(f"Model saved to {MODEL_PATH}")
+        flat = save_compiled(reg, X.columns, X, X_cal, y_cal, COMPILED_MODEL_PATH if promote else None)
+    # Placement reserves on p90, so the quantiles it gets must cover rows they were not calibrated on
+    covered = flat.coverage(np.asarray(X_eval), y_eval) if len(X_eval) else [float("nan")] * len(QUANTILES)
+    coverage = {"rows": int(len(X_eval)),
+                **{f"p{round(q * 100)}": round(float(c), 4) for q, c in zip(QUANTILES, covered)}}
+    print(f"Quantile coverage on {len(X_eval)} evaluation rows: {coverage}"
+          f"{' (residual quantiles)' if flat.residual_quantiles is not None else ''}")
+
+    # One model per hardware class, same family and settings as the global one;
+    # requests on unfamiliar hardware fall back to the global model, as do classes the budget has no time left for
+    # Classes are fitted on training rows only. Each holds out its own rows for its quantiles;
+    # too small a class to spare them is fitted on all its rows and borrows the global calibration half
+    def fit_class_forest(X_class, y_class):
+        remaining = budget - timer.elapsed()
+        if remaining <= 0:
+            print(f"[WARN] Training budget of {budget}s spent; class with {len(X_class)} rows uses the global model")
+            return None
+        X_class, y_class = subsample(X_class, y_class, fit_rows(best, search_rows, remaining))
+        if len(X_class) * TEST_SIZE >= MIN_HOLDOUT_ROWS:
+            X_class, X_held, y_class, y_held = train_test_split(X_class, y_class, test_size=TEST_SIZE,
+                                                                random_state=42)
+        else:
+            X_held, y_held = X_cal, y_cal
+        class_reg = clone(reg)
+        class_reg.fit(X_class, y_class)
+        return export_forest(class_reg, X.columns, X_held, y_held)
+
+    with timer.stage("hardware_classes"):
+        router = fit_hardware_classes(df.loc[X_train.index], X_train, y_train, fit_class_forest)
+    if router is not None:
+        print(f"Hardware classes: {len(router.classes)} ({len(router.forests)} with their own model)")
+
+    # Register the new version; the server and app.py switch to it on promote, without a restart
+    version = registry.register(flat, {
+        "target": TARGET,
+        "training_data": os.path.abspath(store.root),
+        "training_data_fingerprint": store.fingerprint(),
+        "training_rows": int(len(df)),
+        "benchmark_rows": int(benchmark_rows),
+        "feedback_rows": int(feedback_rows),
+        "metrics": {"cv_mae": cv_mae, "cv_mae_std": cv_std, "mae": mae, "rmse": rmse, "r2": r2},
+        "quantile_coverage": coverage,
+        "model_family": best["family"],
+        "params": best["params"],
+        "hardware_classes": router.classes if router is not None else [],
+    }, router=router)
+    if not promote:
+        print(f"Registered model version {version} (not promoted)")
+    else:
+        registry.promote(version)
+        print(f"Registered and promoted model version {version}")
 
     # Save feature importances
-    importances = dict(zip(FEATURE_COLS, reg.feature_importances_))
+    importances = dict(zip(X.columns, reg.feature_importances_))
     os.makedirs("results", exist_ok=True)
     with open("results/feature_importance.json", "w") as f:
         json.dump(importances, f, indent=2)
     print("Feature importances saved to results/feature_importance.json")
 
+    # Training-time report: where the time went and what the search tried
+    report = {
+        "rows": int(len(df)),
+        "benchmark_rows": int(benchmark_rows),
+        "feedback_rows": int(feedback_rows),
+        "frame_cache_hit": cache_hit,
+        "cpu_count": os.cpu_count(),
+        "budget_seconds": budget,
+        "search_rows": int(search_rows),
+        "stages": timer.stages,
+        "total_seconds": round(timer.elapsed(), 4),
+        "search": search_results,
+        "selected": best,
+        "quantile_coverage": coverage,
+        "version": version,
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Training took {report['total_seconds']:.1f}s of a {budget}s budget; report saved to {REPORT_PATH}")
+
+
+def fit_generation(df, models=None):
+    """Fit the prefill/decode model on benchmark rows that timed a full generation.
+
+    With `models`, only their groups are refit; the saved fits of other models are kept."""
+    generation = fit_generation_model(df)
+    if not generation.groups:
+        print("[WARN] No benchmark rows with output_generation_time; generation model not updated")
+        return
+    if models and os.path.exists(GENERATION_MODEL_PATH):
+        generation.groups = {**GenerationModel.load(GENERATION_MODEL_PATH).groups, **generation.groups}
+    generation.save(GENERATION_MODEL_PATH)
+    for key, coef in generation.groups.items():
+        print(f"Generation model {key}: prefill={coef['prefill']}, decode={coef['decode']}, MAE={coef['mae']:.4f}s")
+    print(f"Generation model saved to {GENERATION_MODEL_PATH}")
+
+
+def fit_resources(df, models=None):
+    """Fit the peak-memory and load-time model on benchmark rows that measured them.
+
+    With `models`, only their groups are refit; other models and the cross-model fit are kept."""
+    resources = fit_resource_model(df)
+    if not resources.groups and not resources.global_fit:
+        print("[WARN] No benchmark rows with peak_rss_bytes or load_time; resource model not updated")
+        return
+    if models and os.path.exists(RESOURCE_MODEL_PATH):
+        saved = ResourceModel.load(RESOURCE_MODEL_PATH)
+        resources = ResourceModel({**saved.groups, **resources.groups}, saved.global_fit or resources.global_fit)
+    resources.save(RESOURCE_MODEL_PATH)
+    for key, fit in resources.groups.items():
+        memory = f"peak={fit['memory'][0] / 2**20:.0f}MB + {fit['memory'][1] / 1024:.1f}KB/token" if "memory" in fit else "no memory fit"
+        print(f"Resource model {key}: {memory}, load={fit.get('load_seconds', float('nan')):.2f}s")
+    print(f"Resource model saved to {RESOURCE_MODEL_PATH}")
+
+
+def export_existing():
+    """Compile the saved runtime_predictor.pkl without retraining."""
+    reg = joblib.load(MODEL_PATH)
+    feature_names = list(getattr(reg, "feature_names_in_", FEATURE_COLS))
+    df = add_variant_features(store.read(feature_names + ["variant"]))
+    X = df.reindex(columns=feature_names).fillna(0)
+    save_compiled(reg, feature_names, X)
+
 
 if __name__ == "__main__":
-    train_estimator()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if selected_models() and command not in ("generation", "resources"):
+        print("[ERROR] --model only applies to the generation and resources subcommands; "
+              "the runtime estimator is trained on every model")
+        sys.exit(2)
+    # The one-time CSV conversion happens here, never on app.py's read path
+    store.migrate()
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        export_existing()
+    elif len(sys.argv) > 1 and sys.argv[1] == "generation":
+        fit_generation(read_benchmarks(selected_models()), selected_models())
+    elif len(sys.argv) > 1 and sys.argv[1] == "resources":
+        fit_resources(read_benchmarks(selected_models()), selected_models())
+    else:
+        train_estimator()
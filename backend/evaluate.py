@@ -1,103 +1,332 @@
 """
-Evaluation script to compare ML estimator vs heuristic model for inference time prediction.
+Evaluation script to compare the ML estimator and the roofline estimate for inference time prediction.
+- Both models are scored column-wise (no per-row Python), so multi-million-row benchmark sets take seconds
+- Metrics are reported overall and grouped by model, hardware, inference variant, sequence-length
+  bucket and batch size
+- Calibration curves compare mean predicted and actual runtime per predicted-runtime decile, and the
+  live forest's p50/p90/p99 are checked against how often the actual runtime stays below them
+- Absolute and relative error percentiles show the tail the averages hide
+- Only the columns evaluation needs are read from the benchmark dataset, and with --model only
+  that model's partitions
+- The estimator evaluated is the one being served: the live registry version, else the sklearn
+  pickle, else the roofline; its version is recorded in the report
+- The report is written to results/evaluation_report.json, which /api/pipeline/info serves;
+  the actual-vs-predicted plot is only drawn with --plot (matplotlib is optional)
+
+Usage: python evaluate.py [--plot] [--data path/to/dataset] [--model NAME ...]
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 import json
-import os
 import math
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import roofline
+from benchmark_store import BenchmarkStore
+from inference_variants import BYTES_PER_PARAM, DEFAULT_VARIANT, add_variant_features
 
 ESTIMATOR_PATH = "runtime_predictor.pkl"
-DATA_PATH = "data/benchmarks.csv"
 PLOT_PATH = "results/evaluation_plots.png"
 REPORT_PATH = "results/evaluation_report.json"
 
-# Try to load ML estimator if available
-try:
-    import joblib
-    estimator = joblib.load(ESTIMATOR_PATH)
-    use_ml = True
-    print("[INFO] ML estimator loaded successfully.")
-except Exception as e:
-    estimator = None
-    use_ml = False
-    print(f"[INFO] ML estimator not found or failed to load: {e}")
-    print("[INFO] Using heuristic model instead.")
-
-def heuristic_predict(row):
+TARGET = "inference_time"
+FEATURE_COLS = [
+    "num_params", "flops", "num_layers", "cpu_frequency", "num_cores",
+    "sequence_length", "batch_size", "input_size"
+]
+ROOFLINE_COLS = ["num_params", "flops", "cpu_frequency", "num_cores", "sequence_length", "batch_size",
+                 "peak_gflops", "memory_gbps"]
+GROUP_COLS = {"model": "model", "hardware": "device", "variant": "variant", "sequence_length": "sequence_length",
+              "batch_size": "batch_size"}
+SEQUENCE_BUCKETS = [0, 32, 128, 512, 2048, 8192]  # Lower edges; the last bucket is open-ended
+CALIBRATION_BINS = 10
+ERROR_PERCENTILES = (50, 90, 95, 99)
+QUANTILE_SAMPLE_ROWS = 200_000  # Per-tree quantiles are (rows x trees); a sample is plenty for coverage
+PREDICT_CHUNK_ROWS = 50_000
+PLOT_SAMPLE_ROWS = 10_000
+RANDOM_STATE = 42
+
+
+def load_estimator():
+    """(model, kind, version): the live registry FlatForest, else the sklearn pickle, else the
+    roofline (None, None, None); the same order app.py serves them in."""
+    try:
+        from model_registry import registry
+        version, model = registry.live()
+        if model is not None:
+            print(f"[INFO] Using live compiled estimator {version}.")
+            return model, "flat", version
+    except Exception as e:
+        print(f"[INFO] Compiled estimator failed to load: {e}")
+    try:
+        import joblib
+        model = joblib.load(ESTIMATOR_PATH)
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=-1)
+        print("[INFO] No live estimator version; sklearn pickle loaded instead.")
+        return model, "sklearn", "pickle"
+    except Exception as e:
+        print(f"[INFO] ML estimator not found or failed to load: {e}")
+    print("[INFO] Using roofline estimate instead.")
+    return None, None, None
+
+
+def live_forest():
     try:
-        flops = float(row.get("flops", 0))
-        cpu_freq_ghz = float(row.get("cpu_frequency", 1))
-        num_cores = float(row.get("num_cores", 1))
-        inefficiency_factor = 2.0  # empirically determined inefficiency factor
-        cpu_freq_hz = cpu_freq_ghz * 1e9  # GHz to Hz
-        if cpu_freq_hz == 0 or num_cores == 0:
-            return np.nan
-        return flops / (cpu_freq_hz * num_cores) * inefficiency_factor
+        from model_registry import registry
+        return registry.live()[1]
     except Exception:
-        return np.nan
+        return None
+
+
+def load_frame(store, models=None):
+    """Only the columns evaluation reads, so wide text columns are never read."""
+    wanted = sorted(set(FEATURE_COLS + ROOFLINE_COLS + list(GROUP_COLS.values()) + [TARGET]))
+    df = store.read(wanted, models=models)
+    df = df.dropna(subset=[TARGET]).reset_index(drop=True)
+    # Rows from before the variant column are eager; the roofline reads int8 weights as one byte
+    df["variant"] = df["variant"].fillna(DEFAULT_VARIANT) if "variant" in df.columns else DEFAULT_VARIANT
+    df["bytes_per_param"] = df["variant"].map(BYTES_PER_PARAM)
+    return add_variant_features(df)
+
+
+def predict_chunked(predict, X, chunk=PREDICT_CHUNK_ROWS):
+    return np.concatenate([predict(X[i:i + chunk]) for i in range(0, len(X), chunk)]) if len(X) else np.empty(0)
+
+
+def finite(value):
+    """JSON-safe float: NaN and inf (e.g. R2 of a constant group) become null."""
+    value = float(value)
+    return value if math.isfinite(value) else None
 
-def main():
-    # Ensure results directory exists
-    os.makedirs("results", exist_ok=True)
 
-    # Load dataset
-    df = pd.read_csv(DATA_PATH)
+def metrics(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    ok = np.isfinite(y_pred)
+    y_true, y_pred = y_true[ok], y_pred[ok]
+    if len(y_true) == 0:
+        return {"rows": 0}
+    err = y_pred - y_true
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.corrcoef(y_true, y_pred)[0, 1] if len(y_true) > 1 else np.nan
+        r2 = 1 - np.sum(err ** 2) / ss_tot
+    return {
+        "rows": int(len(y_true)),
+        "mae": finite(np.mean(np.abs(err))),
+        "rmse": finite(np.sqrt(np.mean(err ** 2))),
+        "r2": finite(r2),
+        "correlation": finite(corr),
+        "bias": finite(np.mean(err)),
+    }
+
+
+def error_percentiles(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=float)
+    err = np.abs(np.asarray(y_pred, dtype=float) - y_true)
+    ok = np.isfinite(err)
+    if not ok.any():
+        return {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = err / np.abs(y_true)
+    relative = relative[ok & np.isfinite(relative)]
+    absolute = np.percentile(err[ok], ERROR_PERCENTILES)
+    result = {f"abs_p{p}": finite(v) for p, v in zip(ERROR_PERCENTILES, absolute)}
+    if len(relative):
+        result.update({f"rel_p{p}": finite(v) for p, v in zip(ERROR_PERCENTILES, np.percentile(relative, ERROR_PERCENTILES))})
+    return result
+
+
+def sequence_bucket(values):
+    edges = SEQUENCE_BUCKETS + [np.inf]
+    labels = [f"{lo}-{hi - 1}" for lo, hi in zip(SEQUENCE_BUCKETS, SEQUENCE_BUCKETS[1:])] + [f"{SEQUENCE_BUCKETS[-1]}+"]
+    return pd.cut(values, bins=edges, labels=labels, right=False)
+
 
-    # Drop rows missing target inference_time
-    df = df.dropna(subset=["inference_time"])
+def grouped_metrics(keys, y_true, predictions):
+    """{group: {model: {rows, mae, rmse, r2, bias, abs_p90}}}, from bincounts over integer group codes."""
+    codes, uniques = pd.factorize(keys, sort=True)
+    y_true = np.asarray(y_true, dtype=float)
+    k = len(uniques)
+    # Row indices grouped by code; a stable sort of small integers is a radix sort
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(k + 1))
+    groups = {}
+    for model, y_pred in predictions.items():
+        err = np.asarray(y_pred, dtype=float) - y_true
+        ok = (codes >= 0) & np.isfinite(err)
+        c = np.where(ok, codes, k)  # Unusable rows go to an overflow bin that is never reported
+        rows = np.bincount(c, minlength=k + 1)[:k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_true = np.bincount(c, weights=np.where(ok, y_true, 0), minlength=k + 1)[:k] / rows
+            sse = np.bincount(c, weights=np.where(ok, err, 0) ** 2, minlength=k + 1)[:k]
+            centered = np.where(ok, y_true - np.append(mean_true, 0)[c], 0)
+            sst = np.bincount(c, weights=centered ** 2, minlength=k + 1)[:k]
+            mae = np.bincount(c, weights=np.where(ok, np.abs(err), 0), minlength=k + 1)[:k] / rows
+            bias = np.bincount(c, weights=np.where(ok, err, 0), minlength=k + 1)[:k] / rows
+            r2 = 1 - sse / sst
+        abs_err = np.abs(err)
+        for i in range(k):
+            if not rows[i]:
+                continue
+            group_err = abs_err[order[bounds[i]:bounds[i + 1]]]
+            groups.setdefault(str(uniques[i]), {})[model] = {
+                "rows": int(rows[i]), "mae": finite(mae[i]), "rmse": finite(math.sqrt(sse[i] / rows[i])),
+                "r2": finite(r2[i]), "bias": finite(bias[i]),
+                "abs_p90": finite(np.percentile(group_err[np.isfinite(group_err)], 90)),
+            }
+    return groups
 
-    # Define features for ML model
-    feature_cols = [
-        "num_params", "flops", "num_layers", "cpu_frequency", "num_cores",
-        "sequence_length", "batch_size", "input_size"
+
+def calibration_curve(y_true, y_pred, bins=CALIBRATION_BINS):
+    """Mean predicted vs mean actual runtime per equal-count bin of predicted runtime."""
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    ok = np.isfinite(y_pred)
+    y_true, y_pred = y_true[ok], y_pred[ok]
+    if len(y_pred) == 0:
+        return []
+    bins = min(bins, len(y_pred))
+    rank = np.empty(len(y_pred), dtype=np.int64)
+    rank[np.argsort(y_pred, kind="stable")] = np.arange(len(y_pred))
+    bin_index = rank * bins // len(y_pred)
+    counts = np.bincount(bin_index, minlength=bins)
+    mean_pred = np.bincount(bin_index, weights=y_pred, minlength=bins) / counts
+    mean_true = np.bincount(bin_index, weights=y_true, minlength=bins) / counts
+    return [
+        {"bin": i, "rows": int(n), "mean_predicted": finite(p), "mean_actual": finite(a),
+         "ratio": finite(a / p) if p else None}
+        for i, (n, p, a) in enumerate(zip(counts, mean_pred, mean_true))
     ]
 
-    # Prepare input for prediction
-    X = df[feature_cols].fillna(0)
-    y_true = df["inference_time"]
 
-    # Predict using ML estimator or heuristic
-    if use_ml:
-        y_pred = estimator.predict(X)
-    else:
-        y_pred = df.apply(heuristic_predict, axis=1)
+def quantile_coverage(forest, X, y_true):
+    """Share of rows whose actual runtime is at or below each predicted quantile (ideal: the quantile)."""
+    from flat_forest import QUANTILES
+    if len(X) > QUANTILE_SAMPLE_ROWS:
+        sample = np.random.default_rng(RANDOM_STATE).choice(len(X), QUANTILE_SAMPLE_ROWS, replace=False)
+        X, y_true = X[sample], y_true[sample]
+    quantiles = predict_chunked(forest.predict_quantiles, X).reshape(-1, len(QUANTILES))
+    covered = (y_true[:, None] <= quantiles).mean(axis=0)
+    return {
+        "rows": int(len(y_true)),
+        **{f"p{round(q * 100)}": finite(c) for q, c in zip(QUANTILES, covered)},
+    }
+
 
-    # Evaluation metrics
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = math.sqrt(mean_squared_error(y_true, y_pred))
-    r2 = r2_score(y_true, y_pred)
-    corr = np.corrcoef(y_true, y_pred)[0, 1]
+def plot(y_true, y_pred, y_roofline, label):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-    # Plot Actual vs Predicted
+    if len(y_true) > PLOT_SAMPLE_ROWS:
+        sample = np.random.default_rng(RANDOM_STATE).choice(len(y_true), PLOT_SAMPLE_ROWS, replace=False)
+        y_true, y_pred, y_roofline = y_true[sample], y_pred[sample], y_roofline[sample]
     plt.figure(figsize=(6, 6))
-    plt.scatter(y_true, y_pred, alpha=0.7, edgecolors='k')
+    plt.scatter(y_true, y_pred, alpha=0.7, edgecolors='k', label=label)
+    if y_pred is not y_roofline:
+        plt.scatter(y_true, y_roofline, alpha=0.7, marker='^', edgecolors='k', label="roofline")
     plt.plot([y_true.min(), y_true.max()], [y_true.min(), y_true.max()], 'r--')
     plt.xlabel("Actual Runtime (s)")
     plt.ylabel("Predicted Runtime (s)")
     plt.title("Actual vs. Predicted Inference Runtime")
+    plt.legend()
     plt.tight_layout()
     plt.savefig(PLOT_PATH)
     plt.close()
 
-    # Prepare report
+
+def evaluate(df, estimator=None, kind=None, forest=None):
+    """Full report for the benchmark rows in `df`; see the module docstring for its sections."""
+    timings = {}
+    start = time.perf_counter()
+    y_true = df[TARGET].to_numpy(dtype=float)
+
+    # The roofline estimate needs no training, so it is always reported next to the ML model
+    y_roofline = roofline.predict_runtime_frame(df)
+    predictions = {"roofline": y_roofline}
+    timings["roofline"] = time.perf_counter() - start
+
+    if estimator is not None:
+        start = time.perf_counter()
+        if kind == "sklearn":
+            feature_cols = list(getattr(estimator, "feature_names_in_", FEATURE_COLS))
+            X = df.reindex(columns=feature_cols).fillna(0)
+            predictions["ml"] = np.asarray(estimator.predict(X), dtype=float)
+        else:
+            X = df.reindex(columns=estimator.feature_names).fillna(0).to_numpy(dtype=float)
+            predictions["ml"] = predict_chunked(estimator.predict, X)
+        timings["ml"] = time.perf_counter() - start
+    primary = "ml" if "ml" in predictions else "roofline"
+
+    start = time.perf_counter()
+    keys = {}
+    for name, col in GROUP_COLS.items():
+        if col in df:
+            keys[name] = sequence_bucket(df[col]) if name == "sequence_length" else df[col]
+    # {group: {value: {model: metrics}}}, so the ML and roofline numbers of a group sit side by side
+    groups = {name: grouped_metrics(key, y_true, predictions) for name, key in keys.items()}
+    timings["groups"] = time.perf_counter() - start
+
+    start = time.perf_counter()
     report = {
-        "mae": mae,
-        "rmse": rmse,
-        "r2": r2,
-        "correlation": corr,
-        "plot": PLOT_PATH,
-        "model_used": "ML estimator" if use_ml else "heuristic"
+        **metrics(y_true, predictions[primary]),
+        "model_used": "ML estimator" if primary == "ml" else "roofline",
+        "roofline": metrics(y_true, y_roofline),
+        "error_percentiles": {model: error_percentiles(y_true, y_pred) for model, y_pred in predictions.items()},
+        "calibration": {model: calibration_curve(y_true, y_pred) for model, y_pred in predictions.items()},
+        "groups": groups,
     }
+    if forest is not None:
+        X = df.reindex(columns=forest.feature_names).fillna(0).to_numpy(dtype=float)
+        report["quantile_coverage"] = quantile_coverage(forest, X, y_true)
+    timings["calibration"] = time.perf_counter() - start
+    report["timings"] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    return report, y_true, predictions
+
+
+def main():
+    # A dataset given with --data is read as is; only the default one converts the legacy CSV
+    store = BenchmarkStore(sys.argv[sys.argv.index("--data") + 1], legacy_csv=None) if "--data" in sys.argv \
+        else BenchmarkStore()
+    store.migrate()
+    models = [sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1]) if arg == "--model"] or None
+
+    # Ensure results directory exists
+    os.makedirs("results", exist_ok=True)
+
+    start = time.perf_counter()
+    df = load_frame(store, models)
+    load_seconds = time.perf_counter() - start
 
-    print(json.dumps(report, indent=2))
+    estimator, kind, version = load_estimator()
+    report, y_true, predictions = evaluate(df, estimator, kind, forest=live_forest())
+    # Labelled like app.py's feedback rows: a registry version, "pickle", or "roofline"
+    report["estimator_version"] = version or "roofline"
+    report["timings"] = {"load": round(load_seconds, 4), **report["timings"]}
+
+    report["plot"] = None
+    if "--plot" in sys.argv:
+        try:
+            label = "ML estimator" if "ml" in predictions else "roofline"
+            plot(y_true, predictions.get("ml", predictions["roofline"]), predictions["roofline"], label)
+            report["plot"] = PLOT_PATH
+        except ImportError as e:
+            print(f"[WARN] Plot skipped, matplotlib is not installed: {e}")
+
+    summary = {k: v for k, v in report.items() if k not in ("groups", "calibration")}
+    print(json.dumps(summary, indent=2))
 
     # Save report
     with open(REPORT_PATH, "w") as f:
         json.dump(report, f, indent=2)
+    print(f"[INFO] Evaluated {len(df)} rows; report saved to {REPORT_PATH}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
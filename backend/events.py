@@ -0,0 +1,152 @@
+"""
+Server-Sent Events stream for scheduler job transitions and energy price updates.
+- One broadcaster keeps a bounded ring buffer of events and fans them out to every connected client
+- Job events carry only the fields that changed, price events only the points that changed
+- Clients resume with the Last-Event-ID header (or ?lastEventId=); a `reset` event asks them to refetch
+- Each open stream holds a server thread for as long as it is connected, and the broadcaster lives
+  in one process, so at most EVENT_STREAM_LIMIT streams are served; the rest of the worker's threads
+  stay free for the API, and refused clients get a 503 and fall back to polling
+"""
+import csv
+import json
+import os
+import threading
+from collections import deque
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+PRICE_PATH = os.path.join(BACKEND_ROOT, "data.csv")
+
+BUFFER_SIZE = 1000  # Events kept for clients that reconnect
+HEARTBEAT_SECONDS = 15  # Keeps proxies from closing idle streams; also the price file poll interval
+# Keep below gunicorn's --threads (render.yaml); the difference is what the API is left with
+EVENT_STREAM_LIMIT = int(os.environ.get("EVENT_STREAM_LIMIT", 24))
+
+stream_slots = threading.BoundedSemaphore(EVENT_STREAM_LIMIT)
+
+api_events = Blueprint('api_events', __name__)
+
+
+def format_event(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBroadcaster:
+    def __init__(self, buffer_size=BUFFER_SIZE, price_path=PRICE_PATH):
+        self.events = deque(maxlen=buffer_size)  # (event_id, event_type, data)
+        self.last_id = 0
+        self.condition = threading.Condition()
+        self.price_path = price_path
+        self.price_version = None
+        self.prices = {}
+
+    def publish(self, event_type, data):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, event_type, data))
+            self.condition.notify_all()
+            return self.last_id
+
+    def publish_job(self, job_id, status, **fields):
+        """Publish a job state transition; only the changed fields are sent."""
+        return self.publish('job', {'id': job_id, 'status': status, **fields})
+
+    def check_prices(self):
+        """Publish the changed price points if data.csv was rewritten since the last check."""
+        try:
+            version = os.stat(self.price_path).st_mtime_ns
+        except OSError:
+            return None
+        with self.condition:
+            if version == self.price_version:
+                return None
+            prices = {}
+            try:
+                with open(self.price_path, "r") as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            prices[row["datetime"]] = (float(row["price_eur_per_mwh"]), row.get("is_future") == "1")
+                        except Exception:
+                            continue  # Skip invalid rows
+            except Exception as e:
+                print(f"[WARN] Could not read price data: {e}")
+                return None
+            changed = [
+                {"datetime": dt, "price_eur_per_mwh": price, "is_future": is_future}
+                for dt, (price, is_future) in prices.items()
+                if self.prices.get(dt) != (price, is_future)
+            ]
+            removed = [dt for dt in self.prices if dt not in prices]
+            first = self.price_version is None
+            self.price_version, self.prices = version, prices
+            if first or not (changed or removed):
+                return None  # Clients get the initial prices from /api/predict
+        return self.publish('price', {'version': version, 'changed': changed, 'removed': removed})
+
+    def _since(self, last_event_id):
+        """Buffered events after `last_event_id`, or None if the buffer no longer reaches back that far."""
+        if last_event_id > self.last_id:
+            return None  # Ids from before a server restart
+        if last_event_id == self.last_id:
+            return []
+        oldest = self.events[0][0]
+        if last_event_id < oldest - 1:
+            return None
+        return [event for event in self.events if event[0] > last_event_id]
+
+    def stream(self, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Yield SSE frames forever, starting after `last_event_id` (or at the live tail)."""
+        with self.condition:
+            cursor = self.last_id if last_event_id is None else last_event_id
+        yield "retry: 3000\n\n"
+        while True:
+            with self.condition:
+                events = self._since(cursor)
+                if events == []:
+                    self.condition.wait(timeout=heartbeat)
+                    events = self._since(cursor)
+                if events is None:
+                    # Too far behind: the client has to refetch the full job list
+                    events = [(self.last_id, 'reset', {'lastEventId': self.last_id})]
+            if not events:
+                self.check_prices()
+                yield ": heartbeat\n\n"
+                continue
+            for event_id, event_type, data in events:
+                yield format_event(event_id, event_type, data)
+            cursor = events[-1][0]
+
+
+broadcaster = EventBroadcaster()
+
+
+@api_events.route('/api/events', methods=['GET'])
+def events_stream():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_event_id = None
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many event streams, poll /api/scheduler/jobs instead'}), 503
+    released = threading.Event()
+
+    def release():
+        # Runs when the server closes the response, i.e. once the client is gone
+        if not released.is_set():
+            released.set()
+            stream_slots.release()
+
+    try:
+        broadcaster.check_prices()
+        response = Response(
+            stream_with_context(broadcaster.stream(last_event_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    except Exception:
+        release()
+        raise
+    response.call_on_close(release)
+    return response
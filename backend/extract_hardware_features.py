@@ -2,6 +2,7 @@ import platform
 import subprocess
 import re
 import json
+import sys
 import psutil
 
 def get_cpu_frequency():
@@ -15,7 +16,7 @@ def get_cpu_frequency():
     # Fallback: return a reasonable default
     return 3_100_000_000  # 3.1 GHz in Hz
 
-def extract_hardware_features():
+def extract_hardware_features(calibrate=True, recalibrate=False):
     features = {
         "device": platform.processor(),
         "num_cores": psutil.cpu_count(logical=True),
@@ -35,6 +36,15 @@ def extract_hardware_features():
     except Exception:
         pass
 
+    # Measured GFLOPS, bandwidth and op latency; cached per host so this is only slow once
+    if calibrate:
+        try:
+            from host_calibration import get_calibration
+            from result_cache import fingerprint_features
+            features.update(get_calibration(fingerprint_features(features), force=recalibrate))
+        except Exception as e:
+            print(f"[WARN] Host calibration failed: {e}", file=sys.stderr)
+
     return features
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+"""
+Closed-loop feedback store for the runtime estimator.
+- app.py appends one CSV row per run: feature vector, hardware fingerprint, estimator version,
+  predicted and actual runtime
+- Rows are written with a single O_APPEND write, so concurrent app.py processes never interleave
+- A background trainer compares recent error of the live version against its training metrics
+  and refits estimator.py on benchmarks plus feedback when the error drifts past a threshold
+- A refit is registered without promotion and shadow-scored on live traffic; it is promoted only
+  once its error on at least MIN_PROMOTE_ROWS measured runs beats what is being served, else dropped
+- Without a live registry version app.py serves the sklearn pickle or the roofline bound and labels
+  its rows "pickle" / "roofline"; drift is then measured on those rows
+"""
+import csv
+import fcntl
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+FEEDBACK_PATH = os.path.join(BACKEND_ROOT, "data", "feedback.csv")
+RETRAIN_LOCK_PATH = os.path.join(BACKEND_ROOT, "data", ".retrain.lock")
+ESTIMATOR_PATH = os.path.join(BACKEND_ROOT, "estimator.py")
+
+FEATURE_COLS = [
+    "num_params", "flops", "num_layers", "cpu_frequency", "num_cores",
+    "sequence_length", "batch_size", "input_size",
+    "peak_gflops", "memory_gbps", "op_latency_us"
+]
+FEEDBACK_COLUMNS = ["timestamp", "hardware_fingerprint", "estimator_version"] + FEATURE_COLS + [
+    "predicted_runtime", "actual_runtime"
+]
+
+DRIFT_WINDOW = 200          # Most recent rows of the live version used to measure drift
+MIN_DRIFT_ROWS = 20         # Fewer rows than this never trigger a retrain
+DRIFT_RATIO = 1.5           # Retrain when recent MAE exceeds the version's CV MAE by this factor
+DRIFT_RELATIVE_ERROR = 0.5  # Fallback for versions without metrics (legacy, pickle, roofline)
+MIN_PROMOTE_ROWS = 20      # Shadow-scored runs with an actual runtime needed before a refit is judged
+FALLBACK_VERSIONS = ("pickle", "roofline")  # app.py's labels when no registry version is live
+TRAINER_INTERVAL_SECONDS = 300
+RETRAIN_TIMEOUT_SECONDS = 1800
+TAIL_BLOCK_BYTES = 64 * 1024
+
+
+class FeedbackStore:
+    def __init__(self, path=FEEDBACK_PATH):
+        self.path = path
+
+    def append(self, features, hardware_fingerprint, estimator_version, predicted, actual):
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "hardware_fingerprint": hardware_fingerprint,
+            "estimator_version": estimator_version,
+            **{col: features.get(col, 0) for col in FEATURE_COLS},
+            "predicted_runtime": predicted,
+            "actual_runtime": actual,
+        }
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=FEEDBACK_COLUMNS, lineterminator="\n").writerow(record)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # The first writer creates the file with its header; everyone else only appends
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+            line = ",".join(FEEDBACK_COLUMNS) + "\n" + buf.getvalue()
+        except FileExistsError:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            line = buf.getvalue()
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def tail(self, n):
+        """Last `n` rows as dicts, read backwards from the end of the file in blocks."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                pos = f.tell()
+                data = b""
+                while pos > 0 and data.count(b"\n") <= n:
+                    step = min(TAIL_BLOCK_BYTES, pos)
+                    pos -= step
+                    f.seek(pos)
+                    data = f.read(step) + data
+        except OSError:
+            return []
+        # The first line is either the header or a row cut off mid-way
+        lines = data.decode(errors="replace").splitlines()[1:]
+        rows = csv.DictReader(lines[-n:], fieldnames=FEEDBACK_COLUMNS)
+        return [row for row in rows if row.get("actual_runtime")]
+
+    def count(self):
+        try:
+            with open(self.path, "rb") as f:
+                return max(sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1, 0)
+        except OSError:
+            return 0
+
+
+def served_versions(live_version):
+    """Labels app.py gives the rows of what is being served: the live version, or the fallbacks."""
+    return (live_version,) if live_version is not None else FALLBACK_VERSIONS
+
+
+def drift_report(store, live_version, live_metadata=None):
+    """Recent error of the live version (or of the fallbacks if there is none) and whether it
+    crossed the retrain threshold."""
+    versions = served_versions(live_version)
+    rows = [row for row in store.tail(DRIFT_WINDOW * 5) if row["estimator_version"] in versions]
+    rows = rows[-DRIFT_WINDOW:]
+    errors, relative = [], []
+    for row in rows:
+        try:
+            predicted, actual = float(row["predicted_runtime"]), float(row["actual_runtime"])
+        except (TypeError, ValueError):
+            continue
+        errors.append(abs(predicted - actual))
+        if actual > 0:
+            relative.append(abs(predicted - actual) / actual)
+    report = {"version": live_version or "/".join(versions), "rows": len(errors), "drifted": False,
+              "mae": sum(errors) / len(errors) if errors else None,
+              "meanRelativeError": sum(relative) / len(relative) if relative else None,
+              "baselineMae": None}
+    if len(errors) < MIN_DRIFT_ROWS:
+        return report
+    baseline = ((live_metadata or {}).get("metrics") or {}).get("cv_mae")
+    if baseline:
+        report["baselineMae"] = baseline
+        report["drifted"] = report["mae"] > DRIFT_RATIO * baseline
+    elif report["meanRelativeError"] is not None:
+        report["drifted"] = report["meanRelativeError"] > DRIFT_RELATIVE_ERROR
+    return report
+
+
+def retrain():
+    """Refit estimator.py on benchmarks plus feedback without promoting it; only one process
+    retrains at a time. Returns the registered candidate version, or None."""
+    os.makedirs(os.path.dirname(RETRAIN_LOCK_PATH), exist_ok=True)
+    with open(RETRAIN_LOCK_PATH, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[INFO] Retrain already running in another process", flush=True)
+            return None
+        result = subprocess.run(
+            [sys.executable, ESTIMATOR_PATH, "--no-promote"], cwd=BACKEND_ROOT,
+            capture_output=True, text=True, timeout=RETRAIN_TIMEOUT_SECONDS,
+        )
+        if result.returncode != 0:
+            print(f"[ERROR] Retrain failed: {result.stderr.strip()[-2000:]}", flush=True)
+            return None
+        print(f"[INFO] Retrain finished:\n{result.stdout.strip()}", flush=True)
+        match = re.search(r"Registered model version (\S+)", result.stdout)
+        return match.group(1) if match else None
+
+
+_candidate = None  # Refit being shadow-scored; only the trainer thread touches it
+
+
+def judge_candidate(registry):
+    """Promote or drop the shadowed refit once it has been scored on enough measured runs.
+
+    Returns its shadow report, or None if there is no candidate (anymore)."""
+    global _candidate
+    report = registry.shadow_report()
+    if report is None or report["version"] != _candidate:
+        _candidate = None  # Replaced or cleared by hand through /api/models/shadow
+        return None
+    if report["withActual"] < MIN_PROMOTE_ROWS:
+        return report
+    if report["shadowMae"] < report["liveMae"]:
+        registry.promote(_candidate)
+        print(f"[INFO] Refit {_candidate} beat the served estimator on {report['withActual']} runs "
+              f"(MAE {report['shadowMae']:.4f} vs {report['liveMae']:.4f}); promoted", flush=True)
+    else:
+        print(f"[INFO] Refit {_candidate} did not beat the served estimator on {report['withActual']} runs "
+              f"(MAE {report['shadowMae']:.4f} vs {report['liveMae']:.4f}); dropped", flush=True)
+    registry.set_shadow(None)
+    _candidate = None
+    return report
+
+
+def check_and_retrain(store, registry):
+    global _candidate
+    if _candidate is not None:
+        candidate_report = judge_candidate(registry)
+        if candidate_report is not None:
+            return {"candidate": candidate_report}
+    version = registry.live()[0]
+    try:
+        metadata = registry.metadata(version) if version in registry.versions() else None
+    except Exception:
+        metadata = None
+    report = drift_report(store, version, metadata)
+    if report["drifted"]:
+        print(f"[INFO] Estimator {report['version']} drifted ({json.dumps(report)}); retraining", flush=True)
+        candidate = retrain()
+        if candidate is not None:
+            # Scored against what is served on the next runs before anything goes live
+            registry.set_shadow(candidate)
+            _candidate = candidate
+    return report
+
+
+def start_trainer(store, registry, interval=TRAINER_INTERVAL_SECONDS):
+    """Check for drift every `interval` seconds in a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                check_and_retrain(store, registry)
+            except Exception as e:
+                print(f"[WARN] Feedback trainer failed: {e}", flush=True)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+feedback_store = FeedbackStore()
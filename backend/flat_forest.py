@@ -0,0 +1,116 @@
+"""
+Dependency-light evaluator for a RandomForestRegressor exported by estimator.py.
+- All trees live in flat NumPy arrays: node feature, threshold, left/right child and leaf value
+- Leaves point at themselves, so every tree is walked a fixed max_depth steps for all samples at once
+- Only NumPy is needed at inference time; no sklearn import, no pandas DataFrame
+- Quantiles come from the same per-tree leaf values the mean averages, so p99 costs one sort more;
+  boosted models have no per-tree spread and add held-out residual quantiles to the mean instead
+- calibrate() checks the per-tree quantiles against held-out rows; a forest whose tree spread
+  under-covers them (it measures model disagreement, not runtime noise) switches to residual quantiles too
+"""
+import numpy as np
+
+QUANTILES = (0.5, 0.9, 0.99)
+QUANTILE_TOLERANCE = 0.05  # Held-out coverage may fall this far short of a quantile before it is recalibrated
+
+
+def residual_offsets(residuals):
+    """Held-out residuals (actual - predicted) at QUANTILES, as split-conformal order statistics.
+
+    The ceil((n + 1) q)-th smallest residual covers a new row with probability at least q, where
+    np.quantile's interpolation falls short on the few rows a hardware class holds out.
+    """
+    residuals = np.sort(np.asarray(residuals, dtype=float))
+    rank = np.ceil((len(residuals) + 1) * np.array(QUANTILES)).astype(int) - 1
+    return residuals[np.clip(rank, 0, len(residuals) - 1)]
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, feature_names,
+                 residual_quantiles=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.feature_names = [str(name) for name in feature_names]
+        # Set for boosted models: residual offsets at QUANTILES, added to the mean
+        self.residual_quantiles = None if residual_quantiles is None else np.asarray(residual_quantiles, dtype=float)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"],
+                data["value"], data["roots"], data["max_depth"], data["feature_names"],
+                data["residual_quantiles"] if "residual_quantiles" in data.files else None,
+            )
+
+    def save(self, path):
+        extra = {} if self.residual_quantiles is None else {"residual_quantiles": self.residual_quantiles}
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            feature_names=np.array(self.feature_names), **extra,
+        )
+
+    def leaves(self, X):
+        """Leaf node index per (sample, tree)."""
+        # sklearn compares float32 features against float64 thresholds; match it for parity
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X):
+        return self.value[self.leaves(X)].mean(axis=1)
+
+    def predict_quantiles(self, X):
+        """(n_samples, len(QUANTILES)) runtime quantiles."""
+        values = self.value[self.leaves(X)]
+        if self.residual_quantiles is not None:
+            return values.mean(axis=1)[:, None] + self.residual_quantiles[None, :]
+        # Linear interpolation between order statistics, as np.quantile does, without its overhead
+        values.sort(axis=1)
+        position = np.array(QUANTILES) * (values.shape[1] - 1)
+        lo = np.floor(position).astype(int)
+        hi = np.minimum(lo + 1, values.shape[1] - 1)
+        frac = position - lo
+        return values[:, lo] * (1 - frac) + values[:, hi] * frac
+
+    def coverage(self, X, y):
+        """Share of rows whose actual value is at or below each predicted quantile (ideal: the quantile)."""
+        return (np.asarray(y, dtype=float)[:, None] <= self.predict_quantiles(X)).mean(axis=0)
+
+    def calibrate(self, X, y, tolerance=QUANTILE_TOLERANCE):
+        """Replace per-tree quantiles with held-out residual quantiles if they under-cover (X, y).
+
+        Returns the coverage of the quantiles kept, on (X, y).
+        """
+        y = np.asarray(y, dtype=float)
+        if not len(y):
+            return np.full(len(QUANTILES), np.nan)
+        coverage = self.coverage(X, y)
+        if self.residual_quantiles is None and np.any(coverage < np.array(QUANTILES) - tolerance):
+            self.residual_quantiles = residual_offsets(y - self.predict(X))
+            coverage = self.coverage(X, y)
+        return coverage
+
+    def row(self, features):
+        """Feature vector in training column order from a feature dict; missing features are 0."""
+        return np.array([float(features.get(name, 0) or 0) for name in self.feature_names])
+
+    def predict_one(self, features):
+        return float(self.predict(self.row(features))[0])
+
+    def quantiles_one(self, features):
+        """{"p50": ..., "p90": ..., "p99": ...} for a single feature dict."""
+        values = self.predict_quantiles(self.row(features))[0]
+        return {f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, values)}
@@ -0,0 +1,133 @@
+"""
+Two-part latency model for full generation: prefill plus token-by-token decode.
+- Prefill time is linear in prompt length: p0 + p1 * prompt_tokens
+- Decode latency of one token is linear in its context length: a + b * context, so generating
+  N tokens after a prompt of L costs a * N + b * (N * L + N * (N - 1) / 2)
+- Fitted per (model, device) from benchmark rows, where decode time is output_generation_time
+  minus the measured forward pass; a model-wide fit covers devices without their own rows
+- Each inference variant other than eager gets its own fits (keys suffixed @variant); rows
+  without a variant are eager
+- Only NumPy is needed, so app.py can load it without sklearn
+"""
+import json
+import os
+
+import numpy as np
+
+from inference_variants import DEFAULT_VARIANT
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+GENERATION_MODEL_PATH = os.path.join(BACKEND_ROOT, "generation_model.json")
+DEFAULT_NEW_TOKENS = 512  # Matches max_new_tokens of the default sweep in benchmark_grid.py
+MIN_FIT_ROWS = 2
+
+
+def group_key(model_name, device=None, variant=None):
+    key = f"{model_name}|{device}" if device is not None else model_name
+    return key if variant in (None, DEFAULT_VARIANT) else f"{key}@{variant}"
+
+
+def context_sum(prompt_tokens, new_tokens):
+    """Sum of the context lengths seen while decoding `new_tokens` after the prompt."""
+    return new_tokens * prompt_tokens + new_tokens * (new_tokens - 1) / 2
+
+
+def fit_nonnegative(A, y):
+    """Least squares with both coefficients >= 0 (latencies never shrink as work grows)."""
+    coef, *_ = np.linalg.lstsq(A, y, rcond=None)
+    if np.all(coef >= 0):
+        return coef
+    # The optimum lies on a boundary: keep the better single-column fit
+    best, best_residual = np.zeros(A.shape[1]), np.sum(y ** 2)
+    for j in range(A.shape[1]):
+        col = A[:, j]
+        denom = col @ col
+        if denom <= 0:
+            continue
+        c = max((col @ y) / denom, 0.0)
+        residual = np.sum((y - c * col) ** 2)
+        if residual < best_residual:
+            best, best_residual = np.zeros(A.shape[1]), residual
+            best[j] = c
+    return best
+
+
+def fit_group(prompt_tokens, new_tokens, prefill_time, decode_time):
+    L = np.asarray(prompt_tokens, dtype=float)
+    N = np.asarray(new_tokens, dtype=float)
+    prefill = fit_nonnegative(np.column_stack([np.ones_like(L), L]), np.asarray(prefill_time, dtype=float))
+    decode = fit_nonnegative(np.column_stack([N, context_sum(L, N)]), np.asarray(decode_time, dtype=float))
+    model = GenerationModel({"fit": {"prefill": prefill.tolist(), "decode": decode.tolist()}})
+    predicted = np.array([model.predict("fit", None, l, n)["totalSeconds"] for l, n in zip(L, N)])
+    actual = np.asarray(prefill_time, dtype=float) + np.asarray(decode_time, dtype=float)
+    return {
+        "prefill": prefill.tolist(),
+        "decode": decode.tolist(),
+        "rows": int(len(L)),
+        "mae": float(np.mean(np.abs(predicted - actual))),
+    }
+
+
+def fit_generation_model(df):
+    """Fit prefill/decode coefficients from benchmark rows that recorded a full generation."""
+    df = df.dropna(subset=["model", "sequence_length", "inference_time",
+                           "output_generation_time", "output_token_count"])
+    prompt = df["sequence_length"].astype(float)
+    total = df["output_token_count"].astype(float)
+    # run_benchmark.py records the full generated sequence, prompt included
+    new_tokens = np.where(total > prompt, total - prompt, total)
+    decode_time = (df["output_generation_time"] - df["inference_time"]).clip(lower=0)
+    variant = df["variant"].fillna(DEFAULT_VARIANT) if "variant" in df.columns else DEFAULT_VARIANT
+    df = df.assign(prompt_tokens=prompt, new_tokens=new_tokens, decode_time=decode_time, variant=variant)
+    df = df[df["new_tokens"] > 0]
+
+    groups = {}
+    for (variant, model_name), model_rows in df.groupby(["variant", "model"]):
+        if len(model_rows) >= MIN_FIT_ROWS:
+            groups[group_key(model_name, variant=variant)] = fit_group(
+                model_rows["prompt_tokens"], model_rows["new_tokens"],
+                model_rows["inference_time"], model_rows["decode_time"])
+        if "device" not in model_rows:
+            continue
+        for device, rows in model_rows.groupby("device"):
+            if len(rows) >= MIN_FIT_ROWS:
+                groups[group_key(model_name, device, variant)] = fit_group(
+                    rows["prompt_tokens"], rows["new_tokens"], rows["inference_time"], rows["decode_time"])
+    return GenerationModel(groups)
+
+
+class GenerationModel:
+    def __init__(self, groups):
+        self.groups = groups
+
+    @classmethod
+    def load(cls, path=GENERATION_MODEL_PATH):
+        with open(path) as f:
+            return cls(json.load(f)["groups"])
+
+    def save(self, path=GENERATION_MODEL_PATH):
+        with open(path, "w") as f:
+            json.dump({"groups": self.groups}, f, indent=2)
+            f.write("\n")
+
+    def lookup(self, model_name, device=None, variant=None):
+        """Coefficients for (model, device, variant), falling back to the model-wide fit of that variant."""
+        return (self.groups.get(group_key(model_name, device, variant))
+                or self.groups.get(group_key(model_name, variant=variant)))
+
+    def predict(self, model_name, device, prompt_tokens, new_tokens=DEFAULT_NEW_TOKENS, variant=None):
+        coef = self.lookup(model_name, device, variant)
+        if coef is None:
+            return None
+        p0, p1 = coef["prefill"]
+        a, b = coef["decode"]
+        prefill = p0 + p1 * prompt_tokens
+        decode = a * new_tokens + b * context_sum(prompt_tokens, new_tokens)
+        return {
+            "promptTokens": int(prompt_tokens),
+            "newTokens": int(new_tokens),
+            "prefillSeconds": float(prefill),
+            "decodeSeconds": float(decode),
+            "totalSeconds": float(prefill + decode),
+            "perTokenSeconds": float(decode / new_tokens) if new_tokens else 0.0,
+        }
@@ -0,0 +1,175 @@
+"""
+Per-hardware-class runtime estimators with routing and a global fallback.
+- Benchmark hosts are clustered on log-scaled hardware features (frequency, cores and the
+  calibrated GFLOPS / bandwidth / op latency when recorded); each class gets its own forest
+- A request routes to the nearest class centroid; confidence decays with the distance, and
+  below MIN_CONFIDENCE the global model is used instead
+- All class forests are merged into one FlatForest, so pricing one prompt on every known
+  class is a single vectorized evaluation
+- Routing and prediction need only NumPy; fitting imports sklearn lazily
+"""
+import json
+import os
+
+import numpy as np
+
+from flat_forest import FlatForest, QUANTILES
+from roofline import frequency_ghz
+
+HARDWARE_FEATURES = ["cpu_frequency", "num_cores", "peak_gflops", "memory_gbps", "op_latency_us"]
+MAX_CLASSES = 8
+MIN_CLASS_ROWS = 10  # Classes with fewer benchmark rows are routed to the global model
+MIN_CONFIDENCE = 0.3
+ROUTER_FILE = "hardware_classes.json"
+CLASS_FOREST_FILE = "class_{}.npz"
+
+
+def hardware_vector(features, columns):
+    """Log-scaled hardware features; NaN where a feature is missing."""
+    values = []
+    for col in columns:
+        value = features.get(col)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+        if col == "cpu_frequency":
+            value = frequency_ghz(value)
+        values.append(np.log1p(value) if value and value > 0 else np.nan)
+    return np.array(values)
+
+
+def merge_forests(forests):
+    """One FlatForest holding every tree, plus the index of the forest each tree came from."""
+    offsets = np.cumsum([0] + [len(f.feature) for f in forests[:-1]])
+    merged = FlatForest(
+        np.concatenate([f.feature for f in forests]),
+        np.concatenate([f.threshold for f in forests]),
+        np.concatenate([f.left + off for f, off in zip(forests, offsets)]),
+        np.concatenate([f.right + off for f, off in zip(forests, offsets)]),
+        np.concatenate([f.value for f in forests]),
+        np.concatenate([f.roots + off for f, off in zip(forests, offsets)]),
+        max(f.max_depth for f in forests),
+        forests[0].feature_names,
+    )
+    tree_class = np.concatenate([np.full(len(f.roots), i) for i, f in enumerate(forests)])
+    return merged, tree_class
+
+
+class HardwareRouter:
+    def __init__(self, columns, mean, scale, classes, forests):
+        self.columns = columns
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.classes = classes  # [{id, centroid, hardware, rows, devices, power_w, ...}]
+        self.centroids = np.array([c["centroid"] for c in classes], dtype=float)
+        self.forests = forests  # class id -> FlatForest, only for classes with enough rows
+        self.model_ids = sorted(forests)
+        self.merged, self.tree_class = merge_forests([forests[i] for i in self.model_ids]) if forests else (None, None)
+
+    def save(self, directory):
+        with open(os.path.join(directory, ROUTER_FILE), "w") as f:
+            json.dump({"columns": self.columns, "mean": self.mean.tolist(), "scale": self.scale.tolist(),
+                       "classes": self.classes}, f, indent=2)
+        for class_id, forest in self.forests.items():
+            forest.save(os.path.join(directory, CLASS_FOREST_FILE.format(class_id)))
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, ROUTER_FILE)) as f:
+            data = json.load(f)
+        forests = {}
+        for c in data["classes"]:
+            path = os.path.join(directory, CLASS_FOREST_FILE.format(c["id"]))
+            if os.path.exists(path):
+                forests[c["id"]] = FlatForest.load(path)
+        return cls(data["columns"], data["mean"], data["scale"], data["classes"], forests)
+
+    def route(self, features):
+        """(class id, confidence) of the nearest class; dimensions the request lacks are ignored."""
+        z = (hardware_vector(features, self.columns) - self.mean) / self.scale
+        known = ~np.isnan(z)
+        if not known.any():
+            return None, 0.0
+        distance = np.sqrt(np.mean((self.centroids[:, known] - z[known]) ** 2, axis=1))
+        nearest = int(np.argmin(distance))
+        return self.classes[nearest]["id"], float(np.exp(-distance[nearest]))
+
+    def select(self, features, global_model):
+        """(model, class id or None for the global model, confidence)."""
+        class_id, confidence = self.route(features)
+        forest = self.forests.get(class_id)
+        if forest is None or confidence < MIN_CONFIDENCE:
+            return global_model, None, confidence
+        return forest, class_id, confidence
+
+    def predict_one(self, features, global_model):
+        """(prediction, class id or None for the global model, confidence)."""
+        model, class_id, confidence = self.select(features, global_model)
+        return model.predict_one(features), class_id, confidence
+
+    def predict_all(self, features):
+        """Runtime of `features` on every class with a model, in one pass over all trees."""
+        if self.merged is None:
+            return []
+        by_id = {c["id"]: c for c in self.classes}
+        X = np.array([self.merged.row({**features, **by_id[i]["hardware"]}) for i in self.model_ids])
+        values = self.merged.value[self.merged.leaves(X)]
+        # Row k only counts the trees of its own class
+        mask = self.tree_class[None, :] == np.array(self.model_ids)[:, None]
+        predictions = (values * mask).sum(axis=1) / mask.sum(axis=1)
+        quantiles = np.nanquantile(np.where(mask, values, np.nan), QUANTILES, axis=1).T
+        for k, class_id in enumerate(self.model_ids):
+            offsets = self.forests[class_id].residual_quantiles
+            if offsets is not None:
+                quantiles[k] = predictions[k] + offsets
+        return [
+            {**by_id[i], "predictedRuntime": float(p),
+             **{f"runtimeP{round(q * 100)}": float(v) for q, v in zip(QUANTILES, qs)}}
+            for i, p, qs in zip(self.model_ids, predictions, quantiles)
+        ]
+
+
+def fit_hardware_classes(df, X, y, fit_forest, max_classes=MAX_CLASSES):
+    """Cluster benchmark hosts and fit one forest per class with `fit_forest(X, y)`; a class for
+    which it returns None is routed to the global model.
+
+    Returns a HardwareRouter, or None when no hardware features were recorded.
+    """
+    from sklearn.cluster import KMeans
+
+    columns = [col for col in HARDWARE_FEATURES if col in df.columns and df[col].notna().any()]
+    if not columns:
+        return None
+    H = np.array([hardware_vector(row, columns) for row in df[columns].to_dict("records")])
+    H = np.where(np.isnan(H), np.nanmean(H, axis=0), H)  # Rows from before calibration was recorded
+    mean = H.mean(axis=0)
+    scale = H.std(axis=0)
+    scale[scale < 1e-9] = 1.0  # Single-host data: std is zero up to rounding
+    Z = (H - mean) / scale
+
+    hosts = np.unique(Z.round(6), axis=0)
+    k = min(max_classes, len(hosts))
+    labels = KMeans(n_clusters=k, n_init=10, random_state=42).fit_predict(Z) if k > 1 else np.zeros(len(Z), dtype=int)
+
+    classes, forests = [], {}
+    for class_id in range(k):
+        rows = labels == class_id
+        if not rows.any():
+            continue
+        members = df[rows]
+        power = members.reindex(columns=["avg_cpu_power", "avg_gpu_power"]).fillna(0).sum(axis=1)
+        classes.append({
+            "id": class_id,
+            "centroid": Z[rows].mean(axis=0).tolist(),
+            # Representative hardware values used when pricing a prompt on this class
+            "hardware": {col: float(members[col].median()) for col in columns if members[col].notna().any()},
+            "rows": int(rows.sum()),
+            "devices": sorted(str(d) for d in members["device"].dropna().unique()) if "device" in members else [],
+            "power_w": float(power.mean()) if len(power) and power.mean() > 0 else None,
+        })
+        if rows.sum() >= MIN_CLASS_ROWS:
+            forest = fit_forest(X[rows], y[rows])
+            if forest is not None:
+                forests[class_id] = forest
+    return HardwareRouter(columns, mean, scale, classes, forests)
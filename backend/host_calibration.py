@@ -0,0 +1,115 @@
+"""
+Host calibration micro-benchmarks that turn "what machine is this" into measured capability.
+- GEMM: float32 matrix multiply through NumPy's BLAS, reported as attainable GFLOPS
+- Memory bandwidth: STREAM-style copy over arrays far larger than cache, reported as GB/s
+- Op latency: wall time of a tiny NumPy op on one thread, the per-operator dispatch overhead
+- Results are cached on disk per host fingerprint and re-measured after CALIBRATION_TTL_SECONDS
+- They describe the whole host; scale_calibration() cuts them down to the cores and memory
+  bandwidth one benchmark cell actually had, so rows match the num_cores they record
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_PATH = os.path.join(BACKEND_ROOT, "data", "host_calibration.json")
+CALIBRATION_TTL_SECONDS = 7 * 24 * 3600
+CALIBRATION_FEATURES = ["peak_gflops", "memory_gbps", "op_latency_us"]
+
+GEMM_SIZE = 1024
+STREAM_BYTES = 256 * 1024 * 1024  # Well past any last-level cache
+LATENCY_OPS = 20000
+REPEATS = 5
+
+
+def best_of(fn, repeats=REPEATS):
+    """Fastest of `repeats` timed calls after one warm-up call; the minimum filters out noise."""
+    fn()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_gemm(n=GEMM_SIZE):
+    a = np.random.default_rng(0).standard_normal((n, n), dtype=np.float32)
+    b = np.random.default_rng(1).standard_normal((n, n), dtype=np.float32)
+    out = np.empty((n, n), dtype=np.float32)
+    seconds = best_of(lambda: np.matmul(a, b, out=out))
+    return 2 * n ** 3 / seconds / 1e9
+
+
+def measure_bandwidth(nbytes=STREAM_BYTES):
+    src = np.ones(nbytes // 8, dtype=np.float64)
+    dst = np.empty_like(src)
+    seconds = best_of(lambda: np.copyto(dst, src))
+    return 2 * nbytes / seconds / 1e9  # One read and one write stream
+
+
+def measure_op_latency(ops=LATENCY_OPS):
+    x = np.ones(1, dtype=np.float32)
+    out = np.empty(1, dtype=np.float32)
+
+    def loop():
+        for _ in range(ops):
+            np.add(x, x, out=out)
+
+    return best_of(loop) / ops * 1e6
+
+
+def calibrate():
+    return {
+        "peak_gflops": round(measure_gemm(), 2),
+        "memory_gbps": round(measure_bandwidth(), 2),
+        "op_latency_us": round(measure_op_latency(), 4),
+    }
+
+
+def scale_calibration(calibration, threads, host_cores, bandwidth_share=1.0):
+    """Host calibration as seen by a run on `threads` of `host_cores` logical CPUs.
+
+    GEMM throughput is taken as linear in threads; memory bandwidth is split between concurrent
+    benchmark workers by `bandwidth_share`, their share of the CPUs; op latency is single-threaded.
+    """
+    scaled = dict(calibration)
+    if scaled.get("peak_gflops") is not None and host_cores:
+        scaled["peak_gflops"] = round(scaled["peak_gflops"] * min(threads / host_cores, 1.0), 2)
+    if scaled.get("memory_gbps") is not None:
+        scaled["memory_gbps"] = round(scaled["memory_gbps"] * bandwidth_share, 2)
+    return scaled
+
+
+def load_cache(path=CALIBRATION_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_calibration(fingerprint, force=False, path=CALIBRATION_PATH):
+    """Calibration results for this host, measured at most once per TTL."""
+    cache = load_cache(path)
+    entry = cache.get(fingerprint)
+    if entry and not force and time.time() - entry.get("measured_at", 0) < CALIBRATION_TTL_SECONDS:
+        return entry["results"]
+    results = calibrate()
+    cache = load_cache(path)  # Another process may have written meanwhile
+    cache[fingerprint] = {"measured_at": time.time(), "measured": datetime.now().isoformat(), "results": results}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    from extract_hardware_features import extract_hardware_features
+    print(json.dumps(extract_hardware_features(recalibrate="--force" in sys.argv), indent=2))
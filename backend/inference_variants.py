@@ -0,0 +1,76 @@
+"""
+Inference variants: the same model run different ways on CPU, as a benchmark axis and an estimator feature.
+- eager: fp32 weights under torch.no_grad(), what app.py measures and every older benchmark row is
+- int8_dynamic: nn.Linear weights quantized to int8 ahead of time, activations quantized on the fly
+  (quantize_dynamic); needs float32 weights and a build with a quantized engine
+- bf16_autocast: fp32 weights, matmuls run in bfloat16 under torch.autocast
+- compile: forward() compiled by torch.compile; the benchmark's warmup calls absorb the compile time
+- inference_mode: torch.inference_mode() instead of no_grad(), which also skips autograd bookkeeping
+- The estimator sees a variant as one-hot columns that are all zero for eager, so rows and
+  feedback without a variant need no migration; the roofline only sees bytes per weight
+- torch is imported lazily: estimator.py and app.py's quoting only need the feature helpers
+"""
+import contextlib
+
+DEFAULT_VARIANT = "eager"
+VARIANTS = (DEFAULT_VARIANT, "int8_dynamic", "bf16_autocast", "compile", "inference_mode")
+VARIANT_FEATURES = [f"variant_{v}" for v in VARIANTS if v != DEFAULT_VARIANT]
+# Bytes the roofline reads per weight; dynamic int8 covers nn.Linear, which holds nearly all weights
+BYTES_PER_PARAM = {"int8_dynamic": 1}
+
+
+def variant_features(variant):
+    """One-hot estimator features of `variant` (None means eager)."""
+    variant = variant or DEFAULT_VARIANT
+    return {f"variant_{v}": float(v == variant) for v in VARIANTS if v != DEFAULT_VARIANT}
+
+
+def add_variant_features(df):
+    """`df` with the one-hot variant columns; rows without a variant are eager."""
+    variant = df["variant"].fillna(DEFAULT_VARIANT) if "variant" in df.columns else None
+    return df.assign(**{f"variant_{v}": 0.0 if variant is None else (variant == v).astype(float)
+                        for v in VARIANTS if v != DEFAULT_VARIANT})
+
+
+def unsupported(variant, dtype="float32"):
+    """Why `variant` cannot run here with `dtype` weights, or None if it can."""
+    if variant not in VARIANTS:
+        return f"unknown variant {variant!r}; expected one of {VARIANTS}"
+    if variant == "int8_dynamic":
+        if dtype != "float32":
+            return "dynamic int8 quantization needs float32 weights"
+        import torch
+        if all(engine == "none" for engine in torch.backends.quantized.supported_engines):
+            return "this PyTorch build has no quantized engine"
+    if variant == "compile":
+        import torch
+        if not hasattr(torch, "compile"):
+            return "torch.compile needs PyTorch 2"
+    return None
+
+
+def apply_variant(model, variant):
+    """The model to run for `variant`; only int8_dynamic and compile change it."""
+    import torch
+    if variant == "int8_dynamic":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if variant == "compile":
+        # generate() calls self.forward, so compile that rather than wrapping the module;
+        # dynamic shapes avoid a recompile for every new prompt or context length
+        model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+
+@contextlib.contextmanager
+def variant_context(variant):
+    """Grad mode (and autocast) to run forward passes and generate() under."""
+    import torch
+    if variant == "inference_mode":
+        with torch.inference_mode():
+            yield
+    elif variant == "bf16_autocast":
+        with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16):
+            yield
+    else:
+        with torch.no_grad():
+            yield
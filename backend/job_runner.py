@@ -0,0 +1,270 @@
+"""
+Runs app.py for predictions and scheduled jobs with resource limits.
+- Each run gets its own process group so the whole tree can be killed on timeout or cancel
+- Wall-clock and resident-memory limits are enforced by polling the process tree with psutil
+- Client-supplied limits go through resource_limits(): positive numbers only, clamped to
+  JOB_MAX_TIMEOUT_SECONDS and to JOB_MEMORY_LIMIT_MB or the host's RAM, whichever is lower
+- A bounded pool of executor slots caps concurrent runs; slots are always released in `finally`
+- reap_orphaned_jobs() returns `running` rows left behind by a crashed worker to pending or failed
+"""
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psutil
+
+from placement import MAX_CONCURRENT_JOBS
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PY_PATH = os.path.join(BACKEND_ROOT, "app.py")
+
+JOB_TIMEOUT_SECONDS = 600
+JOB_MEMORY_LIMIT_MB = 8192
+JOB_MAX_TIMEOUT_SECONDS = 3600
+SLOT_WAIT_SECONDS = 30  # How long a request waits for a free executor slot before giving up
+POLL_SECONDS = 0.5
+KILL_GRACE_SECONDS = 5
+MAX_ATTEMPTS = 3  # Orphaned jobs are retried this many times before they are marked failed
+REAPER_INTERVAL_SECONDS = 60
+
+executor_slots = threading.BoundedSemaphore(MAX_CONCURRENT_JOBS)
+running_processes = {}  # job_id -> Popen, for runs started by this process
+cancelled_jobs = set()
+running_lock = threading.Lock()
+
+
+class RunResult:
+    def __init__(self, returncode, stdout, stderr, status):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.status = status  # 'ok', 'error', 'timeout', 'memory', 'cancelled' or 'busy'
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+
+def kill_process_group(pgid, grace=KILL_GRACE_SECONDS):
+    """SIGTERM the group, then SIGKILL whatever is still alive after `grace` seconds."""
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        try:
+            os.killpg(pgid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.1)
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def tree_rss(pid):
+    try:
+        proc = psutil.Process(pid)
+        return proc.memory_info().rss + sum(child.memory_info().rss for child in proc.children(recursive=True))
+    except psutil.Error:
+        return 0
+
+
+def max_memory_limit_mb():
+    return min(JOB_MEMORY_LIMIT_MB, psutil.virtual_memory().total / (1024 * 1024))
+
+
+def _positive(value, name):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f'{name} must be a positive number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a positive number')
+    if not number > 0 or number == float('inf'):
+        raise ValueError(f'{name} must be a positive number')
+    return number
+
+
+def resource_limits(timeout_seconds, memory_limit_mb):
+    """(timeout, memory limit) from a request: None keeps the default, anything above the ceilings
+    is clamped to them, and anything but a positive number raises ValueError."""
+    timeout_seconds = _positive(timeout_seconds, 'timeoutSeconds')
+    memory_limit_mb = _positive(memory_limit_mb, 'memoryLimitMb')
+    if timeout_seconds is not None:
+        timeout_seconds = min(timeout_seconds, JOB_MAX_TIMEOUT_SECONDS)
+    if memory_limit_mb is not None:
+        memory_limit_mb = min(memory_limit_mb, max_memory_limit_mb())
+    return timeout_seconds, memory_limit_mb
+
+
+def run_app_py(model_name, input_text, job_id=None, timeout=None, memory_limit_mb=None, on_start=None,
+               max_new_tokens=None):
+    """Run app.py in its own process group under a wall-clock and memory limit.
+
+    `on_start(pgid)` is called once the process exists so callers can record it for cancellation.
+    """
+    # Stored rows may predate resource_limits(), so the ceilings are applied here as well
+    timeout = min(timeout or JOB_TIMEOUT_SECONDS, JOB_MAX_TIMEOUT_SECONDS)
+    memory_limit = min(memory_limit_mb or JOB_MEMORY_LIMIT_MB, max_memory_limit_mb()) * 1024 * 1024
+    if not executor_slots.acquire(timeout=SLOT_WAIT_SECONDS):
+        return RunResult(None, '', 'No free executor slot', 'busy')
+    process = None
+    try:
+        process = subprocess.Popen(
+            [sys.executable, APP_PY_PATH],
+            cwd=BACKEND_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+        if job_id is not None:
+            with running_lock:
+                running_processes[job_id] = process
+        if on_start is not None:
+            on_start(process.pid)
+
+        started = time.monotonic()
+        stdin_data = f"{model_name}\n{input_text}\n"
+        if max_new_tokens is not None:
+            stdin_data += f"{int(max_new_tokens)}\n"
+        status = None
+        while True:
+            try:
+                stdout, stderr = process.communicate(stdin_data, timeout=POLL_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                stdin_data = None  # Input can only be sent on the first call
+            if time.monotonic() - started > timeout:
+                status = 'timeout'
+            elif tree_rss(process.pid) > memory_limit:
+                status = 'memory'
+            if status:
+                kill_process_group(process.pid)
+                stdout, stderr = process.communicate()
+                break
+
+        if status is None:
+            with running_lock:
+                cancelled = job_id in cancelled_jobs
+            if cancelled:
+                status = 'cancelled'
+            elif process.returncode == 0:
+                status = 'ok'
+            else:
+                status = 'error'
+        if status == 'timeout':
+            stderr += f"\n[ERROR] Job exceeded the wall-clock limit of {timeout}s"
+        elif status == 'memory':
+            stderr += f"\n[ERROR] Job exceeded the memory limit of {memory_limit // (1024 * 1024)} MB"
+        return RunResult(process.returncode, stdout, stderr, status)
+    finally:
+        if process is not None:
+            if process.poll() is None:
+                kill_process_group(process.pid, grace=0)
+                process.wait()
+            if job_id is not None:
+                with running_lock:
+                    running_processes.pop(job_id, None)
+                    cancelled_jobs.discard(job_id)
+        executor_slots.release()
+
+
+def cancel_process(job_id, pgid=None):
+    """Kill a running job's process group; `pgid` covers runs started by another worker process."""
+    with running_lock:
+        process = running_processes.get(job_id)
+        if process is not None:
+            cancelled_jobs.add(job_id)
+    if process is not None:
+        pgid = process.pid
+    if pgid is None:
+        return False
+    threading.Thread(target=kill_process_group, args=(pgid,), daemon=True).start()
+    return True
+
+
+def group_leader_state(pgid):
+    """'gone', 'orphaned' (its worker died and it was reparented) or 'alive'."""
+    try:
+        proc = psutil.Process(pgid)
+        if APP_PY_PATH not in proc.cmdline():
+            return 'gone'  # The pid has been reused by something else
+        parent = proc.parent()
+    except psutil.NoSuchProcess:
+        return 'gone'
+    except psutil.Error:
+        return 'alive'
+    return 'orphaned' if parent is None or parent.pid == 1 else 'alive'
+
+
+def reap_orphaned_jobs(db_path='scheduler.db'):
+    """Return `running` rows whose run has died to pending, or failed after MAX_ATTEMPTS.
+
+    A row is orphaned when its process group is gone, when its worker died and left the run
+    behind, or when it has been running longer than its own wall-clock limit plus a grace
+    period (no live run can last that long). Returns the list of (job_id, new_status).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, started_at, timeout_seconds, attempts, worker_pgid
+            FROM scheduled_jobs WHERE status = 'running'
+        ''')
+        now = datetime.now()
+        reaped = []
+        for job_id, started_at, timeout_seconds, attempts, pgid in cursor.fetchall():
+            with running_lock:
+                if job_id in running_processes:
+                    continue
+            limit = timedelta(seconds=(timeout_seconds or JOB_TIMEOUT_SECONDS) + REAPER_INTERVAL_SECONDS)
+            stale = started_at is None or now - datetime.fromisoformat(started_at) > limit
+            # Without a pgid the run may still be starting up
+            state = group_leader_state(pgid) if pgid is not None else None
+            if state in ('alive', None) and not stale:
+                continue
+            if state in ('alive', 'orphaned'):
+                kill_process_group(pgid, grace=0)
+            new_status = 'pending' if (attempts or 0) < MAX_ATTEMPTS else 'failed'
+            cursor.execute('''
+                UPDATE scheduled_jobs SET status = ?, worker_pgid = NULL,
+                    completed_at = CASE WHEN ? = 'failed' THEN ? ELSE completed_at END
+                WHERE id = ? AND status = 'running'
+            ''', (new_status, new_status, now.isoformat(), job_id))
+            if cursor.rowcount:
+                reaped.append((job_id, new_status))
+        conn.commit()
+        return reaped
+    finally:
+        conn.close()
+
+
+def start_reaper(on_reaped=None, db_path='scheduler.db', interval=REAPER_INTERVAL_SECONDS):
+    """Reap once now and then every `interval` seconds in a daemon thread."""
+    def loop():
+        while True:
+            try:
+                reaped = reap_orphaned_jobs(db_path)
+                if reaped:
+                    print(f"[INFO] Reaped orphaned jobs: {reaped}", flush=True)
+                    if on_reaped is not None:
+                        on_reaped(reaped)
+            except Exception as e:
+                print(f"[WARN] Job reaper failed: {e}", flush=True)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,84 @@
+"""
+Memory measurement for run_benchmark.py and app.py: peak resident memory and where a model's bytes go.
+- RssSampler polls the process RSS with psutil on a background thread, so a peak that lasts only
+  milliseconds (activations, a growing KV cache, the copies from_pretrained makes) is still caught
+- Unlike ru_maxrss, which only grows over the life of the process, the peak is per start()/stop()
+  window, so one worker process can measure many cells
+- parameter_memory() splits a model's parameter and buffer bytes into embeddings, linear layers,
+  norms and the rest; tensors shared between modules (tied embeddings) are counted once, and the
+  packed int8 weights of dynamically quantized Linear layers are included
+"""
+import threading
+
+import psutil
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+MEMORY_CATEGORIES = ("embedding", "linear", "norm", "other")
+PARAM_MEMORY_COLUMNS = ["param_bytes"] + [f"{c}_bytes" for c in MEMORY_CATEGORIES]
+
+
+class RssSampler:
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, pid=None):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self._thread = None
+
+    def _sample(self):
+        try:
+            self._peak = max(self._peak, self.process.memory_info().rss)
+        except psutil.Error:
+            pass
+        self._samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._baseline = self._peak = self.process.memory_info().rss
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return {"baseline_rss_bytes": self._baseline, "peak_rss_bytes": self._peak, "samples": self._samples}
+
+
+def _tensor_bytes(tensor, seen):
+    """Bytes of `tensor` unless it was counted already (or is None, like a missing bias)."""
+    if tensor is None:
+        return 0
+    key = (tensor.data_ptr(), tensor.numel())
+    if key in seen:
+        return 0
+    seen.add(key)
+    return tensor.numel() * tensor.element_size()
+
+
+def category(module):
+    name = type(module).__name__
+    if "Embedding" in name:
+        return "embedding"
+    if "Linear" in name:
+        return "linear"
+    if "Norm" in name:
+        return "norm"
+    return "other"
+
+
+def parameter_memory(model):
+    """{"param_bytes": total, "embedding_bytes": ..., "linear_bytes": ..., "norm_bytes": ..., "other_bytes": ...}."""
+    totals = dict.fromkeys(MEMORY_CATEGORIES, 0)
+    seen = set()
+    for module in model.modules():
+        tensors = [*module.parameters(recurse=False), *module.buffers(recurse=False)]
+        packed = getattr(module, "_packed_params", None)
+        if packed is not None and not hasattr(packed, "modules"):
+            # The packed (weight, bias) a dynamically quantized Linear keeps outside its parameters
+            tensors.extend(module._weight_bias())
+        totals[category(module)] += sum(_tensor_bytes(t, seen) for t in tensors)
+    return {"param_bytes": sum(totals.values()), **{f"{c}_bytes": b for c, b in totals.items()}}
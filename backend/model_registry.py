@@ -0,0 +1,191 @@
+"""
+Versioned registry for the runtime estimator.
+- Each version lives in models/<version>/ with the compiled forest and a metadata.json
+  (training data hash, metrics from estimator.py, feature list)
+- models/live.json points at the live version and is replaced atomically on promote,
+  so app.py subprocesses and every server worker pick up a retrain without a restart
+- A shadow version can be scored on live traffic from a background thread, off the request path
+- Versions trained on several hardware classes also carry a HardwareRouter with one forest per class
+"""
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+from flat_forest import FlatForest
+from hardware_classes import HardwareRouter, ROUTER_FILE
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join(BACKEND_ROOT, "models")
+LEGACY_MODEL_PATH = os.path.join(BACKEND_ROOT, "runtime_predictor.npz")
+MODEL_FILE = "runtime_predictor.npz"
+SHADOW_QUEUE_SIZE = 1000  # Shadow requests beyond this are dropped rather than slowing anything down
+
+
+def atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.pointer_path = os.path.join(root, "live.json")
+        self._models = {}  # version -> FlatForest
+        self._routers = {}  # version -> HardwareRouter or None
+        self._live = (None, None)  # (version, model), swapped as one reference
+        self._pointer_mtime = -1  # Never a real mtime, so the first live() call always loads
+        self._lock = threading.Lock()
+        # (version, model, stats), swapped as a whole so the worker never pairs one version's model
+        # with another's counters; the counters are only touched under _shadow_lock
+        self._shadow = None
+        self._shadow_lock = threading.Lock()
+        self._shadow_queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+        self._shadow_thread = None
+
+    # Versions
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "metadata.json"))
+        )
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, "metadata.json")) as f:
+            return json.load(f)
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, MODEL_FILE)
+
+    def register(self, flat, metadata, router=None):
+        """Store a compiled forest as a new version; it is not live until promoted."""
+        version = datetime.now().strftime("v%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.root, version)
+        os.makedirs(path)
+        flat.save(self.model_path(version))
+        if router is not None:
+            router.save(path)
+        atomic_write_json(os.path.join(path, "metadata.json"), {
+            **metadata,
+            "version": version,
+            "feature_names": flat.feature_names,
+            "created_at": datetime.now().isoformat(),
+        })
+        return version
+
+    def promote(self, version):
+        """Atomically make `version` live for every process that reads the registry."""
+        model = self.load(version)
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write_json(self.pointer_path, {"version": version, "promoted_at": datetime.now().isoformat()})
+        self._live = (version, model)
+        self._pointer_mtime = os.stat(self.pointer_path).st_mtime_ns
+
+    def load(self, version):
+        with self._lock:
+            model = self._models.get(version)
+            if model is None:
+                model = FlatForest.load(self.model_path(version))
+                self._models[version] = model
+            return model
+
+    def router(self, version):
+        """Per-hardware-class models of `version`, or None if it only has the global forest."""
+        with self._lock:
+            if version not in self._routers:
+                path = os.path.join(self.root, version) if version else None
+                exists = path is not None and os.path.exists(os.path.join(path, ROUTER_FILE))
+                self._routers[version] = HardwareRouter.load(path) if exists else None
+            return self._routers[version]
+
+    # Live model
+    def live_version(self):
+        try:
+            with open(self.pointer_path) as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def live(self):
+        """(version, model), reloaded when another process promoted a version."""
+        try:
+            mtime = os.stat(self.pointer_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._pointer_mtime:
+            version = self.live_version()
+            if version is not None:
+                self._live = (version, self.load(version))
+            elif os.path.exists(LEGACY_MODEL_PATH):
+                self._live = ("legacy", FlatForest.load(LEGACY_MODEL_PATH))
+            self._pointer_mtime = mtime
+        return self._live
+
+    # Shadow scoring
+    def set_shadow(self, version):
+        model = self.load(version) if version else None
+        stats = {"count": 0, "dropped": 0, "sum_abs_diff": 0.0, "sum_abs_error_live": 0.0,
+                 "sum_abs_error_shadow": 0.0, "with_actual": 0}
+        with self._shadow_lock:
+            self._shadow = (version, model, stats) if version else None
+            if version and self._shadow_thread is None:
+                self._shadow_thread = threading.Thread(target=self._shadow_loop, daemon=True)
+                self._shadow_thread.start()
+
+    def shadow_score(self, features, live_prediction, actual=None):
+        """Queue a request for the shadow model; never blocks the caller."""
+        shadow = self._shadow
+        if shadow is None:
+            return
+        try:
+            self._shadow_queue.put_nowait((shadow, features, live_prediction, actual))
+        except queue.Full:
+            with self._shadow_lock:
+                shadow[2]["dropped"] += 1
+
+    def _shadow_loop(self):
+        while True:
+            shadow, features, live_prediction, actual = self._shadow_queue.get()
+            if shadow is not self._shadow:
+                continue  # Queued for a shadow version that has since been replaced
+            version, model, stats = shadow
+            try:
+                prediction = model.predict_one(features)
+            except Exception as e:
+                print(f"[WARN] Shadow model {version} failed: {e}", flush=True)
+                continue
+            with self._shadow_lock:
+                stats["count"] += 1
+                if live_prediction is not None:
+                    stats["sum_abs_diff"] += abs(prediction - live_prediction)
+                if actual is not None and live_prediction is not None:
+                    stats["with_actual"] += 1
+                    stats["sum_abs_error_live"] += abs(live_prediction - actual)
+                    stats["sum_abs_error_shadow"] += abs(prediction - actual)
+
+    def shadow_report(self):
+        with self._shadow_lock:
+            if self._shadow is None:
+                return None
+            version, _, stats = self._shadow
+            stats = dict(stats)
+        count, with_actual = stats["count"], stats["with_actual"]
+        return {
+            "version": version,
+            "count": count,
+            "dropped": stats["dropped"],
+            "withActual": with_actual,
+            "meanAbsDiff": stats["sum_abs_diff"] / count if count else None,
+            "liveMae": stats["sum_abs_error_live"] / with_actual if with_actual else None,
+            "shadowMae": stats["sum_abs_error_shadow"] / with_actual if with_actual else None,
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,355 @@
+"""
+Deadline-based placement of scheduled jobs into the cheapest energy price slots.
+- Jobs carry an earliest start, a deadline, a predicted runtime, power draw, peak memory and model-load time
+- Start times are picked on the 30-minute auction price grid to minimize energy cost
+- A per-host concurrency, power and memory cap is enforced through an interval index of reservations;
+  the memory cap defaults to MEMORY_FRACTION of this host's RAM
+- A job's reservation covers its model load as well as its run, since both hold memory and the host
+- Placement is incremental: arrivals are placed greedily, deletions re-plan only the jobs they affect
+- begin()/rollback() undo a batch of changes, including the re-plans they caused, when storing it fails
+"""
+import csv
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import psutil
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+PRICE_PATH = os.path.join(BACKEND_ROOT, "data.csv")
+
+SLOT_MINUTES = 30  # Matches the interval used by energy_price_simulation.py
+SLOT_SECONDS = SLOT_MINUTES * 60
+MAX_CONCURRENT_JOBS = 4  # Jobs allowed to run at the same time on this host
+MAX_POWER_W = 120.0  # Combined average power allowed at the same time on this host
+DEFAULT_POWER_W = 30.0  # Same default app.py falls back to
+MEMORY_FRACTION = 0.8  # Share of this host's RAM scheduled jobs may hold at the same time
+FALLBACK_PRICE = 85.2  # EUR/MWh, same fallback as the energy price endpoint
+
+
+def parse_time(value):
+    """Parse an ISO string or datetime into a naive local datetime."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def load_price_curve(path=PRICE_PATH):
+    """Load (datetime, EUR/MWh) points from data.csv, sorted by time."""
+    curve = []
+    try:
+        with open(path, "r") as f:
+            for row in csv.DictReader(f):
+                try:
+                    curve.append((datetime.fromisoformat(row["datetime"]), float(row["price_eur_per_mwh"])))
+                except Exception:
+                    continue  # Skip invalid rows
+    except Exception as e:
+        print(f"[WARN] Could not load price curve: {e}")
+    curve.sort(key=lambda point: point[0])
+    return curve
+
+
+class PriceGrid:
+    """Auction prices on a fixed slot grid, extended with the last known price past the horizon."""
+
+    def __init__(self, curve, slot_seconds=SLOT_SECONDS):
+        self.slot_seconds = slot_seconds
+        if curve:
+            self.origin = curve[0][0]
+            self.prices = {}
+            for dt, price in curve:
+                self.prices[self.slot_of(dt)] = price
+            self.default_price = curve[-1][1]
+        else:
+            self.origin = datetime(2000, 1, 1)
+            self.prices = {}
+            self.default_price = FALLBACK_PRICE
+
+    def slot_of(self, dt):
+        return math.floor((dt - self.origin).total_seconds() / self.slot_seconds)
+
+    def slot_start(self, slot):
+        return self.origin + timedelta(seconds=slot * self.slot_seconds)
+
+    def price(self, slot):
+        return self.prices.get(slot, self.default_price)
+
+
+class PlacementJob:
+    def __init__(self, job_id, earliest_start, deadline, runtime, power=DEFAULT_POWER_W, pinned=False,
+                 reserve_runtime=None, memory_mb=None, load_seconds=None):
+        self.id = job_id
+        self.earliest_start = parse_time(earliest_start)
+        self.deadline = parse_time(deadline)
+        # Loading the model draws power and holds memory too, so it counts towards cost and capacity
+        load = max(float(load_seconds or 0), 0.0)
+        self.runtime = max(float(runtime or 0), 1.0) + load
+        # Capacity and the deadline are planned on a tail runtime (p90) when known; cost uses the mean
+        self.reserve_runtime = max(float(reserve_runtime or 0) + load, self.runtime)
+        self.power = float(power) if power else DEFAULT_POWER_W
+        self.memory = max(float(memory_mb or 0), 0.0)
+        self.pinned = pinned  # Fixed-time jobs hold capacity but are never moved
+        self.num_slots = max(1, math.ceil(self.reserve_runtime / SLOT_SECONDS))
+        self.start_slot = None
+        self.cost_eur = None
+        # Filled in by the engine: first feasible start slot, cost per start slot, cheapest cost
+        self.first_slot = None
+        self.costs = []
+        self.best_cost = None
+
+
+class ReservationIndex:
+    """Interval index of reservations over the slot grid, tracking concurrency, power and memory per slot."""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS, max_power=MAX_POWER_W, max_memory=math.inf):
+        self.max_concurrent = max_concurrent
+        self.max_power = max_power
+        self.max_memory = max_memory
+        self.intervals = {}  # job_id -> (start_slot, end_slot, power, memory_mb)
+        self.concurrency = defaultdict(int)
+        self.power = defaultdict(float)
+        self.memory = defaultdict(float)
+
+    def fits(self, start, end, power, memory=0.0):
+        for slot in range(start, end):
+            if self.concurrency.get(slot, 0) + 1 > self.max_concurrent:
+                return False
+            if self.power.get(slot, 0.0) + power > self.max_power:
+                return False
+            if self.memory.get(slot, 0.0) + memory > self.max_memory:
+                return False
+        return True
+
+    def reserve(self, job_id, start, end, power, memory=0.0):
+        self.intervals[job_id] = (start, end, power, memory)
+        for slot in range(start, end):
+            self.concurrency[slot] += 1
+            self.power[slot] += power
+            self.memory[slot] += memory
+
+    def release(self, job_id):
+        interval = self.intervals.pop(job_id, None)
+        if interval is None:
+            return None
+        start, end, power, memory = interval
+        for slot in range(start, end):
+            self.concurrency[slot] -= 1
+            self.power[slot] -= power
+            self.memory[slot] -= memory
+            if self.concurrency[slot] <= 0:
+                del self.concurrency[slot]
+                del self.power[slot]
+                del self.memory[slot]
+        return interval
+
+
+class PlacementEngine:
+    def __init__(self, curve=None, max_concurrent=MAX_CONCURRENT_JOBS, max_power=MAX_POWER_W, max_memory_mb=None):
+        self.grid = PriceGrid(load_price_curve() if curve is None else curve)
+        if max_memory_mb is None:
+            max_memory_mb = psutil.virtual_memory().total / (1024 * 1024) * MEMORY_FRACTION
+        self.index = ReservationIndex(max_concurrent, max_power, max_memory_mb)
+        self.jobs = {}
+        self._journal = None  # job_id -> (job, start_slot, cost_eur, interval) before the batch touched it
+
+    def begin(self):
+        """Record the prior placement of every job touched until commit() or rollback()."""
+        self._journal = {}
+
+    def commit(self):
+        self._journal = None
+
+    def rollback(self):
+        """Put every job touched since begin() back where it was, and forget jobs added since."""
+        journal, self._journal = self._journal or {}, None
+        for job_id in journal:
+            self.index.release(job_id)
+        for job_id, (job, start_slot, cost_eur, interval) in journal.items():
+            if job is None:
+                self.jobs.pop(job_id, None)
+                continue
+            job.start_slot, job.cost_eur = start_slot, cost_eur
+            self.jobs[job_id] = job
+            if interval is not None:
+                self.index.reserve(job_id, *interval)
+
+    def _touch(self, job_id):
+        if self._journal is not None and job_id not in self._journal:
+            job = self.jobs.get(job_id)
+            self._journal[job_id] = (job, job and job.start_slot, job and job.cost_eur,
+                                     self.index.intervals.get(job_id))
+
+    def _window_costs(self, job, first, last):
+        """Energy cost (EUR) of starting the job at each slot in [first, last], via prefix sums."""
+        k = max(1, math.ceil(job.runtime / SLOT_SECONDS))
+        tail = job.runtime - (k - 1) * SLOT_SECONDS
+        prefix = [0.0]
+        for slot in range(first, last + k):
+            prefix.append(prefix[-1] + self.grid.price(slot))
+        # price (EUR/MWh) * W * s -> EUR: / 1e6 for MWh->Wh, / 3600 for s->h
+        scale = job.power / 3.6e9
+        return [
+            scale * ((prefix[i + k - 1] - prefix[i]) * SLOT_SECONDS + (prefix[i + k] - prefix[i + k - 1]) * tail)
+            for i in range(last - first + 1)
+        ]
+
+    def _prepare(self, job):
+        """Compute the job's start window and cost curve once; prices don't change while it is queued."""
+        if job.pinned:
+            job.first_slot = self.grid.slot_of(job.earliest_start)
+            job.costs = self._window_costs(job, job.first_slot, job.first_slot)
+        else:
+            origin = self.grid.origin
+            job.first_slot = math.ceil((job.earliest_start - origin).total_seconds() / SLOT_SECONDS)
+            last = math.floor(((job.deadline - origin).total_seconds() - job.reserve_runtime) / SLOT_SECONDS)
+            job.costs = self._window_costs(job, job.first_slot, last) if last >= job.first_slot else []
+        job.best_cost = min(job.costs) if job.costs else None
+
+    def _place(self, job, first=None, last=None, below=None):
+        """Reserve the cheapest feasible start in [first, last], optionally only if cheaper than `below`."""
+        lo = job.first_slot if first is None else max(first, job.first_slot)
+        hi = job.first_slot + len(job.costs) - 1 if last is None else min(last, job.first_slot + len(job.costs) - 1)
+        if hi < lo:
+            return False
+        candidates = sorted((job.costs[s - job.first_slot], s) for s in range(lo, hi + 1))
+        for cost, s in candidates:
+            if below is not None and cost >= below:
+                return False
+            if job.pinned or self.index.fits(s, s + job.num_slots, job.power, job.memory):
+                job.start_slot = s
+                job.cost_eur = cost
+                self.index.reserve(job.id, s, s + job.num_slots, job.power, job.memory)
+                return True
+        return False
+
+    def _check_memory(self, job):
+        if not job.pinned and job.memory > self.index.max_memory:
+            raise ValueError(f"Job {job.id} needs {job.memory:.0f} MB, more than the "
+                             f"{self.index.max_memory:.0f} MB this host schedules")
+
+    def add(self, job):
+        """Place a new job; raises ValueError if no slot before its deadline has capacity left.
+
+        An id that is already placed is a ValueError too; re-placing a known job goes through update().
+        """
+        if job.id in self.jobs:
+            raise ValueError(f"Job {job.id} is already placed")
+        self._check_memory(job)
+        self._touch(job.id)
+        self._prepare(job)
+        if not self._place(job):
+            raise ValueError(f"No feasible slot for job {job.id} before its deadline")
+        self.jobs[job.id] = job
+        return job
+
+    def update(self, job):
+        """Re-place a queued job under new estimates or a new pinned time.
+
+        Raises ValueError, keeping the old reservation, if the new estimates fit nowhere before
+        the deadline. Returns the other jobs that moved into capacity the old reservation freed.
+        """
+        if job.id not in self.jobs:
+            self.add(job)
+            return []
+        self._check_memory(job)
+        self._touch(job.id)
+        old = self.index.release(job.id)
+        self._prepare(job)
+        if not self._place(job):
+            self.index.reserve(job.id, *old)
+            raise ValueError(f"No feasible slot for job {job.id} before its deadline")
+        self.jobs[job.id] = job
+        return [other for other in self._replan([old]) if other.id != job.id]
+
+    def remove(self, job_id):
+        """Release a job and re-plan movable jobs that can move into the freed interval more cheaply.
+
+        Each move frees another interval, which is processed the same way; every move strictly
+        lowers the total cost, so the cascade terminates. Returns the jobs whose start time changed.
+        """
+        self._touch(job_id)
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return []
+        freed = self.index.release(job_id)
+        return self._replan([freed] if freed else [])
+
+    def _replan(self, pending):
+        """Move jobs into the freed (start, end, ...) intervals in `pending` while that lowers their cost."""
+        moved = {}
+        while pending:
+            start, end = pending.pop()[:2]
+            free_from, free_to = self.grid.slot_start(start), self.grid.slot_start(end)
+            affected = sorted(
+                (j for j in self.jobs.values()
+                 if not j.pinned and j.best_cost < j.cost_eur and j.earliest_start < free_to and j.deadline > free_from),
+                key=lambda j: j.deadline,
+            )
+            for other in affected:
+                # Only starts whose run overlaps the freed interval can have gained capacity
+                lo = max(start - other.num_slots + 1, other.first_slot)
+                hi = min(end - 1, other.first_slot + len(other.costs) - 1)
+                if hi < lo or min(other.costs[lo - other.first_slot:hi - other.first_slot + 1]) >= other.cost_eur:
+                    continue
+                self._touch(other.id)
+                old = self.index.release(other.id)
+                if self._place(other, lo, hi, below=other.cost_eur):
+                    moved[other.id] = other
+                    pending.append(old)
+                else:
+                    self.index.reserve(other.id, *old)
+        return list(moved.values())
+
+    def start_time(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.start_slot is None:
+            return None
+        return self.grid.slot_start(job.start_slot)
+
+    def total_cost(self):
+        return sum(job.cost_eur or 0.0 for job in self.jobs.values())
+
+
+def benchmark(num_jobs=10000, seed=42):
+    """Place and then delete a batch of random jobs against a synthetic two-day price curve."""
+    import random
+    import time
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    curve = [(now + timedelta(minutes=SLOT_MINUTES * i), 80 + rng.uniform(-10, 10)) for i in range(96)]
+    engine = PlacementEngine(curve, max_concurrent=num_jobs // 10, max_power=num_jobs // 10 * 45.0)
+
+    jobs = []
+    for i in range(num_jobs):
+        earliest = now + timedelta(minutes=rng.randint(0, 24 * 60))
+        deadline = earliest + timedelta(hours=rng.randint(2, 24))
+        jobs.append(PlacementJob(f"job-{i}", earliest, deadline, rng.uniform(1, 3600), rng.uniform(10, 60)))
+
+    start = time.perf_counter()
+    rejected = 0
+    for job in jobs:
+        try:
+            engine.add(job)
+        except ValueError:
+            rejected += 1
+    place_time = time.perf_counter() - start
+    print(f"Placed {num_jobs} jobs in {place_time:.3f}s ({place_time / num_jobs * 1e6:.1f} us/job), "
+          f"{rejected} rejected, total cost {engine.total_cost():.4f} EUR")
+
+    start = time.perf_counter()
+    moved = 0
+    for job in rng.sample(list(engine.jobs.values()), min(100, len(engine.jobs))):
+        moved += len(engine.remove(job.id))
+    delete_time = time.perf_counter() - start
+    print(f"Deleted 100 jobs in {delete_time:.3f}s ({delete_time / 100 * 1e3:.2f} ms/delete), {moved} jobs re-planned")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,182 @@
+"""
+Benchmark prompts: the hand-written dataset, or a synthetic corpus with controlled token lengths.
+- SyntheticPrompts builds prompt i from its own seeded RNG (seed, i), so any prompt can be
+  produced on demand, in any order and on any worker, and is identical on every run
+- Lengths are drawn from a configured distribution (fixed values with weights, uniform or
+  log-uniform between min and max) and hit exactly with the target model's tokenizer: an
+  instruction, then filler words, topped up with words that are a single token for that tokenizer
+- DatasetPrompts reads prompts_dataset.json (a JSON list) or a .jsonl file lazily; JSONL is
+  indexed by line offsets, so a large corpus is never loaded whole
+- Nothing is generated or read until a prompt is asked for; open_prompts() picks the source
+  from the sweep's "corpus" key (null: the dataset, a path: that file, an object: synthetic)
+
+Usage: python prompt_corpus.py MODEL COUNT [--seed N] [--min N] [--max N] > corpus.jsonl
+"""
+import json
+import math
+import random
+
+DATASET_PATH = "prompts_dataset.json"
+DEFAULT_CORPUS = {"distribution": "log_uniform", "min": 8, "max": 2048, "seed": 0}
+DISTRIBUTIONS = ("values", "uniform", "log_uniform")
+MAX_ATTEMPTS = 20
+
+INSTRUCTIONS = [
+    "Summarize the following text.",
+    "Translate the following text into French.",
+    "Answer the question at the end of the following notes.",
+    "List the key points of the following passage.",
+    "Rewrite the following paragraph in a formal tone.",
+    "Classify the topic of the following text.",
+]
+FILLER_WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but "
+    "have an they you were her she there been one all we their has would when if more no out so said "
+    "what up its about into than them can only other new some could time these two may then do first "
+    "any my now such like our over man me even most made after also did many before must through back "
+    "years where much your way well down should because each just those people how too little state "
+    "good very make world still own see men work long get here between both life being under never day "
+    "same another know while last might us great old year off come since against go came right used take "
+    "three states himself few house use during without again place around however home small found "
+    "thought went say part once general high upon school every does got united left number course war "
+    "until always away something fact though water less public put think almost hand enough far took head "
+    "yet government system better set told nothing night end why called didn find going look asked later "
+    "knew point next program city business give group toward young days let room president side social "
+    "given present several order national possible rather second face per among form important often"
+).split()
+
+
+def validate_corpus(corpus):
+    corpus = {**DEFAULT_CORPUS, **corpus}
+    if corpus["distribution"] not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown corpus distribution {corpus['distribution']!r}; expected one of {DISTRIBUTIONS}")
+    if corpus["distribution"] == "values" and not corpus.get("values"):
+        raise ValueError("A 'values' corpus needs a non-empty 'values' list")
+    if corpus["distribution"] != "values" and not 1 <= corpus["min"] <= corpus["max"]:
+        raise ValueError("Corpus lengths need 1 <= min <= max")
+    return corpus
+
+
+def sample_length(corpus, rng):
+    if corpus["distribution"] == "values":
+        return int(rng.choices(corpus["values"], weights=corpus.get("weights"))[0])
+    if corpus["distribution"] == "uniform":
+        return rng.randint(corpus["min"], corpus["max"])
+    return int(round(math.exp(rng.uniform(math.log(corpus["min"]), math.log(corpus["max"])))))
+
+
+class SyntheticPrompts:
+    def __init__(self, tokenizer, corpus=None):
+        self.tokenizer = tokenizer
+        self.corpus = validate_corpus(corpus or {})
+        self._single_token_words = None
+
+    def count(self, text):
+        """Tokens the benchmark will feed the model for `text` (special tokens included)."""
+        return len(self.tokenizer(text)["input_ids"])
+
+    def single_token_words(self):
+        if self._single_token_words is None:
+            self._single_token_words = [
+                w for w in FILLER_WORDS if len(self.tokenizer(" " + w, add_special_tokens=False)["input_ids"]) == 1
+            ] or FILLER_WORDS
+        return self._single_token_words
+
+    def get(self, index):
+        """(text, token length) of prompt `index`."""
+        rng = random.Random(f"{self.corpus['seed']}:{index}")
+        target = sample_length(self.corpus, rng)
+        return self.build(target, rng), target
+
+    def build(self, target, rng):
+        """Text of exactly `target` tokens, or the closest one found after MAX_ATTEMPTS."""
+        best, best_error = None, None
+        for _ in range(MAX_ATTEMPTS):
+            words = [rng.choice(INSTRUCTIONS)]
+            n = self.count(words[0])
+            if n > target:
+                words, n = [], self.count("")  # Too short a target for an instruction: filler only
+            base = len(words)
+            # Bulk-fill with any words (each is at least one token), then top up one token at a time
+            while n < target:
+                gap = target - n
+                words.extend(rng.choice(FILLER_WORDS) for _ in range(max(1, gap // 2)))
+                n = self.count(" ".join(words))
+                while n > target and len(words) > base:
+                    words.pop()
+                    n = self.count(" ".join(words))
+                if n < target and target - n <= 2:
+                    words.extend(rng.choice(self.single_token_words()) for _ in range(target - n))
+                    n = self.count(" ".join(words))
+                    if n > target:
+                        break
+            text = " ".join(words)
+            if n == target:
+                return text
+            if best_error is None or abs(n - target) < best_error:
+                best, best_error = text, abs(n - target)
+        print(f"[WARN] Synthetic prompt is {best_error} tokens off its target of {target}")
+        return best
+
+
+class DatasetPrompts:
+    def __init__(self, path):
+        self.path = path
+        self._prompts = None
+        self._offsets = None
+
+    def _load(self):
+        if self.path.endswith(".jsonl"):
+            self._offsets = []
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        self._offsets.append(offset)
+                    offset += len(line)
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._prompts = json.load(f)
+
+    def __len__(self):
+        if self._prompts is None and self._offsets is None:
+            self._load()
+        return len(self._prompts if self._prompts is not None else self._offsets)
+
+    def get(self, index):
+        """(text, None); indices past the end cycle through the dataset."""
+        index %= len(self)
+        if self._prompts is not None:
+            return self._prompts[index], None
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[index])
+            record = json.loads(f.readline())
+        return (record["text"] if isinstance(record, dict) else record), None
+
+
+def open_prompts(corpus, tokenizer, dataset_path=DATASET_PATH):
+    """Prompt source for a sweep's "corpus" setting; synthetic prompts are fitted to `tokenizer`."""
+    if corpus is None:
+        return DatasetPrompts(dataset_path)
+    if isinstance(corpus, str):
+        return DatasetPrompts(corpus)
+    return SyntheticPrompts(tokenizer, corpus)
+
+
+if __name__ == "__main__":
+    import argparse
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser(description="Write a synthetic prompt corpus as JSONL")
+    parser.add_argument("model")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=DEFAULT_CORPUS["seed"])
+    parser.add_argument("--min", type=int, default=DEFAULT_CORPUS["min"])
+    parser.add_argument("--max", type=int, default=DEFAULT_CORPUS["max"])
+    args = parser.parse_args()
+
+    prompts = SyntheticPrompts(AutoTokenizer.from_pretrained(args.model),
+                               {"seed": args.seed, "min": args.min, "max": args.max})
+    for i in range(args.count):
+        text, tokens = prompts.get(i)
+        print(json.dumps({"index": i, "tokens": tokens, "text": text}), flush=True)
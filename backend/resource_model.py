@@ -0,0 +1,149 @@
+"""
+Peak memory and cold-load time predictors, so placement knows whether a job fits in RAM and how long it takes to start.
+- Peak RSS of a run is the larger of the from_pretrained peak and the inference peak, fitted per
+  model (and inference variant) as m0 + m1 * batch_size * context tokens: weights plus a KV cache
+  and activations growing with every token in flight
+- Load time is the median from_pretrained duration of the model's benchmark rows
+- Models without rows use a fit across all models on parameter bytes (and layers * tokens), and
+  with no benchmark data at all an analytic estimate: weights plus an fp32 KV cache sized from
+  the usual 12 * layers * hidden^2 parameter count, and weights read at DEFAULT_LOAD_GBPS
+- Only NumPy is needed, so app.py and the scheduler can load it without sklearn
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from generation_model import fit_nonnegative, group_key
+from inference_variants import DEFAULT_VARIANT
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+RESOURCE_MODEL_PATH = os.path.join(BACKEND_ROOT, "resource_model.json")
+MIN_FIT_ROWS = 2
+MIN_GLOBAL_ROWS = 3
+RUNTIME_BASELINE_BYTES = 400 * 1024 * 1024  # Python, torch and transformers before any model is loaded
+DEFAULT_LOAD_GBPS = 1.0
+LOAD_OVERHEAD_SECONDS = 0.5
+BYTES_PER_PARAM = 4
+
+
+def context_tokens(prompt_tokens, new_tokens, batch_size=1):
+    """Tokens held in the KV cache at the end of a generation, over the whole batch."""
+    return batch_size * (prompt_tokens + new_tokens)
+
+
+def prepare(df):
+    """Benchmark rows that measured memory or load time, with the columns the fits use."""
+    if "peak_rss_bytes" not in df.columns and "load_time" not in df.columns:
+        return None
+    df = df.dropna(subset=["model", "sequence_length"])
+    prompt = df["sequence_length"].astype(float)
+    total = df["output_token_count"].astype(float).fillna(0) if "output_token_count" in df.columns else 0.0
+    # run_benchmark.py records the full generated sequence, prompt included
+    final = np.where(total > prompt, total, prompt + total)
+    batch = df["batch_size"].astype(float).fillna(1) if "batch_size" in df.columns else 1.0
+    params = df["num_params"].astype(float).fillna(0) * BYTES_PER_PARAM
+    param_bytes = df["param_bytes"].astype(float).fillna(params) if "param_bytes" in df.columns else params
+    peaks = [df[c].astype(float) for c in ("peak_rss_bytes", "load_peak_rss_bytes") if c in df.columns]
+    return df.assign(
+        variant=df["variant"].fillna(DEFAULT_VARIANT) if "variant" in df.columns else DEFAULT_VARIANT,
+        context=final * batch,
+        param_bytes=param_bytes,
+        layers=df["num_layers"].astype(float).fillna(0) if "num_layers" in df.columns else 0.0,
+        peak=np.fmax.reduce(peaks) if peaks else np.nan,
+        load=df["load_time"].astype(float) if "load_time" in df.columns else np.nan,
+    )
+
+
+def fit_resource_model(df):
+    """Per-(model, variant) and cross-model fits of peak memory and load time from benchmark rows."""
+    df = prepare(df)
+    if df is None:
+        return ResourceModel({}, {})
+    groups = {}
+    for (model_name, variant), rows in df.groupby(["model", "variant"]):
+        fit = {}
+        memory = rows.dropna(subset=["peak"])
+        if len(memory) >= MIN_FIT_ROWS:
+            A = np.column_stack([np.ones(len(memory)), memory["context"]])
+            fit["memory"] = fit_nonnegative(A, memory["peak"].to_numpy()).tolist()
+            fit["memory_rows"] = int(len(memory))
+        load = rows["load"].dropna()
+        if len(load):
+            fit["load_seconds"] = float(load.median())
+        if fit:
+            groups[group_key(model_name, variant=variant)] = fit
+
+    global_fit = {}
+    memory = df.dropna(subset=["peak"])
+    if len(memory) >= MIN_GLOBAL_ROWS:
+        A = np.column_stack([np.ones(len(memory)), memory["param_bytes"], memory["layers"] * memory["context"]])
+        global_fit["memory"] = fit_nonnegative(A, memory["peak"].to_numpy()).tolist()
+    load = df.dropna(subset=["load"])
+    if len(load) >= MIN_GLOBAL_ROWS:
+        A = np.column_stack([np.ones(len(load)), load["param_bytes"]])
+        global_fit["load"] = fit_nonnegative(A, load["load"].to_numpy()).tolist()
+    return ResourceModel(groups, global_fit)
+
+
+def analytic_peak_bytes(param_bytes, num_params, num_layers, context):
+    hidden = math.sqrt(num_params / (12 * num_layers)) if num_params and num_layers else 0.0
+    kv_cache = 2 * num_layers * hidden * context * 4  # Keys and values, fp32
+    return RUNTIME_BASELINE_BYTES + param_bytes + kv_cache
+
+
+class ResourceModel:
+    def __init__(self, groups, global_fit):
+        self.groups = groups
+        self.global_fit = global_fit
+
+    @classmethod
+    def load(cls, path=RESOURCE_MODEL_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["groups"], data.get("global", {}))
+
+    def save(self, path=RESOURCE_MODEL_PATH):
+        with open(path, "w") as f:
+            json.dump({"groups": self.groups, "global": self.global_fit}, f, indent=2)
+
+    def predict(self, model_name, features, prompt_tokens, new_tokens=0, batch_size=1, variant=None):
+        """Peak RSS (MB) and cold-load seconds of one run, with where each number came from."""
+        num_params = float(features.get("num_params") or 0)
+        num_layers = float(features.get("num_layers") or 0)
+        param_bytes = float(features.get("param_bytes") or num_params * BYTES_PER_PARAM)
+        context = context_tokens(prompt_tokens, new_tokens, batch_size)
+        group = self.groups.get(group_key(model_name, variant=variant), {})
+
+        if "memory" in group:
+            m0, m1 = group["memory"]
+            peak, memory_source = m0 + m1 * context, "model"
+        elif "memory" in self.global_fit:
+            g0, g1, g2 = self.global_fit["memory"]
+            peak, memory_source = g0 + g1 * param_bytes + g2 * num_layers * context, "global"
+        else:
+            peak, memory_source = analytic_peak_bytes(param_bytes, num_params, num_layers, context), "analytic"
+
+        if "load_seconds" in group:
+            load, load_source = group["load_seconds"], "model"
+        elif "load" in self.global_fit:
+            l0, l1 = self.global_fit["load"]
+            load, load_source = l0 + l1 * param_bytes, "global"
+        else:
+            load, load_source = LOAD_OVERHEAD_SECONDS + param_bytes / (DEFAULT_LOAD_GBPS * 1e9), "analytic"
+
+        return {
+            "peakMemoryMb": float(peak) / (1024 * 1024),
+            "loadSeconds": float(load),
+            "memorySource": memory_source,
+            "loadSource": load_source,
+        }
+
+
+def load_or_empty(path=RESOURCE_MODEL_PATH):
+    """The fitted model, or an empty one that answers with the analytic estimates."""
+    try:
+        return ResourceModel.load(path)
+    except (OSError, ValueError):
+        return ResourceModel({}, {})
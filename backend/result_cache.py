@@ -0,0 +1,128 @@
+"""
+Content-addressed cache for prediction results.
+- Keys hash the model revision, normalized input text, hardware fingerprint, energy price version
+  live estimator version and quoted generation length
+- The revision is the commit hash app.py loaded, never a client-supplied string: lookups read it
+  from the local Hugging Face cache (model_revision()), stores take the one app.py printed
+- Entries expire after a TTL and the least recently used entry is evicted when the cache is full
+- Hit/miss counters are exposed for /api/cache/stats
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+PRICE_PATH = os.path.join(BACKEND_ROOT, "data.csv")
+HF_HUB_CACHE = os.environ.get("HF_HUB_CACHE") or os.path.join(
+    os.environ.get("HF_HOME") or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"), "hub")
+COMMIT_HASH = re.compile(r"[0-9a-f]{40}")
+
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 256
+
+# Hardware fields that identify the host; cpu_frequency is left out because it changes with load
+FINGERPRINT_FIELDS = ["device", "num_cores", "memory_bytes", "os", "machine", "gpu_available"]
+
+_hardware_fingerprint = None
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def fingerprint_features(features):
+    payload = json.dumps({field: features.get(field) for field in FINGERPRINT_FIELDS}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def hardware_fingerprint():
+    """Stable hash of this host's hardware, computed once per process."""
+    global _hardware_fingerprint
+    if _hardware_fingerprint is None:
+        try:
+            from extract_hardware_features import extract_hardware_features
+            features = extract_hardware_features(calibrate=False)
+        except Exception as e:
+            print(f"[WARN] Could not extract hardware features for cache key: {e}")
+            features = {}
+        _hardware_fingerprint = fingerprint_features(features)
+    return _hardware_fingerprint
+
+
+def price_version(path=PRICE_PATH):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def model_revision(model_name, hub_cache=HF_HUB_CACHE):
+    """Commit hash `main` resolves to in the local Hugging Face cache, which is what app.py loads
+    (every from_pretrained() call refreshes it); None when the model has not been downloaded."""
+    path = os.path.join(hub_cache, "models--" + model_name.replace("/", "--"), "refs", "main")
+    try:
+        with open(path) as f:
+            revision = f.read().strip()
+    except OSError:
+        return None
+    return revision if COMMIT_HASH.fullmatch(revision) else None
+
+
+def cache_key(model_name, input_text, model_revision, estimator_version=None, max_new_tokens=None):
+    payload = json.dumps([model_name, model_revision, normalize_text(input_text),
+                          hardware_fingerprint(), price_version(), estimator_version, max_new_tokens])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, result)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': self.hits / lookups if lookups else 0.0,
+                'size': len(self.entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl,
+            }
+
+
+result_cache = ResultCache()
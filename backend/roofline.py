@@ -0,0 +1,122 @@
+"""
+Roofline-style analytic runtime estimator.
+- Each phase takes max(compute time, memory time): FLOPs against the host's attainable GFLOPS,
+  bytes moved against its attainable memory bandwidth
+- Prefill runs the whole prompt through the weights once: 2 * params FLOPs per token, weights read once
+- Decode generates one token per step: 2 * params FLOPs, and every weight is read again each step
+- Host peaks come from calibrated hardware features (peak_gflops, memory_gbps) when present,
+  otherwise from cores * frequency and a default bandwidth
+- Weights take BYTES_PER_PARAM unless the features carry bytes_per_param (1 for an int8 variant);
+  the other inference variants change nothing the roofline can see
+- Needs no training data, so it is the fallback for hosts and models without a trained model
+- predict_runtime_frame() applies the same model to whole columns for evaluating large benchmark sets
+"""
+import numpy as np
+
+BYTES_PER_PARAM = 4  # fp32 weights, as loaded by app.py and run_benchmark.py
+FLOPS_PER_CYCLE = 16  # fp32 FLOPs per core per cycle with 256-bit FMA
+DEFAULT_MEMORY_GBPS = 50.0
+COMPUTE_EFFICIENCY = 0.5  # Fraction of nominal peak a framework forward pass reaches
+MEMORY_EFFICIENCY = 0.7
+# Fixed per-call overhead (Python dispatch, kernel launches) that the roofline itself cannot see
+OVERHEAD_SECONDS = 0.01
+
+
+def frequency_ghz(value):
+    """cpu_frequency is in GHz in benchmark rows but in Hz from extract_hardware_features()."""
+    value = float(value or 0)
+    return value / 1e9 if value > 1e6 else value
+
+
+def host_peaks(features):
+    """(attainable GFLOPS, attainable GB/s) for the host described by `features`."""
+    gflops = float(features.get("peak_gflops") or 0)
+    if gflops <= 0:
+        cores = float(features.get("num_cores") or 1)
+        gflops = cores * (frequency_ghz(features.get("cpu_frequency")) or 1.0) * FLOPS_PER_CYCLE * COMPUTE_EFFICIENCY
+    gbps = float(features.get("memory_gbps") or 0)
+    if gbps <= 0:
+        gbps = DEFAULT_MEMORY_GBPS * MEMORY_EFFICIENCY
+    return gflops, gbps
+
+
+def phase_time(flops, bytes_moved, gflops, gbps):
+    compute = flops / (gflops * 1e9)
+    memory = bytes_moved / (gbps * 1e9)
+    return max(compute, memory), "compute" if compute >= memory else "memory"
+
+
+def prefill_flops(features):
+    params = float(features.get("num_params") or 0)
+    tokens = float(features.get("sequence_length") or 0) * float(features.get("batch_size") or 1)
+    if params > 0 and tokens > 0:
+        return 2 * params * tokens
+    # thop reports multiply-accumulates for the profiled input
+    return 2 * float(features.get("flops") or 0)
+
+
+def bytes_per_param(features):
+    return float(features.get("bytes_per_param") or BYTES_PER_PARAM)
+
+
+def predict_prefill(features):
+    gflops, gbps = host_peaks(features)
+    weight_bytes = float(features.get("num_params") or 0) * bytes_per_param(features)
+    seconds, bound = phase_time(prefill_flops(features), weight_bytes, gflops, gbps)
+    return seconds + OVERHEAD_SECONDS, bound
+
+
+def predict_decode_token(features):
+    gflops, gbps = host_peaks(features)
+    params = float(features.get("num_params") or 0)
+    batch = float(features.get("batch_size") or 1)
+    seconds, bound = phase_time(2 * params * batch, params * bytes_per_param(features), gflops, gbps)
+    return seconds + OVERHEAD_SECONDS, bound
+
+
+def predict_runtime(features):
+    """Single forward pass over the prompt, the quantity estimator.py learns as inference_time."""
+    return predict_prefill(features)[0]
+
+
+def predict_generation(features, prompt_tokens, new_tokens):
+    """Same shape as GenerationModel.predict(), for models or hosts it has no fit for."""
+    prefill, prefill_bound = predict_prefill({**features, "sequence_length": prompt_tokens})
+    per_token, decode_bound = predict_decode_token(features)
+    decode = per_token * new_tokens
+    return {
+        "promptTokens": int(prompt_tokens),
+        "newTokens": int(new_tokens),
+        "prefillSeconds": prefill,
+        "decodeSeconds": decode,
+        "totalSeconds": prefill + decode,
+        "perTokenSeconds": per_token,
+        "prefillBound": prefill_bound,
+        "decodeBound": decode_bound,
+    }
+
+
+def _column(columns, name, default):
+    """Float column `name`; missing, NaN and zero entries become `default`, as `value or default` does."""
+    if name not in columns:
+        return np.full(len(columns), default, dtype=float)
+    values = np.asarray(columns[name], dtype=float)
+    return np.where(np.isnan(values) | (values == 0), default, values)
+
+
+def predict_runtime_frame(columns):
+    """predict_runtime() for every row of a DataFrame (or dict of arrays) at once."""
+    freq = _column(columns, "cpu_frequency", 1.0)
+    freq = np.where(freq > 1e6, freq / 1e9, freq)
+    nominal = _column(columns, "num_cores", 1.0) * freq * FLOPS_PER_CYCLE * COMPUTE_EFFICIENCY
+    gflops = _column(columns, "peak_gflops", 0.0)
+    gflops = np.where(gflops > 0, gflops, nominal)
+    gbps = _column(columns, "memory_gbps", 0.0)
+    gbps = np.where(gbps > 0, gbps, DEFAULT_MEMORY_GBPS * MEMORY_EFFICIENCY)
+
+    params = _column(columns, "num_params", 0.0)
+    tokens = _column(columns, "sequence_length", 0.0) * _column(columns, "batch_size", 1.0)
+    flops = np.where((params > 0) & (tokens > 0), 2 * params * tokens, 2 * _column(columns, "flops", 0.0))
+    compute = flops / (gflops * 1e9)
+    memory = params * _column(columns, "bytes_per_param", BYTES_PER_PARAM) / (gbps * 1e9)
+    return np.maximum(compute, memory) + OVERHEAD_SECONDS
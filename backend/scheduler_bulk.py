@@ -0,0 +1,180 @@
+"""
+Helpers for the bulk scheduler endpoints.
+- Validates a whole array of job payloads and reports per-item errors by index
+- Fills in missing energy/cost estimates for all valid items in one vectorized pass
+- Run directly to benchmark bulk submission against one POST per job
+"""
+from datetime import datetime
+
+import numpy as np
+
+from job_runner import resource_limits
+from placement import load_price_curve, parse_time, FALLBACK_PRICE
+
+MAX_BULK_JOBS = 10000
+
+
+def validate_jobs(items):
+    """Split job payloads into normalized valid jobs and {index, error} entries."""
+    valid, errors = [], []
+    if not isinstance(items, list):
+        return valid, [{'index': None, 'error': 'Expected a list of jobs'}]
+    if len(items) > MAX_BULK_JOBS:
+        return valid, [{'index': None, 'error': f'At most {MAX_BULK_JOBS} jobs per request'}]
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Job must be an object'})
+            continue
+        model_name = item.get('modelName')
+        input_text = item.get('inputText')
+        if not isinstance(model_name, str) or not model_name.strip():
+            errors.append({'index': index, 'error': 'modelName is required'})
+            continue
+        if not isinstance(input_text, str) or not input_text.strip():
+            errors.append({'index': index, 'error': 'inputText is required'})
+            continue
+        try:
+            scheduled_time = parse_time(item['scheduledTime']) if item.get('scheduledTime') else None
+            deadline = parse_time(item['deadline']) if item.get('deadline') else None
+            earliest_start = parse_time(item['earliestStart']) if item.get('earliestStart') else None
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': f'Invalid time: {e}'})
+            continue
+        if scheduled_time is None and deadline is None:
+            errors.append({'index': index, 'error': 'scheduledTime or deadline is required'})
+            continue
+        try:
+            numbers = {
+                field: float(item[field]) if item.get(field) is not None else None
+                for field in ['estimatedCost', 'estimatedRuntime', 'estimatedEnergy', 'energyPrice', 'estimatedPower',
+                              'runtimeP50', 'runtimeP90', 'runtimeP99', 'peakMemoryMb', 'loadSeconds']
+            }
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': f'Invalid number: {e}'})
+            continue
+        try:
+            numbers['timeoutSeconds'], numbers['memoryLimitMb'] = resource_limits(
+                item.get('timeoutSeconds'), item.get('memoryLimitMb'))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        valid.append({
+            'index': index,
+            'modelName': model_name,
+            'inputText': input_text,
+            'scheduledTime': scheduled_time,
+            'deadline': deadline,
+            'earliestStart': earliest_start,
+            **numbers,
+        })
+    return valid, errors
+
+
+def validate_updates(items):
+    """Split update payloads ({id, ...fields}) into normalized updates and {index, error} entries."""
+    valid, errors = [], []
+    if not isinstance(items, list):
+        return valid, [{'index': None, 'error': 'Expected a list of job updates'}]
+    if len(items) > MAX_BULK_JOBS:
+        return valid, [{'index': None, 'error': f'At most {MAX_BULK_JOBS} jobs per request'}]
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str):
+            errors.append({'index': index, 'error': 'id is required'})
+            continue
+        try:
+            update = {
+                'index': index,
+                'id': item['id'],
+                'scheduledTime': parse_time(item['scheduledTime']) if item.get('scheduledTime') else None,
+            }
+            for field in ['estimatedCost', 'estimatedRuntime', 'estimatedEnergy', 'energyPrice', 'estimatedPower',
+                          'runtimeP50', 'runtimeP90', 'runtimeP99', 'peakMemoryMb', 'loadSeconds']:
+                update[field] = float(item[field]) if item.get(field) is not None else None
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'id': item['id'], 'error': str(e)})
+            continue
+        valid.append(update)
+    return valid, errors
+
+
+def _column(jobs, field):
+    return np.array([np.nan if job[field] is None else job[field] for job in jobs], dtype=float)
+
+
+def compute_estimates(jobs, curve=None):
+    """Fill energyPrice, estimatedEnergy and estimatedCost in place where they are missing.
+
+    Prices are the nearest point of the auction curve to each scheduled time, like
+    /api/scheduler/energy-price; energy is in Wh and cost in EUR.
+    """
+    if not jobs:
+        return jobs
+    curve = load_price_curve() if curve is None else curve
+    runtime = _column(jobs, 'estimatedRuntime')
+    power = _column(jobs, 'estimatedPower')
+    price = _column(jobs, 'energyPrice')
+    energy = _column(jobs, 'estimatedEnergy')
+    cost = _column(jobs, 'estimatedCost')
+
+    missing_price = np.isnan(price) & np.array([job['scheduledTime'] is not None for job in jobs])
+    if missing_price.any():
+        if curve:
+            curve_ts = np.array([dt.timestamp() for dt, _ in curve])
+            curve_price = np.array([p for _, p in curve])
+            times = np.array([job['scheduledTime'].timestamp() if job['scheduledTime'] else 0.0 for job in jobs])
+            if len(curve_ts) > 1:
+                right = np.clip(np.searchsorted(curve_ts, times), 1, len(curve_ts) - 1)
+                left = right - 1
+                nearest = np.where(times - curve_ts[left] <= curve_ts[right] - times, left, right)
+            else:
+                nearest = np.zeros(len(jobs), dtype=int)
+            price = np.where(missing_price, curve_price[nearest], price)
+        else:
+            price = np.where(missing_price, FALLBACK_PRICE, price)
+
+    # Only fill energy from runtime and power when both are known
+    energy = np.where(np.isnan(energy), runtime * power / 3600, energy)
+    cost = np.where(np.isnan(cost), energy * price / 1e6, cost)
+
+    for job, p, e, c in zip(jobs, price.tolist(), energy.tolist(), cost.tolist()):
+        job['energyPrice'] = None if np.isnan(p) else p
+        job['estimatedEnergy'] = None if np.isnan(e) else e
+        job['estimatedCost'] = None if np.isnan(c) else c
+    return jobs
+
+
+def benchmark(num_jobs=2000):
+    """Compare one POST per job against a single bulk POST on a scratch database."""
+    import os
+    import sys
+    import tempfile
+    import time
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)  # server.py keeps scheduler.db in the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import server
+
+    client = server.app.test_client()
+    payload = [
+        {'modelName': 'Qwen/Qwen3-0.6B', 'inputText': f'Prompt {i}',
+         'scheduledTime': datetime.now().isoformat(), 'estimatedRuntime': 2.5, 'estimatedPower': 30}
+        for i in range(num_jobs)
+    ]
+
+    start = time.perf_counter()
+    for job in payload:
+        client.post('/api/scheduler/jobs', json=job)
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/api/scheduler/jobs/bulk', json={'jobs': payload})
+    bulk_time = time.perf_counter() - start
+
+    print(f"Per-job POST: {num_jobs} jobs in {single_time:.3f}s ({single_time / num_jobs * 1e3:.2f} ms/job)")
+    print(f"Bulk POST:    {num_jobs} jobs in {bulk_time:.3f}s ({bulk_time / num_jobs * 1e3:.2f} ms/job), "
+          f"status {response.status_code}, speedup {single_time / bulk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -12,6 +12,13 @@ import threading
 import time
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from api_pipeline_info import api_pipeline_info
+from placement import PlacementEngine, PlacementJob, parse_time, DEFAULT_POWER_W
+from events import api_events, broadcaster
+from result_cache import cache_key, model_revision, result_cache
+from scheduler_bulk import compute_estimates, validate_jobs, validate_updates
+from job_runner import run_app_py, cancel_process, start_reaper, resource_limits, JOB_TIMEOUT_SECONDS
+from model_registry import registry
+from feedback import feedback_store, drift_report, start_trainer
 
 # Set the TOKENIZERS_PARALLELISM environment variable to prevent warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -19,6 +26,7 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 app = Flask(__name__)
 CORS(app, origins=["https://faradayx.netlify.app"], supports_credentials=True, allow_headers=["Content-Type", "Authorization", "X-Requested-With"], expose_headers=["Content-Type"], methods=["GET", "POST", "OPTIONS", "DELETE", "PUT"])
 app.register_blueprint(api_pipeline_info)
+app.register_blueprint(api_events)
 
 # Initialize SQLite database for scheduled jobs
 def init_db():
@@ -40,12 +48,96 @@ def init_db():
             completed_at TEXT
         )
     ''')
+    # Columns added after the first release; older databases are migrated in place
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(scheduled_jobs)')}
+    for column, column_type in [('earliest_start', 'TEXT'), ('deadline', 'TEXT'), ('estimated_power', 'REAL'),
+                                ('started_at', 'TEXT'), ('timeout_seconds', 'REAL'), ('memory_limit_mb', 'REAL'),
+                                ('attempts', 'INTEGER DEFAULT 0'), ('worker_pgid', 'INTEGER'),
+                                ('runtime_p50', 'REAL'), ('runtime_p90', 'REAL'), ('runtime_p99', 'REAL'),
+                                ('peak_memory_mb', 'REAL'), ('load_seconds', 'REAL')]:
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE scheduled_jobs ADD COLUMN {column} {column_type}')
     conn.commit()
     conn.close()
 
 # Initialize database on startup
 init_db()
 
+def on_jobs_reaped(reaped):
+    for job_id, status in reaped:
+        broadcaster.publish_job(job_id, status)
+        if status == 'failed':
+            release_placement(job_id)
+
+# Return jobs orphaned by a crashed worker to the queue, now and periodically
+start_reaper(on_reaped=on_jobs_reaped)
+
+# Refit the estimator on benchmarks plus logged feedback when its live error drifts
+start_trainer(feedback_store, registry)
+
+# Placement engine for deadline-based jobs, built lazily from the pending rows in the database
+placement_engine = None
+placement_lock = threading.Lock()
+
+def get_placement_engine():
+    global placement_engine
+    if placement_engine is None:
+        engine = PlacementEngine()
+        conn = sqlite3.connect('scheduler.db')
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, scheduled_time, earliest_start, deadline, estimated_runtime, estimated_power, runtime_p90,
+                   peak_memory_mb, load_seconds
+            FROM scheduled_jobs
+            WHERE status = 'pending'
+            ORDER BY deadline IS NOT NULL, deadline ASC
+        ''')
+        moved = []
+        for (job_id, scheduled_time, earliest_start, deadline, runtime, power, runtime_p90,
+             peak_memory_mb, load_seconds) in cursor.fetchall():
+            try:
+                if deadline:
+                    job = engine.add(PlacementJob(job_id, earliest_start, deadline, runtime, power,
+                                                  reserve_runtime=runtime_p90, memory_mb=peak_memory_mb,
+                                                  load_seconds=load_seconds))
+                    if parse_time(scheduled_time) != engine.start_time(job_id):
+                        moved.append(job)
+                else:
+                    # Fixed-time jobs only hold capacity
+                    engine.add(PlacementJob(job_id, scheduled_time, scheduled_time, runtime, power, pinned=True,
+                                            reserve_runtime=runtime_p90, memory_mb=peak_memory_mb,
+                                            load_seconds=load_seconds))
+            except Exception as e:
+                print(f"[WARN] Could not place job {job_id}: {e}")
+        save_placements(cursor, engine, moved)
+        conn.commit()
+        conn.close()
+        placement_engine = engine
+    return placement_engine
+
+def release_placement(job_id):
+    """Free a job's reservation and pull deadline jobs into the freed capacity where that is cheaper."""
+    with placement_lock:
+        engine = get_placement_engine()
+        moved = engine.remove(job_id)
+        if moved:
+            conn = sqlite3.connect('scheduler.db')
+            cursor = conn.cursor()
+            save_placements(cursor, engine, moved)
+            conn.commit()
+            conn.close()
+    return [job.id for job in moved]
+
+def save_placements(cursor, engine, jobs):
+    cursor.executemany('''
+        UPDATE scheduled_jobs SET scheduled_time = ?, estimated_cost = ?, energy_price = ?
+        WHERE id = ?
+    ''', [(engine.start_time(job.id).isoformat(), job.cost_eur,
+           engine.grid.price(job.start_slot), job.id) for job in jobs])
+    for job in jobs:
+        broadcaster.publish_job(job.id, 'pending', scheduledTime=engine.start_time(job.id).isoformat(),
+                                estimatedCost=job.cost_eur, energyPrice=engine.grid.price(job.start_slot))
+
 def extract(pattern, text, cast=float, default=None):
     m = re.search(pattern, text)
     if m:
@@ -55,42 +147,106 @@ def extract(pattern, text, cast=float, default=None):
             return default
     return default
 
+def shadow_score_run(stdout, predicted_runtime, actual_runtime):
+    # Scored on a background thread, so the response is not delayed
+    features = extract(r"Estimator features: (\{.*\})", stdout, cast=json.loads)
+    if features:
+        registry.shadow_score(features, predicted_runtime, actual_runtime)
+
+def extract_quantiles(stdout):
+    """runtimeP50/P90/P99 from app.py's quantile line; None where the estimator gave none."""
+    return {f'runtimeP{q}': extract(rf"Predicted runtime quantiles \(seconds\):.*\bp{q}=([0-9.]+)", stdout)
+            for q in (50, 90, 99)}
+
+def extract_generation(stdout):
+    """Prefill/decode quote for a full generation, or None when app.py had no generation model."""
+    prefill = extract(r"Predicted prefill time \(seconds\): ([0-9.]+)", stdout)
+    if prefill is None:
+        return None
+    return {
+        'newTokens': extract(r"Predicted decode time \(seconds\): [0-9.]+ for ([0-9]+) tokens", stdout, cast=int),
+        'prefillSeconds': prefill,
+        'decodeSeconds': extract(r"Predicted decode time \(seconds\): ([0-9.]+)", stdout),
+        'energyWh': extract(r"Predicted generation energy: ([0-9.]+) Wh", stdout),
+        'costCents': extract(r"Predicted cost of generation: ([0-9.]+) cents", stdout),
+        'costEur': extract(r"Predicted cost of generation: [0-9.]+ cents \(([0-9.]+) EUR\)", stdout),
+    }
+
+def extract_resources(stdout):
+    """Predicted and measured peak memory and model-load time of the run."""
+    return {
+        'peakMemoryMb': extract(r"Predicted peak memory \(MB\): ([0-9.]+)", stdout),
+        'loadSeconds': extract(r"Predicted load time \(seconds\): ([0-9.]+)", stdout),
+        'actualPeakMemoryMb': extract(r"Actual peak memory \(MB\): ([0-9.]+)", stdout),
+        'actualLoadSeconds': extract(r"Actual load time \(seconds\): ([0-9.]+)", stdout),
+        'parameterMemory': extract(r"Parameter memory \(bytes\): (\{.*\})", stdout, cast=json.loads),
+    }
+
+def extract_variants(stdout):
+    """Side-by-side quotes per inference variant (eager, int8_dynamic, ...) from app.py's variant lines."""
+    quotes = []
+    for line in re.findall(r"Variant quote: (\{.*\})", stdout):
+        try:
+            quotes.append(json.loads(line))
+        except ValueError:
+            continue
+    return quotes
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     print("[DEBUG] Starting prediction request...")
     data = request.get_json()
     model_name = data.get('modelName', 'Qwen/Qwen3-0.6B')
     input_text = data.get('inputText', 'Hello, this is a test.')
+    max_new_tokens = data.get('maxNewTokens')
+    if max_new_tokens is not None:
+        try:
+            max_new_tokens = int(max_new_tokens)
+            if max_new_tokens < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({'error': 'maxNewTokens must be a positive integer'}), 400
+    try:
+        timeout_seconds, memory_limit_mb = resource_limits(data.get('timeoutSeconds'), data.get('memoryLimitMb'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     print(f"[DEBUG] Model name: {model_name}")
     print(f"[DEBUG] Input text: {input_text}")
 
-    app_py_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
-    print(f"[DEBUG] App.py path: {app_py_path}")
+    # Keyed on the commit the Hugging Face cache resolves the model to; an uncached model has none yet
+    revision, live_version = model_revision(model_name), registry.live()[0]
+    cached = (result_cache.get(cache_key(model_name, input_text, revision, live_version, max_new_tokens))
+              if revision else None)
+    if cached is not None:
+        print("[DEBUG] Serving cached prediction")
+        return jsonify({**cached, 'cached': True})
 
     try:
-        process = subprocess.Popen(
-            [sys.executable, app_py_path],
-            cwd=os.path.dirname(app_py_path),
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        print("[DEBUG] Subprocess started")
-
-        stdout, stderr = process.communicate(f"{model_name}\n{input_text}\n")
-        print(f"[DEBUG] Process return code: {process.returncode}")
+        run = run_app_py(model_name, input_text, timeout=timeout_seconds,
+                         memory_limit_mb=memory_limit_mb, max_new_tokens=max_new_tokens)
+        stdout, stderr = run.stdout, run.stderr
+        print(f"[DEBUG] Process return code: {run.returncode}")
         print(f"[DEBUG] stdout: {stdout}")
         print(f"[DEBUG] stderr: {stderr}")
 
-        if process.returncode != 0:
+        if run.status == 'busy':
+            return jsonify({"error": "All executor slots are busy, try again later"}), 503
+        if run.status in ('timeout', 'memory'):
+            print(f"[ERROR] Backend app.py killed: {run.status} limit exceeded")
+            return jsonify({"error": f"Backend app.py exceeded its {run.status} limit", "stderr": stderr, "stdout": stdout}), 504
+        if not run.ok:
             print("[ERROR] Backend app.py failed")
             return jsonify({"error": "Backend app.py failed", "stderr": stderr, "stdout": stdout}), 500
 
-        predicted_runtime = extract(r"\[ML Model\] Predicted runtime \(seconds\): ([0-9.]+)", stdout)
+        predicted_runtime = extract(r"\[(?:ML Model|Roofline)\] Predicted runtime \(seconds\): ([0-9.]+)", stdout)
         actual_runtime = extract(r"Actual measured runtime \(seconds\): ([0-9.]+)", stdout)
         error = extract(r"Prediction error: ([0-9.]+)", stdout)
+        estimator_version = extract(r"Estimator version: (\S+)", stdout, cast=str)
+        hardware_class = extract(r"Hardware class: (\S+)", stdout, cast=str)
+        hardware_class_confidence = extract(r"Hardware class: \S+ \(confidence ([0-9.]+)\)", stdout)
+        runtime_quantiles = extract_quantiles(stdout)
+        shadow_score_run(stdout, predicted_runtime, actual_runtime)
         energy_used = extract(r"Estimated energy used: ([0-9.]+)", stdout)
         auction_price = extract(r"Auction price used: ([0-9.]+)", stdout)
         cost_cents = extract(r"Predicted cost of inference: ([0-9.]+) cents", stdout)
@@ -114,7 +270,7 @@ def predict():
         try:
             hardware_result = subprocess.check_output([
                 sys.executable, os.path.join(os.path.dirname(__file__), 'extract_hardware_features.py')
-            ])
+            ], timeout=JOB_TIMEOUT_SECONDS)
             hardware_info = json.loads(hardware_result.decode()) if hardware_result else {}
         except Exception:
             hardware_info = {}
@@ -122,7 +278,7 @@ def predict():
         try:
             model_result = subprocess.check_output([
                 sys.executable, os.path.join(os.path.dirname(__file__), 'extract_model_features.py'), model_name, input_text
-            ])
+            ], timeout=JOB_TIMEOUT_SECONDS)
             model_info = json.loads(model_result.decode()) if model_result else {}
             # Guarantee input_token_length and output_token_length are present and integers
             if not isinstance(model_info.get("input_token_length"), int):
@@ -159,7 +315,7 @@ def predict():
             price_history = []
             price_future = []
 
-        return jsonify({
+        result = {
             'predictedRuntime': predicted_runtime,
             'energyUsed': energy_used,
             'auctionPrice': auction_price,
@@ -167,6 +323,13 @@ def predict():
             'costCents': cost_cents,
             'actualRuntime': actual_runtime,
             'error': error,
+            'estimatorVersion': estimator_version,
+            'hardwareClass': hardware_class,
+            'hardwareClassConfidence': hardware_class_confidence,
+            **runtime_quantiles,
+            'generation': extract_generation(stdout),
+            'variants': extract_variants(stdout),
+            **extract_resources(stdout),
             'predictedPower': avg_power,
             'actualPower': None,  # For now, we don't have actual power measurement
             'actualCostEur': actual_cost_eur,
@@ -177,14 +340,66 @@ def predict():
             'model': model_info,
             'priceHistory': price_history,
             'priceFuture': price_future
-        })
+        }
+        loaded_revision = extract(r"Model revision: ([0-9a-f]{40})", stdout, cast=str)
+        if loaded_revision:
+            result_cache.put(cache_key(model_name, input_text, loaded_revision, live_version, max_new_tokens), result)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/hardware-classes', methods=['POST'])
+def predict_hardware_classes():
+    """Price one prompt on every known hardware class with a single vectorized forest evaluation."""
+    data = request.get_json(silent=True) or {}
+    features = data.get('features')
+    try:
+        if features is None:
+            model_name = data.get('modelName', 'Qwen/Qwen3-0.6B')
+            input_text = data.get('inputText', 'Hello, this is a test.')
+            result = subprocess.check_output([
+                sys.executable, os.path.join(os.path.dirname(__file__), 'extract_model_features.py'), model_name, input_text
+            ], timeout=JOB_TIMEOUT_SECONDS)
+            features = json.loads(result.decode()) if result else {}
+            if features.get('error'):
+                return jsonify({'error': features['error']}), 500
+        elif not isinstance(features, dict):
+            return jsonify({'error': 'features must be an object'}), 400
+
+        version = registry.live()[0]
+        router = registry.router(version)
+        if router is None:
+            return jsonify({'error': 'The live estimator has no hardware classes'}), 404
+        predictions = router.predict_all(features)
+        now = datetime.now()
+        jobs = [{
+            'estimatedRuntime': p['predictedRuntime'],
+            'estimatedPower': p['power_w'] or DEFAULT_POWER_W,
+            'scheduledTime': now,
+            'energyPrice': None,
+            'estimatedEnergy': None,
+            'estimatedCost': None,
+        } for p in predictions]
+        compute_estimates(jobs)
+        classes = [{
+            'hardwareClass': p['id'],
+            'devices': p['devices'],
+            'hardware': p['hardware'],
+            'benchmarkRows': p['rows'],
+            'predictedRuntime': p['predictedRuntime'],
+            'estimatedPower': job['estimatedPower'],
+            'estimatedEnergy': job['estimatedEnergy'],
+            'estimatedCost': job['estimatedCost'],
+            'energyPrice': job['energyPrice'],
+        } for p, job in zip(predictions, jobs)]
+        return jsonify({'estimatorVersion': version, 'classes': classes})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/hardware', methods=['GET'])
 def hardware_info():
     try:
-        result = subprocess.check_output([sys.executable, os.path.join(os.path.dirname(__file__), 'extract_hardware_features.py')])
+        result = subprocess.check_output([sys.executable, os.path.join(os.path.dirname(__file__), 'extract_hardware_features.py')], timeout=JOB_TIMEOUT_SECONDS)
         features = json.loads(result.decode()) if result else {}
         print("[HARDWARE FEATURES API CALL]", json.dumps(features, indent=2), flush=True)
         return jsonify(features)
@@ -200,7 +415,7 @@ def model_info():
     try:
         result = subprocess.check_output([
             sys.executable, os.path.join(os.path.dirname(__file__), 'extract_model_features.py'), model_name, input_text
-        ])
+        ], timeout=JOB_TIMEOUT_SECONDS)
         features = json.loads(result.decode()) if result else {}
         # Guarantee input_token_length and output_token_length are present and integers
         if not isinstance(features.get("input_token_length"), int):
@@ -214,40 +429,68 @@ def model_info():
         return jsonify({'error': str(e)}), 500
 
 # Scheduler API endpoints
+JOB_COLUMNS = '''
+    id, model_name, input_text, scheduled_time, status,
+    estimated_cost, estimated_runtime, estimated_energy, energy_price,
+    result_json, created_at, completed_at, runtime_p50, runtime_p90, runtime_p99,
+    peak_memory_mb, load_seconds
+'''
+
+def job_from_row(row):
+    return {
+        'id': row[0],
+        'modelName': row[1],
+        'inputText': row[2],
+        'scheduledTime': row[3],
+        'status': row[4],
+        'estimatedCost': row[5],
+        'estimatedRuntime': row[6],
+        'estimatedEnergy': row[7],
+        'energyPrice': row[8],
+        'result': json.loads(row[9]) if row[9] else None,
+        'createdAt': row[10],
+        'completedAt': row[11],
+        'runtimeP50': row[12],
+        'runtimeP90': row[13],
+        'runtimeP99': row[14],
+        'peakMemoryMb': row[15],
+        'loadSeconds': row[16],
+    }
+
 @app.route('/api/scheduler/jobs', methods=['GET'])
 def get_scheduled_jobs():
     try:
         conn = sqlite3.connect('scheduler.db')
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, model_name, input_text, scheduled_time, status,
-                   estimated_cost, estimated_runtime, estimated_energy, energy_price,
-                   result_json, created_at, completed_at
+        cursor.execute(f'''
+            SELECT {JOB_COLUMNS}
             FROM scheduled_jobs
             ORDER BY scheduled_time ASC
         ''')
         rows = cursor.fetchall()
         conn.close()
 
-        jobs = []
-        for row in rows:
-            job = {
-                'id': row[0],
-                'modelName': row[1],
-                'inputText': row[2],
-                'scheduledTime': row[3],
-                'status': row[4],
-                'estimatedCost': row[5],
-                'estimatedRuntime': row[6],
-                'estimatedEnergy': row[7],
-                'energyPrice': row[8],
-                'result': json.loads(row[9]) if row[9] else None,
-                'createdAt': row[10],
-                'completedAt': row[11]
-            }
-            jobs.append(job)
-
-        return jsonify(jobs)
+        return jsonify([job_from_row(row) for row in rows])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# One job with its result, for clients that keep the list current from /api/events
+@app.route('/api/scheduler/jobs/<job_id>', methods=['GET'])
+def get_scheduled_job(job_id):
+    try:
+        conn = sqlite3.connect('scheduler.db')
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {JOB_COLUMNS}
+            FROM scheduled_jobs
+            WHERE id = ?
+        ''', (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if row is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_from_row(row))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -264,27 +507,310 @@ def schedule_job():
         estimated_runtime = data.get('estimatedRuntime')
         estimated_energy = data.get('estimatedEnergy')
         energy_price = data.get('energyPrice')
+        estimated_power = data.get('estimatedPower')
+        try:
+            timeout_seconds, memory_limit_mb = resource_limits(data.get('timeoutSeconds'), data.get('memoryLimitMb'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        runtime_p50, runtime_p90, runtime_p99 = (data.get(f'runtimeP{q}') for q in (50, 90, 99))
+        peak_memory_mb = data.get('peakMemoryMb')
+        load_seconds = data.get('loadSeconds')
+        deadline = data.get('deadline')
+        earliest_start = data.get('earliestStart') or (datetime.now().isoformat() if deadline else None)
         created_at = datetime.now().isoformat()
 
-        conn = sqlite3.connect('scheduler.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO scheduled_jobs
-            (id, model_name, input_text, scheduled_time, estimated_cost,
-             estimated_runtime, estimated_energy, energy_price, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (job_id, model_name, input_text, scheduled_time, estimated_cost,
-              estimated_runtime, estimated_energy, energy_price, created_at))
-        conn.commit()
-        conn.close()
+        with placement_lock:
+            engine = get_placement_engine()
+            if deadline:
+                # Let the placement engine pick the cheapest start before the deadline
+                try:
+                    job = engine.add(PlacementJob(job_id, earliest_start, deadline, estimated_runtime, estimated_power,
+                                                  reserve_runtime=runtime_p90, memory_mb=peak_memory_mb,
+                                                  load_seconds=load_seconds))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 409
+                scheduled_time = engine.start_time(job_id).isoformat()
+                estimated_cost = job.cost_eur
+                estimated_energy = job.runtime * job.power / 3600  # Wh
+                energy_price = engine.grid.price(job.start_slot)
+            elif scheduled_time:
+                try:
+                    engine.add(PlacementJob(job_id, scheduled_time, scheduled_time, estimated_runtime,
+                                            estimated_power, pinned=True, reserve_runtime=runtime_p90,
+                                            memory_mb=peak_memory_mb, load_seconds=load_seconds))
+                except Exception as e:
+                    print(f"[WARN] Could not reserve capacity for job {job_id}: {e}")
+
+            conn = sqlite3.connect('scheduler.db')
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT INTO scheduled_jobs
+                        (id, model_name, input_text, scheduled_time, estimated_cost,
+                         estimated_runtime, estimated_energy, energy_price, created_at,
+                         earliest_start, deadline, estimated_power, timeout_seconds, memory_limit_mb,
+                         runtime_p50, runtime_p90, runtime_p99, peak_memory_mb, load_seconds)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (job_id, model_name, input_text, scheduled_time, estimated_cost,
+                          estimated_runtime, estimated_energy, energy_price, created_at,
+                          earliest_start, deadline, estimated_power, timeout_seconds, memory_limit_mb,
+                          runtime_p50, runtime_p90, runtime_p99, peak_memory_mb, load_seconds))
+            except Exception:
+                # Give the reservation back, as bulk_schedule_jobs does; queued jobs that move into it
+                # are stored like any other re-plan
+                moved = engine.remove(job_id)
+                if moved:
+                    with conn:
+                        save_placements(conn.cursor(), engine, moved)
+                raise
+            finally:
+                conn.close()
 
+        broadcaster.publish_job(job_id, 'pending', modelName=model_name, inputText=input_text,
+                                scheduledTime=scheduled_time, estimatedCost=estimated_cost,
+                                estimatedRuntime=estimated_runtime, estimatedEnergy=estimated_energy,
+                                energyPrice=energy_price, createdAt=created_at, runtimeP50=runtime_p50,
+                                runtimeP90=runtime_p90, runtimeP99=runtime_p99, peakMemoryMb=peak_memory_mb,
+                                loadSeconds=load_seconds)
         return jsonify({
             'id': job_id,
+            'scheduledTime': scheduled_time,
+            'estimatedCost': estimated_cost,
+            'estimatedEnergy': estimated_energy,
+            'energyPrice': energy_price,
             'message': 'Job scheduled successfully'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def existing_job_ids(cursor, job_ids):
+    found = set()
+    job_ids = list(job_ids)
+    for i in range(0, len(job_ids), 500):  # Stay under SQLite's bound-parameter limit
+        chunk = job_ids[i:i + 500]
+        cursor.execute(f"SELECT id FROM scheduled_jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+@app.route('/api/scheduler/jobs/bulk', methods=['POST'])
+def bulk_schedule_jobs():
+    try:
+        data = request.get_json()
+        jobs, errors = validate_jobs(data.get('jobs') if isinstance(data, dict) else data)
+        compute_estimates(jobs)
+        now = datetime.now()
+        created_at = now.isoformat()
+
+        created, rows = [], []
+        with placement_lock:
+            engine = get_placement_engine()
+            for job in jobs:
+                job_id = str(uuid.uuid4())
+                if job['deadline']:
+                    earliest_start = job['earliestStart'] or now
+                    try:
+                        placed = engine.add(PlacementJob(job_id, earliest_start, job['deadline'],
+                                                         job['estimatedRuntime'], job['estimatedPower'],
+                                                         reserve_runtime=job['runtimeP90'],
+                                                         memory_mb=job['peakMemoryMb'],
+                                                         load_seconds=job['loadSeconds']))
+                    except ValueError as e:
+                        errors.append({'index': job['index'], 'error': str(e)})
+                        continue
+                    job['earliestStart'] = earliest_start
+                    job['scheduledTime'] = engine.start_time(job_id)
+                    job['estimatedCost'] = placed.cost_eur
+                    job['estimatedEnergy'] = placed.runtime * placed.power / 3600  # Wh
+                    job['energyPrice'] = engine.grid.price(placed.start_slot)
+                else:
+                    engine.add(PlacementJob(job_id, job['scheduledTime'], job['scheduledTime'],
+                                            job['estimatedRuntime'], job['estimatedPower'], pinned=True,
+                                            reserve_runtime=job['runtimeP90'], memory_mb=job['peakMemoryMb'],
+                                            load_seconds=job['loadSeconds']))
+                rows.append((job_id, job['modelName'], job['inputText'], job['scheduledTime'].isoformat(),
+                             job['estimatedCost'], job['estimatedRuntime'], job['estimatedEnergy'],
+                             job['energyPrice'], created_at,
+                             job['earliestStart'].isoformat() if job['earliestStart'] else None,
+                             job['deadline'].isoformat() if job['deadline'] else None,
+                             job['estimatedPower'], job['timeoutSeconds'], job['memoryLimitMb'],
+                             job['runtimeP50'], job['runtimeP90'], job['runtimeP99'],
+                             job['peakMemoryMb'], job['loadSeconds']))
+                created.append({'index': job['index'], 'id': job_id, 'scheduledTime': job['scheduledTime'].isoformat()})
+
+            conn = sqlite3.connect('scheduler.db')
+            try:
+                with conn:  # One transaction for the whole batch
+                    conn.executemany('''
+                        INSERT INTO scheduled_jobs
+                        (id, model_name, input_text, scheduled_time, estimated_cost,
+                         estimated_runtime, estimated_energy, energy_price, created_at,
+                         earliest_start, deadline, estimated_power, timeout_seconds, memory_limit_mb,
+                         runtime_p50, runtime_p90, runtime_p99, peak_memory_mb, load_seconds)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', rows)
+            except Exception:
+                # Roll the batch back out of the engine; queued jobs that move into the capacity it
+                # held are stored like any other re-plan
+                rolled_back = {row[0] for row in rows}
+                moved = {}
+                for job_id in rolled_back:
+                    moved.update((job.id, job) for job in engine.remove(job_id))
+                moved = [job for job_id, job in moved.items() if job_id not in rolled_back]
+                if moved:
+                    with conn:
+                        save_placements(conn.cursor(), engine, moved)
+                raise
+            finally:
+                conn.close()
+
+        if created:
+            # Thousands of per-job events would overflow the replay buffer; have clients refetch once
+            broadcaster.publish('reset', {'created': len(created)})
+        errors.sort(key=lambda e: e['index'] if e['index'] is not None else -1)
+        return jsonify({'created': created, 'errors': errors}), 200 if created or not errors else 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Update fields that change a queued job's reservation, and the columns they are stored in
+PLACEMENT_FIELDS = {'estimatedRuntime': 'estimated_runtime', 'estimatedPower': 'estimated_power',
+                    'runtimeP90': 'runtime_p90', 'peakMemoryMb': 'peak_memory_mb', 'loadSeconds': 'load_seconds'}
+
+def queued_placement_rows(cursor, job_ids):
+    """{id: row} of the pending jobs among `job_ids`, with the columns placement needs."""
+    rows = {}
+    columns = ['id', 'scheduled_time', 'earliest_start', 'deadline'] + list(PLACEMENT_FIELDS.values())
+    for i in range(0, len(job_ids), 500):
+        chunk = job_ids[i:i + 500]
+        cursor.execute(f'''
+            SELECT {', '.join(columns)} FROM scheduled_jobs
+            WHERE status = 'pending' AND id IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        rows.update((row[0], dict(zip(columns, row))) for row in cursor.fetchall())
+    return rows
+
+def updated_placement_job(row, update):
+    """The PlacementJob of a stored row with an update's non-empty fields applied."""
+    values = {field: update[field] if update[field] is not None else row[column]
+              for field, column in PLACEMENT_FIELDS.items()}
+    kwargs = dict(reserve_runtime=values['runtimeP90'], memory_mb=values['peakMemoryMb'],
+                  load_seconds=values['loadSeconds'])
+    if update['scheduledTime']:
+        return PlacementJob(row['id'], update['scheduledTime'], update['scheduledTime'], values['estimatedRuntime'],
+                            values['estimatedPower'], pinned=True, **kwargs)
+    return PlacementJob(row['id'], row['earliest_start'], row['deadline'], values['estimatedRuntime'],
+                        values['estimatedPower'], **kwargs)
+
+@app.route('/api/scheduler/jobs/bulk', methods=['PUT'])
+def bulk_update_jobs():
+    try:
+        data = request.get_json()
+        updates, errors = validate_updates(data.get('jobs') if isinstance(data, dict) else data)
+
+        with placement_lock:
+            engine = get_placement_engine()
+            conn = sqlite3.connect('scheduler.db')
+            engine.begin()
+            try:
+                cursor = conn.cursor()
+                found = existing_job_ids(cursor, (update['id'] for update in updates))
+                missing = [update for update in updates if update['id'] not in found]
+                updates = [update for update in updates if update['id'] in found]
+                errors.extend({'index': u['index'], 'id': u['id'], 'error': 'Job not found'} for u in missing)
+
+                # Re-place queued jobs before anything is stored: an explicit scheduledTime pins the job,
+                # new estimates move a deadline job. One that no longer fits (capacity, or a peakMemoryMb
+                # over the host cap) is rejected and keeps its old row and reservation.
+                queued = queued_placement_rows(cursor, [u['id'] for u in updates])
+                accepted, moved = [], {}
+                for u in updates:
+                    row = queued.get(u['id'])
+                    if row is not None and (u['scheduledTime'] or
+                                            (row['deadline'] and any(u[f] is not None for f in PLACEMENT_FIELDS))):
+                        try:
+                            replaced = engine.update(updated_placement_job(row, u))
+                        except ValueError as e:
+                            errors.append({'index': u['index'], 'id': u['id'], 'error': str(e)})
+                            continue
+                        moved.update((job.id, job) for job in replaced)
+                        if not u['scheduledTime']:
+                            moved[u['id']] = engine.jobs[u['id']]
+                    accepted.append(u)
+                updates = accepted
+
+                # Missing fields keep their stored value; an explicit scheduledTime pins the job
+                cursor.executemany('''
+                    UPDATE scheduled_jobs SET
+                        scheduled_time = COALESCE(?, scheduled_time),
+                        deadline = CASE WHEN ? IS NULL THEN deadline ELSE NULL END,
+                        estimated_cost = COALESCE(?, estimated_cost),
+                        estimated_runtime = COALESCE(?, estimated_runtime),
+                        estimated_energy = COALESCE(?, estimated_energy),
+                        energy_price = COALESCE(?, energy_price),
+                        estimated_power = COALESCE(?, estimated_power),
+                        runtime_p50 = COALESCE(?, runtime_p50),
+                        runtime_p90 = COALESCE(?, runtime_p90),
+                        runtime_p99 = COALESCE(?, runtime_p99),
+                        peak_memory_mb = COALESCE(?, peak_memory_mb),
+                        load_seconds = COALESCE(?, load_seconds)
+                    WHERE id = ?
+                ''', [(u['scheduledTime'].isoformat() if u['scheduledTime'] else None,
+                       u['scheduledTime'].isoformat() if u['scheduledTime'] else None,
+                       u['estimatedCost'], u['estimatedRuntime'], u['estimatedEnergy'],
+                       u['energyPrice'], u['estimatedPower'], u['runtimeP50'], u['runtimeP90'],
+                       u['runtimeP99'], u['peakMemoryMb'], u['loadSeconds'], u['id']) for u in updates])
+                # Re-placed deadline jobs and the jobs that moved into freed capacity get their new start;
+                # pinned jobs keep the time they were given
+                save_placements(cursor, engine, [engine.jobs[job_id] for job_id in moved
+                                                 if job_id in engine.jobs and not engine.jobs[job_id].pinned])
+                conn.commit()
+                engine.commit()
+            except Exception:
+                # Nothing was stored, so the re-placed jobs and those that moved into freed capacity
+                # go back to the reservations their rows still describe
+                engine.rollback()
+                raise
+            finally:
+                conn.close()
+
+        if updates:
+            broadcaster.publish('reset', {'updated': len(updates)})
+        errors.sort(key=lambda e: e['index'] if e['index'] is not None else -1)
+        return jsonify({'updated': [{'index': u['index'], 'id': u['id']} for u in updates], 'errors': errors}), \
+            200 if updates or not errors else 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scheduler/jobs/bulk', methods=['DELETE'])
+def bulk_delete_jobs():
+    try:
+        data = request.get_json()
+        job_ids = data.get('ids') if isinstance(data, dict) else data
+        if not isinstance(job_ids, list) or not all(isinstance(job_id, str) for job_id in job_ids):
+            return jsonify({'error': 'Expected a list of job ids'}), 400
+
+        conn = sqlite3.connect('scheduler.db')
+        try:
+            cursor = conn.cursor()
+            found = existing_job_ids(cursor, job_ids)
+            deleted = [job_id for job_id in dict.fromkeys(job_ids) if job_id in found]
+            with conn:
+                conn.executemany('DELETE FROM scheduled_jobs WHERE id = ?', [(job_id,) for job_id in deleted])
+        finally:
+            conn.close()
+
+        rescheduled = set()
+        for job_id in deleted:
+            rescheduled.update(release_placement(job_id))
+        rescheduled.difference_update(deleted)
+        if deleted:
+            broadcaster.publish('reset', {'deleted': len(deleted)})
+        errors = [{'index': i, 'id': job_id, 'error': 'Job not found'}
+                  for i, job_id in enumerate(job_ids) if job_id not in found]
+        return jsonify({'deleted': deleted, 'rescheduled': sorted(rescheduled), 'errors': errors}), \
+            200 if deleted or not errors else 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/scheduler/jobs/<job_id>', methods=['DELETE'])
 def delete_scheduled_job(job_id):
     try:
@@ -298,7 +824,9 @@ def delete_scheduled_job(job_id):
         if affected_rows == 0:
             return jsonify({'error': 'Job not found'}), 404
 
-        return jsonify({'message': 'Job deleted successfully'})
+        broadcaster.publish_job(job_id, 'deleted')
+        moved = release_placement(job_id)
+        return jsonify({'message': 'Job deleted successfully', 'rescheduled': moved})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -309,7 +837,7 @@ def run_scheduled_job(job_id):
         conn = sqlite3.connect('scheduler.db')
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT model_name, input_text FROM scheduled_jobs
+            SELECT model_name, input_text, timeout_seconds, memory_limit_mb FROM scheduled_jobs
             WHERE id = ? AND status = 'pending'
         ''', (job_id,))
         row = cursor.fetchone()
@@ -318,53 +846,96 @@ def run_scheduled_job(job_id):
             conn.close()
             return jsonify({'error': 'Job not found or already completed'}), 404
 
-        model_name, input_text = row
+        model_name, input_text, timeout_seconds, memory_limit_mb = row
 
-        # Update status to running
+        # Update status to running; the status check stops two requests from running the same job
         cursor.execute('''
-            UPDATE scheduled_jobs SET status = 'running' WHERE id = ?
-        ''', (job_id,))
+            UPDATE scheduled_jobs
+            SET status = 'running', started_at = ?, attempts = COALESCE(attempts, 0) + 1, worker_pgid = NULL
+            WHERE id = ? AND status = 'pending'
+        ''', (datetime.now().isoformat(), job_id))
         conn.commit()
+        claimed = cursor.rowcount
         conn.close()
+        if not claimed:
+            return jsonify({'error': 'Job not found or already completed'}), 404
+        broadcaster.publish_job(job_id, 'running')
 
-        # Run the prediction
-        app_py_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
-        process = subprocess.Popen(
-            [sys.executable, app_py_path],
-            cwd=os.path.dirname(app_py_path),
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        stdout, stderr = process.communicate(f"{model_name}\n{input_text}\n")
+        # Identical (model, input) pairs on the same hardware and prices reuse the earlier result
+        revision, live_version = model_revision(model_name), registry.live()[0]
+        cached = (result_cache.get(cache_key(model_name, input_text, revision, live_version))
+                  if revision else None)
+        if cached is not None:
+            completed_at = datetime.now().isoformat()
+            conn = sqlite3.connect('scheduler.db')
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scheduled_jobs
+                SET status = 'completed', result_json = ?, completed_at = ?
+                WHERE id = ? AND status = 'running'
+            ''', (json.dumps(cached), completed_at, job_id))
+            conn.commit()
+            conn.close()
+            broadcaster.publish_job(job_id, 'completed', completedAt=completed_at,
+                                    actualRuntime=cached.get('actualRuntime'))
+            release_placement(job_id)
+            return jsonify({**cached, 'cached': True})
+
+        # Run the prediction; the process group id lets any worker cancel it
+        def record_pgid(pgid):
+            conn = sqlite3.connect('scheduler.db')
+            conn.execute('UPDATE scheduled_jobs SET worker_pgid = ? WHERE id = ?', (pgid, job_id))
+            conn.commit()
+            conn.close()
+
+        run = run_app_py(model_name, input_text, job_id=job_id, timeout=timeout_seconds,
+                         memory_limit_mb=memory_limit_mb, on_start=record_pgid)
+        stdout, stderr = run.stdout, run.stderr
+        if run.status == 'busy':
+            # Never started: hand the job back instead of leaving it in 'running'
+            conn = sqlite3.connect('scheduler.db')
+            conn.execute('''
+                UPDATE scheduled_jobs SET status = 'pending', attempts = attempts - 1
+                WHERE id = ? AND status = 'running'
+            ''', (job_id,))
+            conn.commit()
+            conn.close()
+            broadcaster.publish_job(job_id, 'pending')
+            return jsonify({'error': 'All executor slots are busy, try again later'}), 503
 
         # Parse results
-        predicted_runtime = extract(r"\[ML Model\] Predicted runtime \(seconds\): ([0-9.]+)", stdout)
+        predicted_runtime = extract(r"\[(?:ML Model|Roofline)\] Predicted runtime \(seconds\): ([0-9.]+)", stdout)
         actual_runtime = extract(r"Actual measured runtime \(seconds\): ([0-9.]+)", stdout)
         error = extract(r"Prediction error: ([0-9.]+)", stdout)
+        estimator_version = extract(r"Estimator version: (\S+)", stdout, cast=str)
+        hardware_class = extract(r"Hardware class: (\S+)", stdout, cast=str)
+        hardware_class_confidence = extract(r"Hardware class: \S+ \(confidence ([0-9.]+)\)", stdout)
+        runtime_quantiles = extract_quantiles(stdout)
+        shadow_score_run(stdout, predicted_runtime, actual_runtime)
         energy_used = extract(r"Estimated energy used: ([0-9.]+)", stdout)
         auction_price = extract(r"Auction price used: ([0-9.]+)", stdout)
         cost_cents = extract(r"Predicted cost of inference: ([0-9.]+) cents", stdout)
         cost_eur = extract(r"Predicted cost of inference: [0-9.]+ cents \(([0-9.]+) EUR\)", stdout)
         avg_power = extract(r"avg_power = ([0-9.]+)", stdout)
 
-        # Get hardware and model info
-        try:
-            hardware_result = subprocess.check_output([
-                sys.executable, os.path.join(os.path.dirname(__file__), 'extract_hardware_features.py')
-            ])
-            hardware_info = json.loads(hardware_result.decode()) if hardware_result else {}
-        except Exception:
-            hardware_info = {}
+        # Get hardware and model info; failed or cancelled runs don't keep them, so skip the extra work
+        hardware_info, model_info = {}, {}
+        if run.ok:
+            try:
+                hardware_result = subprocess.check_output([
+                    sys.executable, os.path.join(os.path.dirname(__file__), 'extract_hardware_features.py')
+                ], timeout=JOB_TIMEOUT_SECONDS)
+                hardware_info = json.loads(hardware_result.decode()) if hardware_result else {}
+            except Exception:
+                hardware_info = {}
 
-        try:
-            model_result = subprocess.check_output([
-                sys.executable, os.path.join(os.path.dirname(__file__), 'extract_model_features.py'), model_name, input_text
-            ])
-            model_info = json.loads(model_result.decode()) if model_result else {}
-        except Exception:
-            model_info = {}
+            try:
+                model_result = subprocess.check_output([
+                    sys.executable, os.path.join(os.path.dirname(__file__), 'extract_model_features.py'), model_name, input_text
+                ], timeout=JOB_TIMEOUT_SECONDS)
+                model_info = json.loads(model_result.decode()) if model_result else {}
+            except Exception:
+                model_info = {}
 
         # Get price data
         price_history, price_future = [], []
@@ -394,6 +965,13 @@ def run_scheduled_job(job_id):
             'costCents': cost_cents,
             'actualRuntime': actual_runtime,
             'error': error,
+            'estimatorVersion': estimator_version,
+            'hardwareClass': hardware_class,
+            'hardwareClassConfidence': hardware_class_confidence,
+            **runtime_quantiles,
+            'generation': extract_generation(stdout),
+            'variants': extract_variants(stdout),
+            **extract_resources(stdout),
             'predictedPower': avg_power,
             'actualPower': None,
             'actualCostEur': (energy_used / 1000) * (auction_price / 1000) if energy_used and auction_price else None,
@@ -409,25 +987,38 @@ def run_scheduled_job(job_id):
         # Update job with results
         conn = sqlite3.connect('scheduler.db')
         cursor = conn.cursor()
+        completed_at = datetime.now().isoformat()
 
-        if process.returncode == 0:
-            cursor.execute('''
-                UPDATE scheduled_jobs
-                SET status = 'completed', result_json = ?, completed_at = ?
-                WHERE id = ?
-            ''', (json.dumps(result), datetime.now().isoformat(), job_id))
+        # A cancel has already set the final status, so only 'running' rows are updated
+        if run.ok:
+            status = 'completed'
+            loaded_revision = extract(r"Model revision: ([0-9a-f]{40})", stdout, cast=str)
+            if loaded_revision:
+                result_cache.put(cache_key(model_name, input_text, loaded_revision, live_version), result)
+            result_json = json.dumps(result)
         else:
-            cursor.execute('''
-                UPDATE scheduled_jobs
-                SET status = 'failed', result_json = ?, completed_at = ?
-                WHERE id = ?
-            ''', (json.dumps({'error': stderr, 'stdout': stdout}), datetime.now().isoformat(), job_id))
+            status = 'cancelled' if run.status == 'cancelled' else 'failed'
+            result_json = json.dumps({'error': stderr, 'stdout': stdout, 'reason': run.status})
+        cursor.execute('''
+            UPDATE scheduled_jobs
+            SET status = ?, result_json = ?, completed_at = ?, worker_pgid = NULL
+            WHERE id = ? AND status = 'running'
+        ''', (status, result_json, completed_at, job_id))
+        updated = cursor.rowcount
 
         conn.commit()
         conn.close()
+        # The full result stays in the database; clients fetch it when they need it
+        if updated:
+            broadcaster.publish_job(job_id, status, completedAt=completed_at, actualRuntime=actual_runtime)
+        release_placement(job_id)
 
-        if process.returncode == 0:
+        if run.ok:
             return jsonify(result)
+        elif run.status == 'cancelled':
+            return jsonify({'error': 'Job was cancelled', 'stderr': stderr}), 409
+        elif run.status in ('timeout', 'memory'):
+            return jsonify({'error': f'Job exceeded its {run.status} limit', 'stderr': stderr}), 504
         else:
             return jsonify({'error': 'Job execution failed', 'stderr': stderr}), 500
 
@@ -438,16 +1029,96 @@ def run_scheduled_job(job_id):
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE scheduled_jobs
-                SET status = 'failed', completed_at = ?
-                WHERE id = ?
+                SET status = 'failed', completed_at = ?, worker_pgid = NULL
+                WHERE id = ? AND status = 'running'
             ''', (datetime.now().isoformat(), job_id))
             conn.commit()
+            if cursor.rowcount:
+                broadcaster.publish_job(job_id, 'failed')
             conn.close()
         except:
             pass
 
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scheduler/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_scheduled_job(job_id):
+    try:
+        conn = sqlite3.connect('scheduler.db')
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, worker_pgid FROM scheduled_jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            return jsonify({'error': 'Job not found'}), 404
+        status, pgid = row
+        if status not in ('pending', 'running'):
+            conn.close()
+            return jsonify({'error': f'Job is already {status}'}), 409
+
+        # Set the final status first so the runner does not overwrite it when its process dies
+        cursor.execute('''
+            UPDATE scheduled_jobs SET status = 'cancelled', completed_at = ?
+            WHERE id = ? AND status = ?
+        ''', (datetime.now().isoformat(), job_id, status))
+        conn.commit()
+        cancelled = cursor.rowcount
+        conn.close()
+        if not cancelled:
+            return jsonify({'error': 'Job changed state, try again'}), 409
+
+        killed = cancel_process(job_id, pgid) if status == 'running' else False
+        broadcaster.publish_job(job_id, 'cancelled')
+        if status == 'pending':
+            release_placement(job_id)
+        return jsonify({'message': 'Job cancelled', 'killed': killed})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    try:
+        versions = []
+        for version in registry.versions():
+            try:
+                versions.append(registry.metadata(version))
+            except Exception as e:
+                versions.append({'version': version, 'error': str(e)})
+        live_version = registry.live()[0]
+        live_metadata = next((v for v in versions if v.get('version') == live_version), None)
+        feedback = drift_report(feedback_store, live_version, live_metadata)
+        feedback['totalRows'] = feedback_store.count()
+        return jsonify({'live': live_version, 'versions': versions, 'shadow': registry.shadow_report(),
+                        'feedback': feedback})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/<version>/promote', methods=['POST'])
+def promote_model(version):
+    if version not in registry.versions():
+        return jsonify({'error': 'Model version not found'}), 404
+    try:
+        registry.promote(version)
+        return jsonify({'message': 'Model promoted', 'live': version})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/shadow', methods=['POST'])
+def set_shadow_model():
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if version is not None and version not in registry.versions():
+        return jsonify({'error': 'Model version not found'}), 404
+    try:
+        registry.set_shadow(version)
+        return jsonify({'message': 'Shadow model set' if version else 'Shadow model cleared', 'shadow': version})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
 @app.route('/api/scheduler/energy-price/<timestamp>', methods=['GET'])
 def get_energy_price_for_time(timestamp):
     try:
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+import energy
+from energy import RaplSampler, rapl_domains
+
+
+class FakePowercap:
+    """A /sys/class/powercap stand-in: package domains whose energy_uj advances only when told to."""
+
+    def __init__(self, root, packages=1, max_range_uj=262143328850):
+        self.max_range_uj = max_range_uj
+        self.paths = [self._domain(os.path.join(root, f"intel-rapl:{i}"), f"package-{i}") for i in range(packages)]
+        # A subdomain that must not be counted on top of its package
+        self.core = self._domain(os.path.join(root, "intel-rapl:0:0"), "core")
+
+    def _domain(self, path, name):
+        os.makedirs(path, exist_ok=True)
+        for entry, value in (("name", name), ("max_energy_range_uj", self.max_range_uj), ("energy_uj", 0)):
+            with open(os.path.join(path, entry), "w") as f:
+                f.write(f"{value}\n")
+        return path
+
+    def set_uj(self, path, value):
+        # Replaced atomically, as sysfs reads never see a half-written value
+        target = os.path.join(path, "energy_uj")
+        with open(f"{target}.tmp", "w") as f:
+            f.write(f"{int(value) % self.max_range_uj}\n")
+        os.replace(f"{target}.tmp", target)
+
+    def advance(self, joules, package=0, path=None):
+        path = path or self.paths[package]
+        with open(os.path.join(path, "energy_uj")) as f:
+            current = int(f.read())
+        self.set_uj(path, current + round(joules * 1e6))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(energy.time, "perf_counter", clock)
+    return clock
+
+
+def sampler(root):
+    # The background thread never wakes within a test; samples are taken by hand
+    return RaplSampler(root=str(root), interval=3600)
+
+
+def test_only_package_domains_are_read(tmp_path, clock):
+    powercap = FakePowercap(tmp_path, packages=2)
+    assert [d.name for d in rapl_domains(str(tmp_path))] == ["package-0", "package-1"]
+
+    rapl = sampler(tmp_path)
+    rapl.start()
+    clock.now += 1.0
+    powercap.advance(3.0, package=0)
+    powercap.advance(2.0, package=1)
+    powercap.advance(50.0, path=powercap.core)  # Already part of package-0
+    result = rapl.stop()
+    assert result["energy_joules"] == pytest.approx(5.0)
+
+
+def test_counter_wraparound(tmp_path, clock):
+    powercap = FakePowercap(tmp_path, max_range_uj=10_000_000)  # Wraps every 10 J
+    powercap.set_uj(powercap.paths[0], 8_000_000)
+    rapl = sampler(tmp_path)
+    rapl.start()
+    clock.now += 1.0
+    powercap.advance(4.0)  # 8 J -> 12 J reads back as 2 J
+    rapl._sample()
+    clock.now += 1.0
+    powercap.advance(9.5)  # 2 J -> 11.5 J reads back as 1.5 J
+    result = rapl.stop()
+    assert result["energy_joules"] == pytest.approx(13.5)
+    assert result["seconds"] == pytest.approx(2.0)
+
+
+def test_peak_and_average_power(tmp_path, clock):
+    powercap = FakePowercap(tmp_path)
+    rapl = sampler(tmp_path)
+    rapl.start()
+    for seconds, joules in ((1.0, 20.0), (0.5, 30.0), (2.5, 50.0)):
+        clock.now += seconds
+        powercap.advance(joules)
+        rapl._sample()
+    result = rapl.stop()  # Closes the window with a zero-length interval
+    assert result["samples"] == 4
+    assert result["energy_joules"] == pytest.approx(100.0)
+    assert result["avg_cpu_power"] == pytest.approx(25.0)
+    assert result["peak_power"] == pytest.approx(60.0)
+    assert result["avg_gpu_power"] == 0.0
+
+
+def test_no_readable_domains(tmp_path):
+    with pytest.raises(OSError):
+        RaplSampler(root=str(tmp_path))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from estimator import export_forest
+from flat_forest import FlatForest, QUANTILES
+
+
+def synthetic(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((rows, 5)) * [1e9, 1e12, 48, 4.0, 2048]
+    y = X[:, 1] / 1e12 * X[:, 4] / 512 + np.log1p(X[:, 2]) + rng.normal(0, 0.05, rows)
+    return X, y
+
+
+@pytest.mark.parametrize("reg", [
+    RandomForestRegressor(n_estimators=20, random_state=0),
+    RandomForestRegressor(n_estimators=20, max_depth=6, min_samples_leaf=3, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, learning_rate=0.05, subsample=0.8, random_state=0),
+])
+def test_predict_matches_sklearn(reg, tmp_path):
+    X, y = synthetic()
+    reg.fit(X[:300], y[:300])
+    flat = export_forest(reg, [f"f{i}" for i in range(X.shape[1])])
+    np.testing.assert_allclose(flat.predict(X[300:]), reg.predict(X[300:]), rtol=1e-9, atol=1e-12)
+
+    path = tmp_path / "forest.npz"
+    flat.save(path)
+    loaded = FlatForest.load(path)
+    np.testing.assert_allclose(loaded.predict(X[300:]), reg.predict(X[300:]), rtol=1e-9, atol=1e-12)
+    assert loaded.predict_one(dict(zip(loaded.feature_names, X[300]))) == pytest.approx(reg.predict(X[300:301])[0])
+
+
+def test_forest_quantiles_are_per_tree_quantiles():
+    X, y = synthetic()
+    reg = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+    flat = export_forest(reg, [f"f{i}" for i in range(X.shape[1])])
+    per_tree = np.stack([tree.predict(X[:10]) for tree in reg.estimators_], axis=1)
+    np.testing.assert_allclose(flat.predict_quantiles(X[:10]), np.quantile(per_tree, QUANTILES, axis=1).T)
+
+
+def test_boosted_quantiles_add_held_out_residuals():
+    X, y = synthetic()
+    reg = GradientBoostingRegressor(n_estimators=30, random_state=0).fit(X[:300], y[:300])
+    flat = export_forest(reg, [f"f{i}" for i in range(X.shape[1])], X[300:], y[300:])
+    quantiles = flat.predict_quantiles(X[:5])
+    np.testing.assert_allclose(quantiles - reg.predict(X[:5])[:, None], np.tile(flat.residual_quantiles, (5, 1)))
+    assert np.all(np.diff(flat.residual_quantiles) >= 0)
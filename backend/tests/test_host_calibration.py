@@ -0,0 +1,21 @@
+import pytest
+
+from host_calibration import scale_calibration
+
+HOST = {"peak_gflops": 800.0, "memory_gbps": 40.0, "op_latency_us": 0.5}
+
+
+def test_whole_host_is_unchanged():
+    assert scale_calibration(HOST, threads=16, host_cores=16) == HOST
+
+
+def test_scaled_to_threads_and_worker_share():
+    scaled = scale_calibration(HOST, threads=4, host_cores=16, bandwidth_share=0.5)
+    assert scaled["peak_gflops"] == pytest.approx(200.0)
+    assert scaled["memory_gbps"] == pytest.approx(20.0)
+    assert scaled["op_latency_us"] == HOST["op_latency_us"]
+
+
+def test_missing_calibration_stays_missing():
+    assert scale_calibration({"peak_gflops": None, "memory_gbps": None}, 4, 16, 0.5) == {
+        "peak_gflops": None, "memory_gbps": None}
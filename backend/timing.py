@@ -0,0 +1,79 @@
+"""
+Timing harness for run_benchmark.py: repeated perf_counter_ns samples instead of one time.time() delta.
+- Each configuration gets its own warmup calls, then timed repetitions
+- Outliers (modified z-score above OUTLIER_Z, from the median absolute deviation) are dropped
+  before any statistic is computed, so one GC pause or page fault does not move the row
+- Sampling stops as soon as the coefficient of variation is under the target, at max_reps, or
+  when the next repetition would overrun the per-configuration time budget
+- MIN_REPS is the fewest samples a CV is judged on; on a quiet host a configuration costs
+  WARMUPS + MIN_REPS calls
+- Rows record the median, p95 and CV of the kept samples and why sampling stopped
+"""
+import time
+
+import numpy as np
+
+OUTLIER_Z = 3.5  # Iglewicz and Hoaglin's cut-off for the modified z-score
+WARMUPS = 2
+MIN_REPS = 3
+MAX_REPS = 50
+TARGET_CV = 0.02
+MAX_SECONDS = 5.0
+
+
+def reject_outliers(samples):
+    """(kept, rejected count) using the modified z-score 0.6745 * |x - median| / MAD."""
+    samples = np.asarray(samples, dtype=float)
+    deviation = np.abs(samples - np.median(samples))
+    mad = np.median(deviation)
+    if mad > 0:
+        z = 0.6745 * deviation / mad
+    elif deviation.mean() > 0:
+        # Over half the samples are identical; fall back to the mean absolute deviation
+        z = 0.7979 * deviation / deviation.mean()
+    else:
+        return samples, 0
+    keep = z <= OUTLIER_Z
+    return samples[keep], int((~keep).sum())
+
+
+def summarize(samples_ns):
+    """Statistics in seconds over the samples that survive outlier rejection."""
+    kept, rejected = reject_outliers(np.asarray(samples_ns, dtype=float) / 1e9)
+    mean = kept.mean()
+    # NaN (undefined) for a single sample, which never meets the CV target
+    cv = kept.std(ddof=1) / mean if len(kept) > 1 and mean > 0 else float("nan")
+    return {
+        "median": float(np.median(kept)),
+        "mean": float(mean),
+        "p95": float(np.percentile(kept, 95)),
+        "cv": float(cv),
+        "reps": len(samples_ns),
+        "rejected": rejected,
+    }
+
+
+def measure(fn, warmups=WARMUPS, min_reps=MIN_REPS, max_reps=MAX_REPS, target_cv=TARGET_CV,
+            max_seconds=MAX_SECONDS):
+    """Time `fn()` adaptively; returns (statistics, the last return value of fn)."""
+    for _ in range(warmups):
+        fn()
+    samples = []
+    stopped = "max_reps"
+    started = time.perf_counter_ns()
+    while len(samples) < max_reps:
+        start = time.perf_counter_ns()
+        result = fn()
+        samples.append(time.perf_counter_ns() - start)
+        if len(samples) < min_reps:
+            continue
+        if summarize(samples)["cv"] <= target_cv:
+            stopped = "cv"
+            break
+        # Assume the next repetition takes as long as the last one
+        if time.perf_counter_ns() - started + samples[-1] > max_seconds * 1e9:
+            stopped = "budget"
+            break
+    stats = summarize(samples)
+    stats["stopped"] = stopped
+    return stats, result
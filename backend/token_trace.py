@@ -0,0 +1,103 @@
+"""
+Per-token latency traces of model.generate() for modelling decode cost against context length.
+- TokenTimer is a generate() streamer that only timestamps: generate() calls put() once with the
+  prompt and then once per decode step, so every generated token gets a perf_counter_ns stamp
+- A trace is the int32 microsecond offset of each token from the generate() call; the first one
+  is the time to first token (TTFT), the gaps between the rest are inter-token latencies (ITL)
+- Each run keeps its traces in one ragged array file (data/runs/<run_id>/traces.npz): every
+  token of every row in a single int32 array plus row offsets, prompt lengths and batch sizes;
+  benchmark rows point into it with trace_index
+- run_summary() turns a trace file into an ITL histogram and decode tokens/sec per context-length
+  bucket, the shape generation_model.py assumes (per-token latency growing with the KV cache)
+
+Usage: python token_trace.py data/runs/<run_id>/traces.npz
+"""
+import time
+
+import numpy as np
+
+ITL_BIN_EDGES = np.logspace(-5, 1, 61)  # 10 us to 10 s, 10 bins per decade
+CONTEXT_BUCKET_TOKENS = 128
+
+
+class TokenTimer:
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self._prompt_seen = False
+        self._token_ns = []
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True  # The first put() is the prompt itself
+            return
+        self._token_ns.append(time.perf_counter_ns())
+
+    def end(self):
+        pass
+
+    def offsets_us(self):
+        return ((np.array(self._token_ns, dtype=np.int64) - self.start_ns) // 1000).astype(np.int32)
+
+
+def trace_summary(offsets_us):
+    """Row-level TTFT, ITL percentiles and decode throughput, in seconds and tokens/s."""
+    t = np.asarray(offsets_us, dtype=float) / 1e6
+    if len(t) == 0:
+        return {"ttft": None, "itl_p50": None, "itl_p90": None, "itl_p99": None, "decode_tokens_per_second": None}
+    itl = np.diff(t)
+    p50, p90, p99 = np.percentile(itl, [50, 90, 99]) if len(itl) else (None, None, None)
+    return {
+        "ttft": float(t[0]),
+        "itl_p50": None if p50 is None else float(p50),
+        "itl_p90": None if p90 is None else float(p90),
+        "itl_p99": None if p99 is None else float(p99),
+        "decode_tokens_per_second": float(len(itl) / (t[-1] - t[0])) if len(itl) and t[-1] > t[0] else None,
+    }
+
+
+def load_traces(path):
+    """(offsets, token_us, prompt_tokens, batch_size) of a run's trace file."""
+    with np.load(path) as data:
+        return data["offsets"], data["values"], data["prompt_tokens"], data["batch_size"]
+
+
+def run_summary(path, bucket=CONTEXT_BUCKET_TOKENS):
+    """ITL histogram and decode tokens/sec by context length over every trace in the file."""
+    offsets, token_us, prompt_tokens, batch_size = load_traces(path)
+    lengths = np.diff(offsets)
+    if lengths.sum() == 0:
+        return {"rows": int(len(lengths)), "tokens": 0}
+    row = np.repeat(np.arange(len(lengths)), lengths)
+    position = np.arange(len(token_us)) - offsets[:-1][row]  # Index of the token within its row
+    t = token_us.astype(float) / 1e6
+    # Token k > 0 was decoded with prompt + k tokens of context; its latency is the gap since token k - 1
+    decode = position > 0
+    itl = t[decode] - t[np.flatnonzero(decode) - 1]
+    context = prompt_tokens[row[decode]] + position[decode]
+    tokens = batch_size[row[decode]]
+
+    counts, _ = np.histogram(itl, bins=ITL_BIN_EDGES)
+    buckets = context // bucket
+    seconds = np.bincount(buckets, weights=itl)
+    produced = np.bincount(buckets, weights=tokens)
+    steps = np.bincount(buckets)
+    used = np.flatnonzero(seconds > 0)
+    ttft = t[position == 0]
+    return {
+        "rows": int(len(lengths)),
+        "tokens": int(lengths.sum()),
+        "ttft_p50": float(np.median(ttft)),
+        "itl_p50": float(np.median(itl)) if len(itl) else None,
+        "itl_histogram": {"edges_seconds": ITL_BIN_EDGES.tolist(), "counts": counts.tolist()},
+        "tokens_per_second_by_context": [
+            {"context_from": int(b * bucket), "context_to": int((b + 1) * bucket - 1),
+             "steps": int(steps[b]), "tokens_per_second": float(produced[b] / seconds[b])}
+            for b in used
+        ],
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    print(json.dumps(run_summary(sys.argv[1]), indent=2))
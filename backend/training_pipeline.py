@@ -0,0 +1,164 @@
+"""
+Training pipeline helpers for estimator.py: cached data loading and a budgeted, parallel model search.
+- The training frame (benchmarks plus feedback) is cached per input fingerprint in data/.cache,
+  so reruns and every later stage skip reading the dataset; the benchmark part is read without
+  its text columns
+- Candidates from the random forest and gradient boosting families are cross-validated with the
+  folds spread over all cores
+- The search samples at most SEARCH_MAX_ROWS rows and starts no new candidate once its share of
+  TRAINING_TIME_BUDGET_SECONDS is spent, so training stays bounded as the benchmark dataset grows
+- The final fit and the per-class fits are subsampled too: to FIT_MAX_ROWS, and further to what the
+  selected candidate's measured cost says fits in the rest of the budget (fit_rows())
+- StageTimer records wall time per stage for results/training_report.json
+"""
+import glob
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.model_selection import KFold, cross_val_score
+
+from benchmark_store import TEXT_COLUMNS
+
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BACKEND_ROOT, "data", ".cache")
+REPORT_PATH = "results/training_report.json"
+
+N_JOBS = -1  # All cores
+TRAINING_TIME_BUDGET_SECONDS = 900
+SEARCH_BUDGET_FRACTION = 0.5  # The rest is left for the final fit, export and hardware classes
+SEARCH_MAX_ROWS = 100_000
+FIT_MAX_ROWS = 500_000
+FIT_BUDGET_FRACTION = 0.5  # Of what the search left; the rest goes to the hardware-class fits
+CV_FOLDS = 5
+RANDOM_STATE = 42
+
+
+def candidate_models():
+    """(name, estimator) pairs, cheapest and most likely first so a tight budget still gets them."""
+    return [
+        # The configuration estimator.py always used
+        ("random_forest", RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE)),
+        ("random_forest", RandomForestRegressor(n_estimators=100, min_samples_leaf=5, random_state=RANDOM_STATE)),
+        ("gradient_boosting", GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, max_depth=3,
+                                                        random_state=RANDOM_STATE)),
+        ("random_forest", RandomForestRegressor(n_estimators=200, max_features="sqrt", random_state=RANDOM_STATE)),
+        ("gradient_boosting", GradientBoostingRegressor(n_estimators=300, learning_rate=0.05, max_depth=3,
+                                                        subsample=0.8, random_state=RANDOM_STATE)),
+        ("random_forest", RandomForestRegressor(n_estimators=200, max_depth=12, min_samples_leaf=2,
+                                                random_state=RANDOM_STATE)),
+        ("gradient_boosting", GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, max_depth=5,
+                                                        subsample=0.8, random_state=RANDOM_STATE)),
+    ]
+
+
+class StageTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def file_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_training_frame(store, feedback_path=None, feedback_cols=None, target=None):
+    """Benchmarks plus feedback rows as one frame, cached on disk by the fingerprint of the
+    benchmark files and the hash of the feedback file.
+
+    Returns (df, benchmark_rows, feedback_rows, cache_hit).
+    """
+    digest = hashlib.sha256(store.fingerprint().encode())
+    digest.update(file_digest([feedback_path] if feedback_path else []).encode())
+    key = digest.hexdigest()[:16]
+    cache_path = os.path.join(CACHE_DIR, f"frame_{key}.pkl")
+    if os.path.exists(cache_path):
+        df, benchmark_rows, feedback_rows = pd.read_pickle(cache_path)
+        return df, benchmark_rows, feedback_rows, True
+
+    columns = [col for col in store.columns() if col not in TEXT_COLUMNS]
+    df = store.read(columns)
+    benchmark_rows, feedback_rows = len(df), 0
+    if feedback_path and os.path.exists(feedback_path):
+        feedback = pd.read_csv(feedback_path).rename(columns={"actual_runtime": target})
+        feedback_rows = len(feedback)
+        df = pd.concat([df, feedback.reindex(columns=feedback_cols + [target])], ignore_index=True)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(CACHE_DIR, "frame_*.pkl")):
+        os.remove(stale)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    pd.to_pickle((df, benchmark_rows, feedback_rows), tmp_path)
+    os.replace(tmp_path, cache_path)
+    return df, benchmark_rows, feedback_rows, False
+
+
+def subsample(X, y=None, max_rows=SEARCH_MAX_ROWS):
+    """At most `max_rows` rows of X (and y), drawn without replacement with a fixed seed."""
+    if len(X) <= max_rows:
+        return X, y
+    sample = np.random.default_rng(RANDOM_STATE).choice(len(X), max_rows, replace=False)
+    return X.iloc[sample], (y.iloc[sample] if y is not None else None)
+
+
+def fit_rows(selected, search_rows, budget_seconds):
+    """Rows one fit of the selected candidate can take in `budget_seconds`, capped at FIT_MAX_ROWS.
+
+    Its cross-validation fitted CV_FOLDS models on (CV_FOLDS - 1) / CV_FOLDS of `search_rows` each
+    in `selected["seconds"]`; fit time is taken as linear in rows. Never fewer than the search used.
+    """
+    rows_fitted = search_rows * (CV_FOLDS - 1)
+    seconds_per_row = selected["seconds"] / max(rows_fitted, 1)
+    affordable = int(budget_seconds / seconds_per_row) if seconds_per_row > 0 else FIT_MAX_ROWS
+    return max(min(affordable, FIT_MAX_ROWS), min(search_rows, FIT_MAX_ROWS))
+
+
+def search(X, y, budget_seconds, n_jobs=N_JOBS):
+    """Cross-validate candidates until the budget runs out; returns (best estimator, results, rows searched).
+
+    Folds run in parallel, so each candidate is itself single-threaded to avoid oversubscription.
+    """
+    X, y = subsample(X, y, SEARCH_MAX_ROWS)
+    kf = KFold(n_splits=min(CV_FOLDS, len(X)), shuffle=True, random_state=RANDOM_STATE)
+    started = time.perf_counter()
+    last_seconds = 0.0
+    results, best, best_mae = [], None, float("inf")
+    for name, estimator in candidate_models():
+        if results and time.perf_counter() - started + last_seconds > budget_seconds:
+            print(f"[INFO] Search budget of {budget_seconds:.0f}s reached after {len(results)} candidates")
+            break
+        candidate_start = time.perf_counter()
+        scores = cross_val_score(estimator, X, y, cv=kf, scoring="neg_mean_absolute_error", n_jobs=n_jobs)
+        last_seconds = time.perf_counter() - candidate_start
+        cv_mae, cv_std = float(abs(np.mean(scores))), float(np.std(scores))
+        params = {k: v for k, v in estimator.get_params().items() if k in (
+            "n_estimators", "max_depth", "min_samples_leaf", "max_features", "learning_rate", "subsample")}
+        results.append({"family": name, "params": params, "cv_mae": cv_mae, "cv_mae_std": cv_std,
+                        "seconds": round(last_seconds, 4)})
+        print(f"  {name} {params}: CV MAE {cv_mae:.4f} ± {cv_std:.4f} ({last_seconds:.2f}s)")
+        if cv_mae < best_mae:
+            best, best_mae = estimator, cv_mae
+    return clone(best), results, X.shape[0]
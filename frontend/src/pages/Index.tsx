@@ -63,7 +63,7 @@ interface ScheduledJob {
   modelName: string;
   inputText: string;
   scheduledTime: Date;
-  status: 'pending' | 'running' | 'completed' | 'failed';
+  status: 'pending' | 'running' | 'completed' | 'failed' | 'cancelled';
   estimatedCost: number | null;
   estimatedRuntime: number | null;
   estimatedEnergy: number | null;
@@ -131,15 +131,53 @@ const AIInferencePredictor = () => {
     loadScheduledJobs();
   }, []);
 
-  // Auto-refresh jobs when on scheduler tab
+  // Live job updates when on scheduler tab; EventSource resumes from the last event id on reconnect
   useEffect(() => {
     if (activeTab !== 'scheduler') return;
 
-    const interval = setInterval(() => {
+    const source = new EventSource(`${API_URL}/api/events`);
+
+    source.addEventListener('job', (event) => {
+      const delta = JSON.parse((event as MessageEvent).data);
+      setScheduledJobs(prev => {
+        if (delta.status === 'deleted') {
+          return prev.filter(job => job.id !== delta.id);
+        }
+        const update = {
+          ...delta,
+          ...(delta.scheduledTime ? { scheduledTime: new Date(delta.scheduledTime) } : {}),
+          ...(delta.createdAt ? { createdAt: new Date(delta.createdAt) } : {})
+        };
+        const exists = prev.some(job => job.id === delta.id);
+        const next = exists
+          ? prev.map(job => job.id === delta.id ? { ...job, ...update } : job)
+          : [...prev, update as ScheduledJob];
+        return next.sort((a, b) => a.scheduledTime.getTime() - b.scheduledTime.getTime());
+      });
+      // Results are not part of the delta; "View results" fetches them for this one job
+    });
+
+    source.addEventListener('price', () => {
+      getCurrentEnergyPrice();
+    });
+
+    // Missed too many events: fall back to a full reload
+    source.addEventListener('reset', () => {
       loadScheduledJobs();
-    }, 30000);
+    });
 
-    return () => clearInterval(interval);
+    // A refused stream (the server caps open streams) is not retried; poll the job list instead
+    let poll: number | undefined;
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && poll === undefined) {
+        poll = window.setInterval(loadScheduledJobs, 30000);
+      }
+    };
+
+    return () => {
+      source.close();
+      if (poll !== undefined) window.clearInterval(poll);
+    };
   }, [activeTab]);
 
   // getEnergyPriceForTime (move this up)
@@ -286,6 +324,21 @@ const AIInferencePredictor = () => {
   };
 
 
+  // Full result of one job; live updates only carry its status and actual runtime
+  const loadJobResult = async (jobId: string): Promise<PredictionResponse | null> => {
+    try {
+      const response = await fetch(`${API_URL}/api/scheduler/jobs/${jobId}`);
+      if (response.ok) {
+        const job = await response.json();
+        setScheduledJobs(prev => prev.map(j => j.id === jobId ? { ...j, result: job.result ?? undefined } : j));
+        return job.result;
+      }
+    } catch (error) {
+      console.error('Failed to load job result:', error);
+    }
+    return null;
+  };
+
   // Function to extract predicted runtime from raw text if it's null in the response
   const extractPredictedRuntime = (rawText: string | undefined): number | null => {
     if (!rawText) return null;
@@ -480,17 +533,16 @@ const AIInferencePredictor = () => {
 
       const result = await response.json();
 
-      // Store the actual runtime from the backend response
+      // The response is the job's result; patch this job instead of reloading the list
       setScheduledJobs(prev => prev.map(j =>
         j.id === job.id ? {
           ...j,
+          status: 'completed',
+          result,
           actualRuntime: result.actualRuntime
         } : j
       ));
 
-      // Update job with results and reload jobs to get updated status from backend
-      await loadScheduledJobs();
-
     } catch (error) {
       console.error('Failed to run job:', error);
       setErrorMsg(`Failed to run job: ${(error as Error).message}`);
@@ -1432,11 +1484,13 @@ const AIInferencePredictor = () => {
                                     <div className="animate-spin rounded-full h-3.5 w-3.5 border-b-2 border-blue-400"></div>
                                   </div>
                                 )}
-                                {job.status === 'completed' && job.result && (
+                                {job.status === 'completed' && (
                                   <Button
                                     size="sm"
-                                    onClick={() => {
-                                      setResponse(job.result!);
+                                    onClick={async () => {
+                                      const result = job.result ?? await loadJobResult(job.id);
+                                      if (!result) return;
+                                      setResponse(result);
                                       setModelName(job.modelName);
                                       setInputText(job.inputText);
                                       setActiveTab('main');
@@ -1,142 +1,321 @@
-import time
-import csv
+import argparse
+import itertools
+import math
+import multiprocessing
 import os
-import subprocess
+import sys
 import random
 import torch
 import json
+import time
 from backend.extract_model_features import extract_model_features
 from backend.extract_hardware_features import extract_hardware_features
+from backend.host_calibration import CALIBRATION_FEATURES, scale_calibration
+from backend.energy import get_sampler
+from backend.timing import measure, TARGET_CV
+from backend.benchmark_grid import CONFIG_COLUMNS, cell_key, expand_grid, load_spec, pending_cells
+from backend.benchmark_checkpoint import CHECKPOINT_SECONDS, BatchWriter, RunCheckpoint
+from backend.benchmark_store import BenchmarkStore
+from backend.token_trace import TokenTimer, run_summary, trace_summary
+from backend.prompt_corpus import open_prompts, validate_corpus
+from backend.inference_variants import VARIANTS, apply_variant, unsupported, variant_context
+from backend.memory_usage import PARAM_MEMORY_COLUMNS, RssSampler, parameter_memory
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
 # Suppress the parallelism warning from HuggingFace tokenizers
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-MODEL_NAME = "Qwen/Qwen3-0.6B"
-CSV_PATH = "data/benchmarks.csv"
-N_RUNS = 100  # Adjust as needed
-MAX_NEW_TOKENS = 512  # Number of tokens to generate
+# Generation dominates wall time: one run when the forward passes show a quiet host, otherwise
+# repeated until its own CV settles, at most GENERATION_MAX_REPS times under a per-prompt budget
+GENERATION_MAX_REPS = 3
+GENERATION_MAX_SECONDS = 30.0
+GENERATION_TARGET_CV = 0.05
+ENERGY_BACKEND = os.environ.get("ENERGY_BACKEND", "auto")  # rapl, powermetrics, none or auto
+
+FIELDNAMES = [
+    "model", "model_architecture", "num_params", "flops", "num_layers", "device",
+    "num_cores", "cpu_frequency", "batch_size", "inference_time", "output_generation_time",
+    "inference_time_p95", "inference_time_cv", "inference_time_reps",
+    "output_generation_time_p95", "output_generation_time_cv", "output_generation_time_reps",
+    "inference_time_stopped", "output_generation_time_stopped", "output_token_count", "avg_cpu_power", "avg_gpu_power", "peak_power", "energy_joules",
+    "input_text", "input_size", "sequence_length", "tokens", "run_id",
+    "ttft", "itl_p50", "itl_p90", "itl_p99", "decode_tokens_per_second", "trace_index",
+    "load_time", "load_peak_rss_bytes", "peak_rss_bytes"
+] + PARAM_MEMORY_COLUMNS + CALIBRATION_FEATURES + [col for col in CONFIG_COLUMNS if col not in ("model", "batch_size")]
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def physical_cores(cpus):
+    """Logical CPUs grouped by physical core, so SMT siblings never end up in different workers."""
+    groups = {}
+    for cpu in cpus:
+        try:
+            with open(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list") as f:
+                key = f.read().strip()
+        except OSError:
+            key = str(cpu)
+        groups.setdefault(key, []).append(cpu)
+    return list(groups.values())
+
+def partition_cpus(workers):
+    """Disjoint, equally sized CPU sets of whole physical cores, one per worker."""
+    cores = physical_cores(available_cpus())
+    workers = max(1, min(workers, len(cores)))
+    per_worker = len(cores) // workers
+    return [sorted(cpu for core in cores[w * per_worker:(w + 1) * per_worker] for cpu in core)
+            for w in range(workers)]
+
+def build_input(tokenizer, input_text, target_length=None, batch_size=1):
+    """Prompt token ids, repeated or cut to `target_length` tokens and stacked `batch_size` times."""
+    input_ids = tokenizer(input_text, return_tensors="pt")["input_ids"]
+    if target_length:
+        repeats = math.ceil(target_length / input_ids.shape[1])
+        input_ids = input_ids.repeat(1, repeats)[:, :target_length]
+    return input_ids.repeat(batch_size, 1)
+
+def run_cell(model, tokenizer, prompts, sampler, cell, model_features, hardware_features, energy_share=1.0):
+    """Measure one grid cell; returns its benchmark row and the token trace of its last generation."""
+    input_text, _ = prompts.get(cell["prompt_index"])
+    input_ids = build_input(tokenizer, input_text, cell["target_sequence_length"], cell["batch_size"])
+    batch_size = input_ids.shape[0]
+    torch.set_num_threads(cell["threads"])
+
+    # Energy and resident memory are sampled in the background across both timed phases
+    memory = RssSampler()
+    sampler.start()
+    memory.start()
+
+    # Forward pass: warmed up per prompt and repeated until its CV settles
+    with variant_context(cell["variant"]):
+        forward, _ = measure(lambda: model(input_ids))
+    inference_time = forward["median"]
+
+    # Generation: the forward passes above already warmed the model up. Every call gets a fresh
+    # TokenTimer, so the timed region includes the same (tiny) per-token callback each time.
+    def generate():
+        timer = TokenTimer()
+        with variant_context(cell["variant"]):
+            return model.generate(input_ids, max_new_tokens=cell["max_new_tokens"], streamer=timer), timer
 
-# Load prompts from prompts_dataset.json
-PROMPTS_PATH = "prompts_dataset.json"
-with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
-    PROMPTS = json.load(f)
+    quiet = forward["cv"] <= TARGET_CV
+    generation, (generated_ids, timer) = measure(
+        generate, warmups=0, min_reps=1 if quiet else 2, max_reps=1 if quiet else GENERATION_MAX_REPS,
+        target_cv=GENERATION_TARGET_CV, max_seconds=GENERATION_MAX_SECONDS,
+    )
+    output_generation_time = generation["median"]
+    trace = timer.offsets_us()
 
-def get_power_metrics():
+    peak_rss = memory.stop()["peak_rss_bytes"]
+    power = sampler.stop()
+    # The window spans every repetition; scale it to one forward pass plus one generation.
+    # Package counters also see the other workers, so only this worker's share of the cores counts.
+    energy_joules = (power["energy_joules"] * (inference_time + output_generation_time) / power["seconds"]
+                     if power["seconds"] > 0 else 0.0) * energy_share
+
+    row = {
+        "model": cell["model"],
+        "model_architecture": type(model).__name__,
+        "num_params": model_features["num_params"],
+        "flops": model_features["flops"],
+        "num_layers": model_features["num_layers"],
+        "device": hardware_features["device"],
+        "num_cores": cell["threads"],  # The cores the inference actually used
+        "cpu_frequency": hardware_features["cpu_frequency"] / 1e9,  # Hz to GHz
+        "batch_size": batch_size,
+        "inference_time": inference_time,
+        "output_generation_time": output_generation_time,
+        "inference_time_p95": forward["p95"],
+        "inference_time_cv": forward["cv"],
+        "inference_time_reps": forward["reps"],
+        "output_generation_time_p95": generation["p95"],
+        "output_generation_time_cv": generation["cv"],
+        "output_generation_time_reps": generation["reps"],
+        "inference_time_stopped": forward["stopped"],  # cv, budget or max_reps
+        "output_generation_time_stopped": generation["stopped"],
+        "output_token_count": generated_ids.shape[1],
+        "avg_cpu_power": power["avg_cpu_power"] * energy_share,
+        "avg_gpu_power": power["avg_gpu_power"] * energy_share,
+        "peak_power": power["peak_power"] * energy_share,
+        "energy_joules": energy_joules,
+        "input_text": input_text,
+        "input_size": input_ids.numel(),
+        "sequence_length": input_ids.shape[1],
+        "tokens": ",".join(map(str, input_ids[0].tolist())),
+        # Host-wide calibration scaled to this cell's threads and this worker's share of memory bandwidth
+        **scale_calibration({col: hardware_features.get(col) for col in CALIBRATION_FEATURES},
+                            cell["threads"], hardware_features["num_cores"], energy_share),
+        **{col: cell[col] for col in CONFIG_COLUMNS if col not in ("model", "batch_size")},
+        **trace_summary(trace),
+        "peak_rss_bytes": peak_rss,
+        **{col: model_features.get(col) for col in ["load_time", "load_peak_rss_bytes"] + PARAM_MEMORY_COLUMNS},
+    }
+    return row, trace
+
+def run_worker(worker_id, cpus, cells, run_dir, hardware_features, energy_share=1.0, on_flush=None, corpus=None):
+    """Benchmark `cells` pinned to `cpus`, checkpointing the rows in batches to the run directory."""
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    sampler = get_sampler(ENERGY_BACKEND)
+    checkpoint = RunCheckpoint(run_dir)
+    writer = BatchWriter(checkpoint, worker_id, FIELDNAMES, on_flush=on_flush)
+
+    done = 0
     try:
-        result = subprocess.run(
-            ["sudo", "powermetrics", "-n", "1"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        output = result.stdout
-        power_lines = [line for line in output.splitlines() if "mW" in line]
-
-        cpu_power_mw = 0
-        gpu_power_mw = 0
-        for line in power_lines:
-            if "CPU Power" in line:
-                cpu_power_mw = float(line.split(":")[1].strip().split()[0])
-            elif "GPU Power" in line:
-                gpu_power_mw = float(line.split(":")[1].strip().split()[0])
-        return {
-            "avg_cpu_power": cpu_power_mw / 1000,  # mW to W
-            "avg_gpu_power": gpu_power_mw / 1000
-        }
-    except Exception as e:
-        print(f"[WARN] powermetrics failed: {e}")
-        return {"avg_cpu_power": 0, "avg_gpu_power": 0}
+        # Cells arrive grouped by (model, dtype, variant), so each model is loaded once per worker and variant
+        for (model_name, dtype, variant), group in itertools.groupby(
+                cells, key=lambda c: (c["model"], c["dtype"], c["variant"])):
+            # The previous group's model goes first, so the load peak is this model's alone
+            model = None
+            load_memory = RssSampler()
+            load_memory.start()
+            start = time.perf_counter()
+            model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=getattr(torch, dtype))
+            load_time = time.perf_counter() - start
+            load_peak_rss = load_memory.stop()["peak_rss_bytes"]
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            # Use a sample input for model features extraction; features describe the unmodified model
+            example_input = tokenizer("Hello, this is a test.", return_tensors="pt")["input_ids"]
+            model_features = extract_model_features(model, example_input)
+            model = apply_variant(model, variant)
+            # The memory breakdown is of the model as it runs, so int8 weights count one byte
+            model_features = {**model_features, "load_time": load_time, "load_peak_rss_bytes": load_peak_rss,
+                              **parameter_memory(model)}
+            # Prompts are read or generated one cell at a time; synthetic ones are fitted to this tokenizer
+            prompts = open_prompts(corpus, tokenizer)
 
-def main():
-    os.makedirs("data", exist_ok=True)
+            for cell in group:
+                done += 1
+                print(f"[worker {worker_id}] Run {done}/{len(cells)}: {cell}")
+                row, trace = run_cell(model, tokenizer, prompts, sampler, cell, model_features, hardware_features,
+                                      energy_share)
+                row["run_id"] = checkpoint.run_id
+                writer.write(row, trace, prompt_tokens=row["sequence_length"], batch_size=row["batch_size"])
+                print(
+                    f"[worker {worker_id}] Run {done}/{len(cells)} complete: "
+                    f"inference_time={row['inference_time']:.4f}s (cv {row['inference_time_cv']:.3f}, "
+                    f"{row['inference_time_reps']} reps), "
+                    f"generation_time={row['output_generation_time']:.4f}s ({row['output_generation_time_reps']} reps), "
+                    f"output_tokens={row['output_token_count']}, "
+                    f"CPU_power={row['avg_cpu_power']:.2f}W, "
+                    f"GPU_power={row['avg_gpu_power']:.2f}W, "
+                    f"energy={row['energy_joules']:.2f}J, "
+                    f"ttft={row['ttft'] or 0:.4f}s, decode={row['decode_tokens_per_second'] or 0:.1f} tok/s"
+                )
+    finally:
+        # Also on Ctrl-C or an exception: keep every row that finished
+        writer.flush()
 
-    model = AutoModelForCausalLM.from_pretrained(MODEL_NAME)
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference and append the rows to the data/benchmarks dataset")
+    parser.add_argument("--config", help="Sweep spec (JSON or YAML); defaults to the single-model sweep in benchmark_grid.py")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BENCHMARK_WORKERS", 1)),
+                        help="Worker processes, each pinned to its own physical cores")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="Continue an interrupted run (the latest unmerged one by default)")
+    args = parser.parse_args()
 
-    # Warmup to avoid initialization overheads during timing
-    warmup_input = tokenizer("Warmup input", return_tensors="pt")["input_ids"]
-    with torch.no_grad():
-        _ = model(warmup_input)
+    if args.resume:
+        checkpoint = RunCheckpoint.latest() if args.resume == "latest" else RunCheckpoint.open(args.resume)
+        if checkpoint is None:
+            print("[ERROR] No interrupted benchmark run to resume")
+            sys.exit(1)
+        manifest = checkpoint.manifest()
+        if manifest.get("status") == "merged":
+            print(f"[INFO] Run {checkpoint.run_id} is already complete")
+            return
+        spec = manifest["spec"]
+        print(f"[INFO] Resuming run {checkpoint.run_id}")
+    else:
+        spec = load_spec(args.config)
+        manifest = None
+    if isinstance(spec.get("corpus"), dict):
+        validate_corpus(spec["corpus"])  # Fail here rather than in every worker
+    unknown = set(spec.get("variants", [])) - set(VARIANTS)
+    if unknown:
+        raise ValueError(f"Unknown variants {sorted(unknown)}; expected one of {VARIANTS}")
 
+    # Calibrates (and caches) once here, before workers compete for the cores
     hardware_features = extract_hardware_features()
-    # Use a sample input for model features extraction
-    example_input = tokenizer("Hello, this is a test.", return_tensors="pt")["input_ids"]
-    model_features = extract_model_features(model, example_input)
-
-    fieldnames = [
-        "model", "model_architecture", "num_params", "flops", "num_layers", "device",
-        "num_cores", "cpu_frequency", "batch_size", "inference_time", "output_generation_time",
-        "output_token_count", "avg_cpu_power", "avg_gpu_power", "peak_power",
-        "input_text", "input_size", "sequence_length", "tokens"
-    ]
-
-    write_header = not os.path.exists(CSV_PATH) or os.stat(CSV_PATH).st_size == 0
-
-    with open(CSV_PATH, "a", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if write_header:
-            writer.writeheader()
-
-        for i in range(N_RUNS):
-            # Use a unique prompt from the JSON file, cycling if N_RUNS > len(PROMPTS)
-            input_text = PROMPTS[i % len(PROMPTS)]
-            inputs = tokenizer(input_text, return_tensors="pt")
-            input_ids = inputs["input_ids"]
-
-            print(f"Run {i+1}/{N_RUNS} input text: {input_text}")
-
-            batch_size = input_ids.shape[0]
-
-            # Measure inference (forward pass) time
-            start = time.time()
-            with torch.no_grad():
-                outputs = model(input_ids)
-            end = time.time()
-            inference_time = end - start
-
-            # Measure generation time and get generated tokens
-            gen_start = time.time()
-            generated_ids = model.generate(input_ids, max_new_tokens=MAX_NEW_TOKENS)
-            gen_end = time.time()
-            output_generation_time = gen_end - gen_start
-            output_token_count = generated_ids.shape[1]
-
-            power = get_power_metrics()
-
-            token_list = input_ids[0].tolist()
-
-            row = {
-                "model": MODEL_NAME,
-                "model_architecture": type(model).__name__,
-                "num_params": model_features["num_params"],
-                "flops": model_features["flops"],
-                "num_layers": model_features["num_layers"],
-                "device": hardware_features["device"],
-                "num_cores": hardware_features["num_cores"],
-                "cpu_frequency": hardware_features["cpu_frequency"] / 1e9,  # Hz to GHz
-                "batch_size": batch_size,
-                "inference_time": inference_time,
-                "output_generation_time": output_generation_time,
-                "output_token_count": output_token_count,
-                "avg_cpu_power": power["avg_cpu_power"],
-                "avg_gpu_power": power["avg_gpu_power"],
-                "peak_power": max(power["avg_cpu_power"], power["avg_gpu_power"]),
-                "input_text": input_text,
-                "input_size": input_ids.numel(),
-                "sequence_length": input_ids.shape[1],
-                "tokens": ",".join(map(str, token_list))
-            }
-
-            writer.writerow(row)
-            print(
-                f"Run {i+1}/{N_RUNS} complete: "
-                f"inference_time={inference_time:.4f}s, "
-                f"generation_time={output_generation_time:.4f}s, "
-                f"output_tokens={output_token_count}, "
-                f"CPU_power={power['avg_cpu_power']:.2f}W, "
-                f"GPU_power={power['avg_gpu_power']:.2f}W"
-            )
+
+    if hasattr(os, "sched_setaffinity"):
+        cpu_sets = partition_cpus(args.workers)
+    else:
+        print("[WARN] CPU pinning is not supported on this platform; workers will share all cores")
+        cpu_sets = [None] * max(1, args.workers)
+    workers = len(cpu_sets)
+    worker_cores = len(cpu_sets[0]) if cpu_sets[0] is not None else (os.cpu_count() or 1) // workers
+    # A resumed run keeps the grid it started with, whatever the worker layout is now
+    default_threads = manifest.get("default_threads", worker_cores) if manifest else worker_cores
+    if manifest is None:
+        checkpoint = RunCheckpoint.create(spec, workers)
+        checkpoint.update_manifest(default_threads=default_threads)
+        print(f"[INFO] Started run {checkpoint.run_id}; continue it with --resume {checkpoint.run_id} if interrupted")
+
+    cells = expand_grid(spec, default_threads=default_threads)
+    too_wide = [c for c in cells if c["threads"] > worker_cores]
+    if too_wide:
+        print(f"[WARN] Skipping {len(too_wide)} cells asking for more than the {worker_cores} cores per worker")
+    cells = [c for c in cells if c["threads"] <= worker_cores]
+    # Variants this build or dtype cannot run (no quantized engine, int8 over bf16 weights) are skipped
+    reasons = {(c["variant"], c["dtype"]): unsupported(c["variant"], c["dtype"]) for c in cells}
+    for (variant, dtype), reason in reasons.items():
+        if reason is not None:
+            print(f"[WARN] Skipping {variant} cells with {dtype} weights: {reason}")
+    cells = [c for c in cells if reasons[(c["variant"], c["dtype"])] is None]
+    completed = checkpoint.completed_keys(cell_key)
+    store = BenchmarkStore()
+    store.migrate()  # Convert a legacy benchmarks.csv before the first read or append
+    # Only the configuration columns of the sweep's models are read
+    measured = (store.read_table(CONFIG_COLUMNS, models=sorted({c["model"] for c in cells})).to_pylist()
+                if store.exists() else [])
+    pending = [c for c in pending_cells(cells, measured) if cell_key(c) not in completed]
+    print(f"[INFO] {len(cells)} cells in the sweep, {len(cells) - len(pending)} already measured")
+    checkpoint.update_manifest(cells_total=len(cells))
+    total_cpus = len(available_cpus())
+    shares = [len(cpus) / total_cpus if cpus is not None and workers > 1 else 1.0 for cpus in cpu_sets]
+    print(f"[INFO] Running {len(pending)} cells on {workers} worker(s): {cpu_sets}")
+
+    failed = []
+    if workers == 1:
+        run_worker(0, cpu_sets[0], pending, checkpoint.run_dir, hardware_features, shares[0],
+                   on_flush=lambda: checkpoint.sync_manifest(cell_key), corpus=spec.get("corpus"))
+    else:
+        # spawn: forking a process that already initialised torch's thread pools is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        processes = [
+            ctx.Process(target=run_worker,
+                        args=(w, cpu_sets[w], pending[w::workers], checkpoint.run_dir, hardware_features, shares[w]),
+                        kwargs={"corpus": spec.get("corpus")})
+            for w in range(workers)
+        ]
+        for p in processes:
+            p.start()
+        # The parent is the only manifest writer; it mirrors the workers' batches while they run
+        alive = processes
+        while alive:
+            alive[0].join(timeout=CHECKPOINT_SECONDS)
+            checkpoint.sync_manifest(cell_key)
+            alive = [p for p in alive if p.is_alive()]
+        failed = [w for w, p in enumerate(processes) if p.exitcode != 0]
+    checkpoint.sync_manifest(cell_key)
+
+    if failed:
+        print(f"[ERROR] Workers {failed} failed; their finished rows are checkpointed. "
+              f"Continue with: python run_benchmark.py --resume {checkpoint.run_id}")
+        sys.exit(1)
+
+    merged = checkpoint.merge_into(store, FIELDNAMES)
+    print(f"[INFO] Run {checkpoint.run_id}: appended {merged} rows to {store.root}")
+
+    if os.path.exists(checkpoint.trace_path()):
+        summary = run_summary(checkpoint.trace_path())
+        with open(os.path.join(checkpoint.run_dir, "trace_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[INFO] Token traces: {summary['tokens']} tokens, TTFT p50 {summary.get('ttft_p50') or 0:.4f}s, "
+              f"ITL p50 {summary.get('itl_p50') or 0:.4f}s ({checkpoint.trace_path()})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()